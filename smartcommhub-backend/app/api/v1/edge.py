@@ -1,20 +1,42 @@
+import time
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
-from app.api.deps import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.api.deps import get_current_user, require_admin
+from app.core.config import settings
 from app.services.edge.anomaly import anomaly_engine
+from app.services.edge.device_registry import device_registry
+from app.core.metrics import metrics
+from app.events.alert_ipc import send_control
+from app.events.mqtt_router import mqtt_router
+from app.services.edge.rate_limit import device_rate_limiter
+from app.services.edge.vital_rules import vital_rules
 
 router = APIRouter()
 
 
+def _ingest_external() -> bool:
+    # INGEST_EMBEDDED=false：基线/限流/规则表运行在独立摄取进程（python -m app.ingest），本进程中为空状态
+    return settings.MQTT_ENABLED and not settings.INGEST_EMBEDDED
+
+
+def require_local_ingest() -> None:
+    if _ingest_external():
+        raise HTTPException(status_code=503, detail="摄取管线运行在独立进程，本接口仅在内嵌摄取（INGEST_EMBEDDED=true）时可用")
+
+
 @router.get("/baseline")
 def get_baseline(
     elderly_id: int = Query(...),
     device_id: Optional[str] = Query(None),
     monitor_type: str = Query(...),
+    hour: Optional[int] = Query(None, ge=0, le=23),
     current=Depends(get_current_user),
+    _=Depends(require_local_ingest),
 ):
+    # 时段分桶时返回 hour（缺省为当前小时）所在桶的基线
     key = (elderly_id, device_id or "mock_device_001", monitor_type)
-    st = anomaly_engine.get_state(key)
+    bucket = anomaly_engine.bucket_of_hour(hour if hour is not None else time.localtime().tm_hour)
+    st = anomaly_engine.get_state(key, bucket)
     if st is None:
         return {"exists": False}
     return {
@@ -22,6 +44,8 @@ def get_baseline(
         "elderly_id": elderly_id,
         "device_id": device_id or "mock_device_001",
         "monitor_type": monitor_type,
+        "seasonal": anomaly_engine.seasonal,
+        "bucket": bucket,
         "n": st.n,
         "mu": st.mu,
         "mdev": st.mdev,
@@ -30,3 +54,51 @@ def get_baseline(
         "k": anomaly_engine.k,
         "min_samples": anomaly_engine.min_samples,
     }
+
+
+@router.get("/metrics")
+def get_metrics(current=Depends(get_current_user)):
+    # 订阅端/批量写入等后台链路的运行指标（进程内；独立摄取进程时仅含本进程的 HTTP/IPC 指标，ingest=external）
+    return {**metrics.snapshot(), "mqtt": mqtt_router.stats(), "ingest": "external" if _ingest_external() else "embedded"}
+
+
+@router.get("/rate-limits")
+def get_rate_limits(
+    limit: int = Query(50, ge=1, le=1000),
+    current=Depends(require_admin),
+    _=Depends(require_local_ingest),
+):
+    # 被限流的设备（按超限条数降序），用于定位配置错误、超速上报的设备
+    return {**device_rate_limiter.stats(), "items": device_rate_limiter.offenders(limit)}
+
+
+@router.get("/rules")
+def get_vital_rules(current=Depends(require_admin), _=Depends(require_local_ingest)):
+    # 当前生效的生命体征规则（有效范围/异常阈值，含护理等级覆盖）
+    return {**vital_rules.table.describe(), "reloads": vital_rules.reloads, "errors": vital_rules.errors}
+
+
+@router.post("/rules/reload")
+def reload_vital_rules(current=Depends(require_admin)):
+    # 立即重载规则（文件/表修改后无需等待定时检查）；独立摄取进程时经 IPC 转发给摄取进程
+    if _ingest_external():
+        if not send_control({"op": "rules_reload"}):
+            raise HTTPException(status_code=503, detail="摄取进程未连接，规则重载未转发")
+        return {"reloaded": None, "forwarded": True}
+    try:
+        changed = vital_rules.reload(force=True)
+    except Exception as e:
+        vital_rules.errors += 1
+        raise HTTPException(status_code=400, detail=f"规则重载失败：{e}")
+    return {"reloaded": changed, **vital_rules.stats()}
+
+
+@router.post("/devices/{device_id}/invalidate")
+def invalidate_device(device_id: str, current=Depends(require_admin)):
+    # 设备改绑/停用/改校准后立即失效注册表缓存（不等 TTL）；独立摄取进程时经 IPC 转发
+    if _ingest_external():
+        if not send_control({"op": "device", "device_id": device_id}):
+            raise HTTPException(status_code=503, detail="摄取进程未连接，设备缓存失效未转发")
+        return {"device_id": device_id, "forwarded": True}
+    device_registry.invalidate(device_id)
+    return {"device_id": device_id, "forwarded": False}
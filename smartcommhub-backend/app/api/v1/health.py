@@ -1,10 +1,11 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.api.deps import get_current_user
 from app.services.health_record_service import health_record_service
+from app.events.http_ingest import ingest_stream, pipeline_available
 
 router = APIRouter()
 
@@ -26,6 +27,17 @@ def create_health_record(req: HealthRecordCreateReq, db: Session = Depends(get_d
     return health_record_service.create(db, getattr(current, "id", None), **req.model_deepcopy())
 
 
+@router.post("/bulk", status_code=status.HTTP_202_ACCEPTED)
+async def bulk_ingest_health_records(request: Request, current=Depends(get_current_user)):
+    """
+    网关批量上报：NDJSON 或 JSON 数组请求体，流式解析后走与 MQTT 相同的校验/去重/异常检测/攒批写库管线。
+    只做入队（异步写库），返回逐行 accepted / rejected / queued / rate_limited / duplicate 计数。
+    """
+    if not pipeline_available():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="订阅端运行在独立摄取进程，请改用 MQTT 上报")
+    return await ingest_stream(request.stream())
+
+
 @router.get("/")
 def list_health_records(
     elderly_id: int = Query(...),
@@ -2,7 +2,10 @@
 """
 WebSocket 预警通道（最小可用实现）
 - /ws/warning：客户端连接后，将实时接收异常预警消息。
-- 从后台线程（MQTT 消费者）安全入队，异步协程周期性广播给所有连接客户端。
+- 从后台线程（MQTT 消费者）安全入队，异步协程周期性广播给所有连接客户端；
+  快速通道的预警（urgent=True）经 loop.call_soon_threadsafe 直接交给广播协程，不等 200ms 轮询。
+- 事件循环内的生产者（asyncio 摄取模式）调用 publish_warning()，经 asyncio.Queue 直接唤醒广播协程，无轮询延迟。
+- 独立摄取进程（python -m app.ingest）通过 set_warning_sink() 把预警转发到 IPC，API 进程收到后再 publish_warning()。
 
 可改进的核心算法（由你优化）：
 - 消息聚合与抖动控制：当前直接逐条广播，可加入节流/合并。
@@ -11,7 +14,7 @@ WebSocket 预警通道（最小可用实现）
 from __future__ import annotations
 import asyncio
 from collections import deque
-from typing import Any, Deque, Dict, Set, Optional
+from typing import Any, Callable, Deque, Dict, List, Set, Optional
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
@@ -23,45 +26,84 @@ _filters: Dict[WebSocket, Optional[Set[int]]] = {}
 # 线程安全：生产者（线程）只追加；消费者（协程）单线程读取
 _msg_queue: Deque[Dict[str, Any]] = deque()
 _queue_lock = asyncio.Lock()  # 仅在协程侧使用，线程侧不等待事件循环
+# 协程侧生产者的直达队列（start_broadcast_loop 时在事件循环内创建）
+_aqueue: Optional["asyncio.Queue[Dict[str, Any]]"] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+# 预警转发钩子：设置后预警不在本进程广播，而是交给该函数（须线程安全）
+_sink: Optional[Callable[[Dict[str, Any]], None]] = None
 
 
-def push_warning(payload: Dict[str, Any]) -> None:
-    """供后台线程调用：将预警消息入队，等待协程侧广播。"""
-    # 注意：不能在此处使用 asyncio API（线程上下文）
+def set_warning_sink(sink: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+    """设置/清除预警转发钩子（独立摄取进程用于转发到 API 进程）。"""
+    global _sink
+    _sink = sink
+
+
+def push_warning(payload: Dict[str, Any], urgent: bool = False) -> None:
+    """供后台线程调用：将预警消息入队，等待协程侧广播；urgent=True 时立即唤醒广播协程。"""
+    # 注意：线程上下文只能使用 call_soon_threadsafe；普通预警走 deque，由广播协程批量取出（省去逐条唤醒）
+    if _sink is not None:
+        _sink(payload)
+        return
+    if urgent and _loop is not None and _aqueue is not None:
+        try:
+            _loop.call_soon_threadsafe(_aqueue.put_nowait, payload)
+            return
+        except RuntimeError:
+            pass  # 事件循环已关闭
     _msg_queue.append(payload)
 
 
+def publish_warning(payload: Dict[str, Any], urgent: bool = False) -> None:
+    """供事件循环内的协程调用：直接交给广播协程（立即唤醒；urgent 仅为与 push_warning 接口一致）。"""
+    if _sink is not None:
+        _sink(payload)
+    elif _aqueue is not None:
+        _aqueue.put_nowait(payload)
+    else:
+        _msg_queue.append(payload)
+
+
+async def _broadcast(batch: List[Dict[str, Any]]) -> None:
+    dead = []
+    for ws in list(_clients):
+        try:
+            # 过滤：仅推送匹配 elderly_id 的消息；公共订阅则全部推送
+            allow = _filters.get(ws)
+            for msg in batch:
+                if isinstance(allow, set):
+                    try:
+                        eid = int(msg.get("elderly_id"))
+                    except Exception:
+                        eid = None
+                    if eid is None or eid not in allow:
+                        continue
+                await ws.send_json(msg)
+        except Exception:
+            dead.append(ws)
+    for d in dead:
+        try:
+            _clients.discard(d)
+            await d.close()
+        except Exception:
+            pass
+
+
 async def _drain_and_broadcast():
-    """周期性检查队列并广播给所有客户端。"""
+    """等待直达队列（最长 200ms），并顺带取出线程侧队列，合并批量广播。"""
     while True:
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(_aqueue.get(), 0.2))  # 200ms 批次扫描线程侧队列
+        except asyncio.TimeoutError:
+            pass
+        while not _aqueue.empty():
+            batch.append(_aqueue.get_nowait())
         # 取出队列中所有消息（批量发送）
-        if _msg_queue:
-            batch = []
-            while _msg_queue:
-                batch.append(_msg_queue.popleft())
-            dead = []
-            for ws in list(_clients):
-                try:
-                    # 过滤：仅推送匹配 elderly_id 的消息；公共订阅则全部推送
-                    allow = _filters.get(ws)
-                    for msg in batch:
-                        if isinstance(allow, set):
-                            try:
-                                eid = int(msg.get("elderly_id"))
-                            except Exception:
-                                eid = None
-                            if eid is None or eid not in allow:
-                                continue
-                        await ws.send_json(msg)
-                except Exception:
-                    dead.append(ws)
-            for d in dead:
-                try:
-                    _clients.discard(d)
-                    await d.close()
-                except Exception:
-                    pass
-        await asyncio.sleep(0.2)  # 200ms 批次扫描，降低广播开销
+        while _msg_queue:
+            batch.append(_msg_queue.popleft())
+        if batch:
+            await _broadcast(batch)
 
 
 @router.websocket("/ws/warning")
@@ -146,4 +188,7 @@ async def ws_warning(ws: WebSocket):
 
 async def start_broadcast_loop():
     """应用启动时由 main 调用，创建广播后台任务。"""
+    global _aqueue, _loop
+    _aqueue = asyncio.Queue()
+    _loop = asyncio.get_running_loop()
     asyncio.create_task(_drain_and_broadcast(), name="ws-broadcast-loop")
@@ -51,14 +51,110 @@ class Settings(BaseSettings):
     MQTT_BROKER_PORT: int = 1883
     MQTT_TOPIC: str = "smartcommhub/health"
     MQTT_ACCESS_TOPIC: str = "smartcommhub/access"
-    MQTT_CLIENT_ID: str = "sch_backend_consumer"
+    MQTT_BINARY_TOPIC: str = "smartcommhub/health/bin"  # 二进制遥测帧主题（留空则不订阅）
+    MQTT_CLIENT_ID: str = "sch_backend_consumer"  # 前缀；实际ID追加主机名与进程号，避免多 worker 冲突
+    MQTT_KEEPALIVE: int = 30
+    MQTT_RECONNECT_MIN_SECONDS: int = 1   # 断线重连退避下限（秒）
+    MQTT_RECONNECT_MAX_SECONDS: int = 60  # 断线重连退避上限（秒）
     MQTT_QUEUE_MAXSIZE: int = 1000
 
+    # 健康数据批量写入（组提交：攒满 N 条或等待 T 毫秒后一次事务写入）
+    INGEST_BATCH_MAX_SIZE: int = 200      # 单批最多条数
+    INGEST_BATCH_LINGER_MS: int = 50      # 攒批最长等待（毫秒）
+    INGEST_FLUSH_WARN_MS: int = 500       # 单批提交耗时超过该值记 warning（毫秒）
+    INGEST_IDEMPOTENT_INSERT: bool = False  # 按自然键 on conflict do nothing 插入；须先执行 08_health_record_natural_key.sql 再开启
+    # 自适应攒批（AIMD）：提交耗时超过目标则批大小减半、linger 加倍；有积压则批大小逐步增加；空闲则 linger 减半
+    # 批大小在 [INGEST_BATCH_MIN_SIZE, INGEST_BATCH_MAX_SIZE]、linger 在 [INGEST_BATCH_MIN_LINGER_MS, INGEST_BATCH_LINGER_MS] 内调节
+    INGEST_BATCH_ADAPTIVE: bool = True
+    INGEST_BATCH_MIN_SIZE: int = 20       # 批大小下限（条）
+    INGEST_BATCH_MIN_LINGER_MS: int = 5   # linger 下限（毫秒）
+    INGEST_BATCH_STEP: int = 20           # 加性增步长（条）
+    INGEST_COMMIT_TARGET_MS: int = 0      # 目标提交耗时（毫秒）；0 表示按 DB_POOL_TIMEOUT / INGEST_FLUSH_WARN_MS 推算
+    INGEST_WORKERS: int = 2               # 写库工作线程数（按 elderly_id 分片，受连接池上限约束）
+    INGEST_FAST_LANE_ENABLED: bool = True # 异常读数走快速通道（不等攒批，立即评分/入库/广播）
+
+    # 摄取模式：thread（paho 线程 + 工作线程）| asyncio（aiomqtt + asyncpg，运行在事件循环上）
+    INGEST_MODE: str = "thread"
+    ASYNC_DATABASE_URL: str | None = None  # asyncio 模式的连接串；为空时由 DATABASE_URL 改用 asyncpg 驱动
+
+    # 摄取进程部署：True 时订阅端随 API 进程启动（单进程部署）；
+    # False 时由独立进程 python -m app.ingest 负责订阅/评分/写库，API 进程经 Unix socket 接收预警
+    INGEST_EMBEDDED: bool = True
+    INGEST_IPC_SOCKET: str = "data/ingest.sock"  # 预警 IPC 套接字路径（相对路径基于 smartcommhub-backend 根目录）
+    INGEST_IPC_BUFFER_KB: int = 1024             # 单个订阅连接的发送积压上限（KB），超出则丢弃该连接的新预警
+
+    # 队列溢出时的本地磁盘缓冲（分段 mmap 环，崩溃/重启后回放）
+    INGEST_SPOOL_ENABLED: bool = True
+    INGEST_SPOOL_DIR: str = "data/spool"  # 相对路径基于 smartcommhub-backend 根目录
+    INGEST_SPOOL_SEGMENT_MB: int = 16     # 单段大小（MB）
+    INGEST_SPOOL_MAX_SEGMENTS: int = 64   # 段数上限（磁盘占用上限 = 段大小 × 段数）
+
+    # 重复/重投递抑制（qos=1 重投）：按 (device_id, elderly_id, monitor_type, monitor_time) 去重
+    INGEST_DEDUP_ENABLED: bool = True
+    INGEST_DEDUP_WINDOW_SECONDS: int = 600  # 去重时间窗口（秒）
+    INGEST_DEDUP_MAX_KEYS: int = 200000     # 去重键容量上限
+
+    # 按设备令牌桶限流（桶键为 device_id + elderly_id）：单设备超速上报时丢弃或降采样，避免挤占分片队列
+    INGEST_DEVICE_LIMIT_ENABLED: bool = True
+    INGEST_DEVICE_RATE: float = 5.0            # 单设备令牌补充速率（消息/秒；一条消息内同一老人的读数只计 1 次）
+    INGEST_DEVICE_BURST: int = 50              # 桶容量（允许的突发消息数）
+    INGEST_DEVICE_LIMIT_MODE: str = "drop"     # 超限处理：drop（丢弃）| downsample（降采样）
+    INGEST_DEVICE_DOWNSAMPLE_EVERY: int = 10   # downsample 模式下超限消息每 N 条保留 1 条
+    INGEST_DEVICE_IDLE_SECONDS: int = 600      # 超过该时长未上报的设备清除其桶（秒）
+    INGEST_DEVICE_MAX_TRACKED: int = 100000    # 跟踪设备数上限（超出的新设备不限流）
+
+    # 乱序重排：按 (elderly_id, device_id, monitor_type) 持有读数，按 monitor_time 有序释放给基线评分
+    INGEST_REORDER_ENABLED: bool = True
+    INGEST_REORDER_WINDOW_SECONDS: float = 2.0  # 单键最长持有时间（秒）
+    INGEST_REORDER_MAX_ITEMS: int = 20000       # 全部键缓冲总条数上限（超出提前释放最早的键）
+    INGEST_REORDER_MAX_KEYS: int = 200000       # 水位（已释放最大时间）保留的键数上限（LRU，超出淘汰最久未释放的键）
+
+    # 生命体征规则表（有效范围/异常阈值，可按护理等级/老人覆盖，热加载）
+    VITAL_RULES_SOURCE: str = "file"  # file（JSON 文件）| db（vital_rule 表）
+    VITAL_RULES_FILE: str = "app/services/edge/vital_rules.json"  # 相对路径基于后端根目录
+    VITAL_RULES_RELOAD_SECONDS: int = 30  # 定时检查重载间隔（秒），0 表示不重载
+
+    # HTTP 批量上报（POST /api/health-records/bulk，NDJSON / JSON 数组流式解析）
+    HTTP_INGEST_CHUNK_SIZE: int = 500   # 每解析出 N 行投递一次摄取管线
+    HTTP_INGEST_MAX_LINE_KB: int = 256  # 单行/单个元素大小上限（KB），超出则中止解析
+
+    # 设备注册表缓存（device_id -> 老人/支持类型/校准偏移，上报可不带 elderly_id）
+    DEVICE_REGISTRY_ENABLED: bool = True
+    DEVICE_REGISTRY_TTL_SECONDS: int = 300          # 条目有效期（过期后台刷新，期间仍用旧值）
+    DEVICE_REGISTRY_NEGATIVE_TTL_SECONDS: int = 60  # 未登记设备的负缓存时长（秒）
+    DEVICE_REGISTRY_NEGATIVE_MAX: int = 10000       # 负缓存条目上限（超出淘汰最早的）
+    DEVICE_REGISTRY_REFRESH_QUEUE: int = 1024       # 后台刷新队列上限（队满时丢弃，负缓存过期后重试）
+
+    # 老人ID存在性索引（写库前外键预检，免查库）
+    ELDER_INDEX_ENABLED: bool = True
+    ELDER_INDEX_RELOAD_SECONDS: int = 300  # 定时全量重载间隔（秒），0 表示只在 IPC 重连后重载
+    ELDER_INDEX_NEGATIVE_TTL_SECONDS: int = 60  # 索引可能过期时，查库确认不存在的 ID 的负缓存时长（秒）
+    ELDER_INDEX_NEGATIVE_MAX: int = 10000       # 负缓存条目上限（超出淘汰最早的）
+
     # 个性化异常检测（边缘）
     ANOMALY_PERSONAL_ENABLED: bool = True
     ANOMALY_ALPHA: float = 0.1            # EWMA 平滑系数（0-1）
     ANOMALY_K_SIGMA: float = 3.0          # 异常阈值（|x-μ| > k·σ）
     ANOMALY_MIN_SAMPLES: int = 50         # 至少样本数，冷启动前不启用个性化
+    ANOMALY_ENGINE: str = "scalar"        # scalar（逐条）| vector（NumPy 结构数组 + 批量评分，需 numpy）
+    ANOMALY_SEASONAL: str = "off"         # 时段分桶基线：off | hour（按小时 24 桶）| daynight（白天/夜间 2 桶）
+    ANOMALY_DAY_START_HOUR: int = 7       # daynight 模式白天起始小时（含）
+    ANOMALY_NIGHT_START_HOUR: int = 22    # daynight 模式夜间起始小时（含）
+    # 基线快照（重启后 mmap 挂载，免冷启动）
+    ANOMALY_SNAPSHOT_ENABLED: bool = True
+    ANOMALY_SNAPSHOT_FILE: str = "data/anomaly_baseline.bin"  # 相对路径基于 smartcommhub-backend 根目录
+    ANOMALY_SNAPSHOT_INTERVAL_SECONDS: int = 300  # 定期写出间隔（秒），0 表示只在关闭时写出
+    ANOMALY_SNAPSHOT_RETENTION_DAYS: int = 90     # 快照中超过该天数未更新的键在写出时丢弃，0 表示永久保留
+    # 基线内存上限（空闲键淘汰）
+    ANOMALY_MAX_KEYS: int = 500000                # 内存中最多保留的键数，超出时按最久未更新淘汰；0 表示不限
+    ANOMALY_IDLE_SECONDS: int = 7 * 24 * 3600     # 超过该时长无读数的键被淘汰；0 表示不按空闲淘汰
+    ANOMALY_EVICT_INTERVAL_SECONDS: int = 600     # 淘汰扫描间隔（秒），0 表示不扫描
+    ANOMALY_EVICT_TO_SNAPSHOT: bool = True        # 淘汰的键写入下一次快照（需启用快照且定期写出），否则直接丢弃
+    # 基线冷启动播种（从 health_record 历史聚合，后台执行一次）
+    ANOMALY_SEED_ENABLED: bool = True
+    ANOMALY_SEED_WINDOW_DAYS: int = 30            # 聚合最近多少天的读数
+    ANOMALY_SEED_MIN_COUNT: int = 10              # 组内读数少于该条数不播种
+    ANOMALY_SEED_FETCH_SIZE: int = 2000           # 服务端游标每批取回的组数
 
     # 门禁进出个性化异常（边缘）
     ACCESS_ANOMALY_ENABLED: bool = True
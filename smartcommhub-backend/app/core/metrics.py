@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+进程内轻量指标（计数器 / 瞬时值 / 直方图）
+- 供订阅端、批量写入、边缘引擎等后台线程上报运行状态。
+- 线程安全：所有写操作持锁；读取时生成快照，不阻塞上报方太久。
+- 暴露：GET /api/edge/metrics（见 app/api/v1/edge.py）。
+
+说明：不依赖 Prometheus 等外部库；如需对接，可在 snapshot() 基础上导出。
+"""
+from __future__ import annotations
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence
+
+# 默认直方图桶（毫秒）
+DEFAULT_MS_BUCKETS: Sequence[float] = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "count", "total", "max")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # 末位为 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.count += 1
+        self.total += v
+        if v > self.max:
+            self.max = v
+
+    def quantile(self, q: float) -> float:
+        # 桶上界近似分位数（落在 +Inf 桶时返回观测最大值）
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank:
+                return float(self.buckets[i]) if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "avg": round(self.total / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {
+                **{str(b): c for b, c in zip(self.buckets, self.counts)},
+                "+Inf": self.counts[-1],
+            },
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._hists: Dict[str, _Histogram] = {}
+        self._collectors: Dict[str, Callable[[], Any]] = {}
+
+    def inc(self, name: str, v: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + v
+
+    def set(self, name: str, v: float) -> None:
+        with self._lock:
+            self._gauges[name] = v
+
+    def observe(self, name: str, v: float, buckets: Sequence[float] = DEFAULT_MS_BUCKETS) -> None:
+        with self._lock:
+            h = self._hists.get(name)
+            if h is None:
+                h = _Histogram(buckets)
+                self._hists[name] = h
+            h.observe(v)
+
+    def register_collector(self, name: str, fn: Callable[[], Any]) -> None:
+        """注册拉取式指标（如队列深度），在 snapshot() 时调用。"""
+        with self._lock:
+            self._collectors[name] = fn
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            hists = {k: h.to_dict() for k, h in self._hists.items()}
+            collectors: List = list(self._collectors.items())
+        collected: Dict[str, Any] = {}
+        for name, fn in collectors:
+            try:
+                collected[name] = fn()
+            except Exception as e:
+                collected[name] = f"error: {e}"
+        return {"counters": counters, "gauges": gauges, "histograms": hists, "collected": collected}
+
+
+# 全局实例（进程级）
+metrics = Metrics()
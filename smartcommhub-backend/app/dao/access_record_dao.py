@@ -1,6 +1,6 @@
-from typing import Sequence, Optional
+from typing import Sequence, Optional, Mapping, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, insert
 from app.models.access_record import AccessRecord
 from app.dao.base_dao import BaseDAO
 
@@ -29,4 +29,11 @@ class AccessRecordDAO(BaseDAO[AccessRecord]):
         stmt = stmt.offset(offset).limit(limit)
         return db.execute(stmt).scalars().all()
 
+    def bulk_insert(self, db: Session, rows: Sequence[Mapping[str, Any]]) -> int:
+        """多行插入（executemany / insertmanyvalues），不提交事务，由调用方控制。"""
+        if not rows:
+            return 0
+        db.execute(insert(AccessRecord), [dict(r) for r in rows])
+        return len(rows)
+
 access_record_dao = AccessRecordDAO()
@@ -1,6 +1,6 @@
-from typing import Sequence, Optional
+from typing import Sequence, Optional, Mapping, Any, List
 from sqlalchemy.orm import Session
-from sqlalchemy import select, update
+from sqlalchemy import select, update, insert
 from app.models.alert import Alert
 from app.dao.base_dao import BaseDAO
 
@@ -54,5 +54,12 @@ class AlertDAO(BaseDAO[Alert]):
         res = db.execute(stmt)
         return res.rowcount or 0
 
+    def bulk_insert_returning_ids(self, db: Session, rows: Sequence[Mapping[str, Any]]) -> List[int]:
+        """多行插入并通过 RETURNING 取回 alert_id（顺序与 rows 一致），不提交事务。"""
+        if not rows:
+            return []
+        stmt = insert(Alert).returning(Alert.alert_id, sort_by_parameter_order=True)
+        return list(db.execute(stmt, [dict(r) for r in rows]).scalars().all())
+
 
 alert_dao = AlertDAO()
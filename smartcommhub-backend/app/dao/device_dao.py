@@ -0,0 +1,19 @@
+from typing import Optional, Sequence
+from sqlalchemy.orm import Session
+from sqlalchemy import select
+from app.models.device import Device
+from app.dao.base_dao import BaseDAO
+
+
+class DeviceDAO(BaseDAO[Device]):
+    def __init__(self):
+        super().__init__(Device)
+
+    def get_enabled(self, db: Session, device_id: str) -> Optional[Device]:
+        stmt = select(Device).where(Device.device_id == device_id, Device.enabled == 1).limit(1)
+        return db.execute(stmt).scalars().first()
+
+    def list_enabled(self, db: Session) -> Sequence[Device]:
+        return db.execute(select(Device).where(Device.enabled == 1)).scalars().all()
+
+device_dao = DeviceDAO()
@@ -1,10 +1,39 @@
-from typing import Sequence, Optional
+from datetime import datetime
+from typing import Sequence, Optional, Mapping, Any, Iterator, List, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from app.models.health_record import HealthRecord
+from sqlalchemy import select, insert, func, case, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.health_record import HealthRecord, NATURAL_KEY
 from app.dao.base_dao import BaseDAO
 
 
+def natural_key(row: Mapping[str, Any]) -> Tuple[int, str, str, Any]:
+    """(elderly_id, device_id, monitor_type, monitor_time)；时间统一为 datetime，便于与 RETURNING 结果比对。"""
+    t = row["monitor_time"]
+    if not isinstance(t, datetime):
+        try:
+            t = datetime.fromisoformat(str(t))
+        except ValueError:
+            pass
+    if isinstance(t, datetime) and t.tzinfo is not None:
+        t = t.replace(tzinfo=None)  # timestamp without time zone：与库内取回值比对时忽略时区
+    return int(row["elderly_id"]), str(row.get("device_id", "mock_device_001")), str(row["monitor_type"]), t
+
+
+def inserted_mask(rows: Sequence[Mapping[str, Any]], returned: Sequence[Any]) -> List[bool]:
+    """
+    按 RETURNING 取回的自然键标记每行是否真正插入。
+    同一批内自然键重复的行只计第一条，其余视为跳过。
+    """
+    fresh = {natural_key(r._mapping) for r in returned}
+    mask: List[bool] = []
+    for r in rows:
+        k = natural_key(r)
+        mask.append(k in fresh)
+        fresh.discard(k)
+    return mask
+
+
 class HealthRecordDAO(BaseDAO[HealthRecord]):
     def __init__(self):
         super().__init__(HealthRecord)
@@ -29,4 +58,64 @@ class HealthRecordDAO(BaseDAO[HealthRecord]):
         stmt = stmt.offset(offset).limit(limit)
         return db.execute(stmt).scalars().all()
 
+    def bulk_insert(self, db: Session, rows: Sequence[Mapping[str, Any]]) -> int:
+        """多行插入（executemany / insertmanyvalues），不提交事务，由调用方控制。"""
+        if not rows:
+            return 0
+        db.execute(insert(HealthRecord), [dict(r) for r in rows])
+        return len(rows)
+
+    @staticmethod
+    def insert_ignore_stmt():
+        """insert ... on conflict (自然键) do nothing returning 自然键（同步/异步写库共用）。"""
+        cols = [getattr(HealthRecord, c) for c in NATURAL_KEY]
+        return pg_insert(HealthRecord).on_conflict_do_nothing(index_elements=list(NATURAL_KEY)).returning(*cols)
+
+    def bulk_insert_ignore(self, db: Session, rows: Sequence[Mapping[str, Any]]) -> List[bool]:
+        """
+        幂等多行插入：自然键冲突的行跳过（网关重发、磁盘缓冲回放不再产生重复记录），不提交事务。
+        返回与 rows 等长的“是否插入”标记；插入条数 = sum(mask)，跳过条数 = len(rows) - sum(mask)。
+        """
+        if not rows:
+            return []
+        returned = db.execute(self.insert_ignore_stmt(), [dict(r) for r in rows]).all()
+        return inserted_mask(rows, returned)
+
+    def baseline_stats(
+        self,
+        db: Session,
+        since: datetime,
+        min_count: int = 1,
+        fetch_size: int = 2000,
+        hour_map: Optional[Sequence[int]] = None,
+    ) -> Iterator[Sequence[Any]]:
+        """
+        按 (elderly_id, device_id, monitor_type[, bucket]) 一次聚合近期读数（单条 SQL，库内完成）：
+        n / median / q1 / q3 / stddev / last_time；服务端游标分批取回（每批 fetch_size 行）。
+        hour_map（24 项，小时 -> 时段桶）给出时按 monitor_time 的小时再分组，结果带 bucket 列。
+        """
+        v = HealthRecord.monitor_value
+        group = [HealthRecord.elderly_id, HealthRecord.device_id, HealthRecord.monitor_type]
+        if hour_map is not None:
+            hour = func.extract("hour", HealthRecord.monitor_time)
+            # 常量内联（literal_column）：select 与 group by 中的表达式须逐字相同，不能各自绑定参数
+            whens = [(hour == literal_column(str(h)), literal_column(str(int(b)))) for h, b in enumerate(hour_map)]
+            group.append(case(*whens, else_=literal_column("0")).label("bucket"))
+        stmt = (
+            select(
+                *group,
+                func.count().label("n"),
+                func.percentile_cont(0.5).within_group(v).label("median"),
+                func.percentile_cont(0.25).within_group(v).label("q1"),
+                func.percentile_cont(0.75).within_group(v).label("q3"),
+                func.stddev_samp(v).label("stddev"),
+                func.max(HealthRecord.monitor_time).label("last_time"),
+            )
+            .where(HealthRecord.monitor_time >= since)
+            .group_by(*group)
+            .having(func.count() >= min_count)
+        )
+        result = db.execute(stmt.execution_options(yield_per=fetch_size))
+        yield from result.partitions()
+
 health_record_dao = HealthRecordDAO()
@@ -3,18 +3,36 @@
 门禁进出订阅端（最小实现）
 - 功能：订阅门禁主题，写入 access_record，并进行个性化“外出时长/未出门”异常判别。
 - 推送：通过 WS 广播与 alerts 持久化。
+- 线程模型：paho 回调只解码入队；access-db-worker 攒批后按序更新个性化引擎，
+  门禁记录与告警同一事务写入（与健康数据链路一致），再广播（带 alert_id）。
+- 指标：access.queue.depth / access.queue.lag.ms / access.flush.ms / access.batch.size / access.batch.target_size 等。
 """
 from __future__ import annotations
 import json
+import queue
 import threading
 import time
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.database import SessionLocal
 from app.core.logging import logger
-from app.models.access_record import AccessRecord
+from app.core.metrics import metrics
+from app.dao.access_record_dao import access_record_dao
+from app.dao.alert_dao import alert_dao
+from app.events.batching import BATCH_SIZE_BUCKETS, Unit, drain_batch, make_batcher
+from app.events.mqtt_router import mqtt_router
 from app.services.edge.access_anomaly import access_anomaly_engine
+from app.services.edge.elder_index import elder_index
+
+# 跨线程缓冲队列（MQTT 网络线程 -> 门禁写库线程）
+ACCESS_Q: "queue.Queue[Unit]" = queue.Queue(maxsize=settings.MQTT_QUEUE_MAXSIZE)
+metrics.register_collector("access.queue.depth", ACCESS_Q.qsize)
+# 写库攒批调节器（当前批大小见 access.batch.target_size）
+ACCESS_BATCHER = make_batcher("access")
 
 
 def _parse_time(s: str) -> datetime:
@@ -86,109 +104,180 @@ def _worker_periodic_check():
         time.sleep(settings.ACCESS_CHECK_INTERVAL_SECONDS)
 
 
-def _on_message(client, userdata, msg):
-    from app.api.v1.ws import push_warning
+def _access_row(ev: Dict[str, Any]) -> Dict[str, Any]:
+    # 入库 access_record（是否标记 is_abnormal 由业务定义；此处统一为 NO）
+    return {
+        "elderly_id": ev["elderly_id"],
+        "access_type": ev["access_type"],
+        "record_time": ev["record_time"],
+        "gate_location": ev["gate_location"],
+        "is_abnormal": "NO",
+    }
+
+
+def _access_alert_row(elderly_id: int, record_time: datetime, ev: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "elderly_id": elderly_id,
+        "monitor_type": str(ev["type"]),
+        "monitor_value": float(ev["duration_hours"]),
+        "monitor_time": record_time,
+        "device_id": "gate",
+        "global_abnormal": 0,
+        "personal_abnormal": 1,
+        "score": ev.get("score"),
+        "confidence": None,
+        "k": settings.ACCESS_K_SIGMA,
+        "n": ev.get("n"),
+        "mu": ev.get("mu"),
+        "sigma": ev.get("sigma"),
+        "ack_status": "UNACKED",
+    }
+
+
+def _write_access_batch(
+    db: Session, events: List[Dict[str, Any]], alerts: List[Optional[Dict[str, Any]]]
+) -> Tuple[List[bool], List[Optional[int]]]:
+    """
+    一批门禁记录及其告警同一事务写入（多行 insert + RETURNING alert_id + 单次 commit）；
+    整批失败时逐行 SAVEPOINT 重试，隔离坏行。
+    """
+    written = [False] * len(events)
+    alert_ids: List[Optional[int]] = [None] * len(events)
+    t0 = time.perf_counter()
     try:
-        data = json.loads(msg.payload.decode("utf-8"))
-        # 需要字段：elderly_id, access_type(IN/OUT), record_time, gate_location
-        if not all(k in data for k in ("elderly_id", "access_type", "record_time", "gate_location")):
-            logger.debug("门禁消息忽略：缺少必需字段")
-            return
-        elderly_id = int(data["elderly_id"])
-        access_type = str(data["access_type"]).upper()
-        record_time = _parse_time(str(data["record_time"]))
-        gate_location = str(data["gate_location"]) or ""
-        if access_type not in ("IN", "OUT"):
-            logger.debug("门禁消息忽略：access_type 非 IN/OUT")
-            return
-        # 入库 access_record（是否标记 is_abnormal 由业务定义；此处统一为 NO）
+        # 外键预检：与健康记录写库同一策略（见 ElderIndex.resolve），不存在的老人跳过写库
+        exists = elder_index.resolve(db, {int(ev["elderly_id"]) for ev in events}).__contains__
+        idx = [i for i, ev in enumerate(events) if exists(int(ev["elderly_id"]))]
+        metrics.inc("access.rows.skipped_fk", len(events) - len(idx))
+        if not idx:
+            return written, alert_ids
+        alert_idx = [i for i in idx if alerts[i] is not None]
         try:
-            with SessionLocal() as db:
-                rec = AccessRecord(
-                    elderly_id=elderly_id,
-                    access_type=access_type,
-                    record_time=record_time,
-                    gate_location=gate_location,
-                    is_abnormal="NO",
-                )
-                db.add(rec)
-                db.commit()
+            access_record_dao.bulk_insert(db, [_access_row(events[i]) for i in idx])
+            new_ids = alert_dao.bulk_insert_returning_ids(db, [alerts[i] for i in alert_idx])
+            db.commit()
+            for i in idx:
+                written[i] = True
+            for i, aid in zip(alert_idx, new_ids):
+                alert_ids[i] = aid
         except Exception as e:
-            logger.warning(f"门禁记录入库失败：{e}")
-        # 更新个性化引擎与告警
-        try:
-            if access_type == "OUT":
-                access_anomaly_engine.on_out(elderly_id, record_time)
-            else:
-                ev = access_anomaly_engine.on_in(elderly_id, record_time)
-                if ev and ev.get("personal_abnormal"):
-                    # 落库 alerts
+            db.rollback()
+            logger.warning(f"门禁记录批量写入失败，改为逐行写入：{e}")
+            for i in idx:
+                try:
+                    with db.begin_nested():
+                        access_record_dao.bulk_insert(db, [_access_row(events[i])])
+                        aid = alert_dao.bulk_insert_returning_ids(db, [alerts[i]]) if alerts[i] else []
+                    written[i] = True
+                    alert_ids[i] = aid[0] if aid else None
+                except Exception as row_err:
+                    metrics.inc("access.rows.failed")
+                    logger.warning(f"门禁记录入库失败（已跳过该行）：{row_err}")
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"门禁记录入库失败：{e}")
+    finally:
+        metrics.observe("access.flush.ms", (time.perf_counter() - t0) * 1000)
+        metrics.observe("access.batch.size", len(events), buckets=BATCH_SIZE_BUCKETS)
+        metrics.inc("access.rows.written", sum(written))
+    return written, alert_ids
+
+
+def _worker_access_db():
+    # 后台工作线程：攒批，按序更新个性化引擎，门禁记录与告警同事务入库，再 WS 广播
+    from app.api.v1.ws import push_warning
+
+    with SessionLocal() as db:
+        while True:
+            # 批大小 / linger 自适应（与健康数据分片同一组边界）
+            units = drain_batch(ACCESS_Q, ACCESS_BATCHER.size, ACCESS_BATCHER.linger_s)
+            events = [ev for _, evs in units for ev in evs]
+            try:
+                now = time.monotonic()
+                for enq_ts, _ in units:
+                    metrics.observe("access.queue.lag.ms", (now - enq_ts) * 1000)
+                # 更新个性化引擎（按到达顺序）
+                alerts: List[Optional[Dict[str, Any]]] = []
+                for ev in events:
+                    row = None
                     try:
-                        from app.models.alert import Alert
-                        with SessionLocal() as db:
-                            alert = Alert(
-                                elderly_id=elderly_id,
-                                monitor_type=str(ev["type"]),
-                                monitor_value=float(ev["duration_hours"]),
-                                monitor_time=record_time,
-                                device_id="gate",
-                                global_abnormal=0,
-                                personal_abnormal=1,
-                                score=ev.get("score"),
-                                confidence=None,
-                                k=settings.ACCESS_K_SIGMA,
-                                n=ev.get("n"),
-                                mu=ev.get("mu"),
-                                sigma=ev.get("sigma"),
-                                ack_status="UNACKED",
-                            )
-                            db.add(alert)
-                            db.commit()
+                        if ev["access_type"] == "OUT":
+                            access_anomaly_engine.on_out(ev["elderly_id"], ev["record_time"])
+                        else:
+                            r = access_anomaly_engine.on_in(ev["elderly_id"], ev["record_time"])
+                            if r and r.get("personal_abnormal"):
+                                ev["anomaly"] = r
+                                row = _access_alert_row(ev["elderly_id"], ev["record_time"], r)
                     except Exception as e:
-                        logger.warning(f"门禁告警持久化失败：{e}")
+                        logger.warning(f"门禁个性化计算失败：{e}")
+                    alerts.append(row)
+                t0 = time.perf_counter()
+                written, alert_ids = _write_access_batch(db, events, alerts)
+                ACCESS_BATCHER.observe(len(events), (time.perf_counter() - t0) * 1000, ACCESS_Q.qsize())
+                for ev, row, wrote, aid in zip(events, alerts, written, alert_ids):
+                    if row is None:
+                        continue
+                    r = ev["anomaly"]
                     # WS 广播
-                    payload = {
-                        "elderly_id": elderly_id,
-                        "monitor_type": ev["type"],
-                        "monitor_value": ev["duration_hours"],
-                        "monitor_time": record_time.isoformat(),
+                    push_warning({
+                        "alert_id": aid,
+                        "elderly_id": ev["elderly_id"],
+                        "monitor_type": r["type"],
+                        "monitor_value": r["duration_hours"],
+                        "monitor_time": ev["record_time"].isoformat(),
                         "device_id": "gate",
-                        "db_written": False,
+                        "db_written": wrote,
                         "anomaly": {
                             "global": False,
                             "personal": True,
-                            "score": ev.get("score"),
+                            "score": r.get("score"),
                             "confidence": None,
                             "k": settings.ACCESS_K_SIGMA,
-                            "n": ev.get("n"),
-                            "mu": ev.get("mu"),
-                            "sigma": ev.get("sigma"),
+                            "n": r.get("n"),
+                            "mu": r.get("mu"),
+                            "sigma": r.get("sigma"),
                         },
-                    }
-                    push_warning(payload)
-        except Exception as e:
-            logger.warning(f"门禁个性化计算失败：{e}")
+                    })
+            except Exception as e:
+                logger.exception(f"门禁批处理异常：{e}")
+            finally:
+                for _ in units:
+                    ACCESS_Q.task_done()
+
+
+def _on_message(client, userdata, msg):
+    # paho 网络线程内只做解码与入队，不触达数据库
+    try:
+        data = json.loads(msg.payload.decode("utf-8"))
+        # 需要字段：elderly_id, access_type(IN/OUT), record_time, gate_location
+        if not all(k in data for k in ("elderly_id", "access_type", "record_time", "gate_location")):
+            logger.debug("门禁消息忽略：缺少必需字段")
+            return
+        access_type = str(data["access_type"]).upper()
+        if access_type not in ("IN", "OUT"):
+            logger.debug("门禁消息忽略：access_type 非 IN/OUT")
+            return
+        ev = {
+            "elderly_id": int(data["elderly_id"]),
+            "access_type": access_type,
+            "record_time": _parse_time(str(data["record_time"])),
+            "gate_location": str(data["gate_location"]) or "",
+        }
+        try:
+            ACCESS_Q.put_nowait((time.monotonic(), [ev]))
+        except queue.Full:
+            metrics.inc("access.queue.dropped")
+            logger.warning("门禁消息入队失败：队列已满")
     except Exception as e:
         logger.debug(f"门禁消息解析异常：{e}")
 
 
 def start_access_consumer():
+    # 写库工作线程
+    threading.Thread(target=_worker_access_db, name="access-db-worker", daemon=True).start()
     # 周期检查线程
     threading.Thread(target=_worker_periodic_check, name="access-periodic", daemon=True).start()
 
-    # MQTT 客户端订阅门禁主题
-    try:
-        import paho.mqtt.client as mqtt
-    except Exception as e:
-        logger.warning(f"MQTT未启用：缺少 paho-mqtt 依赖（{e}）")
-        return
-    c = mqtt.Client(client_id=f"{settings.MQTT_CLIENT_ID}_access", clean_session=True)
-    c.on_message = _on_message
-    try:
-        c.connect(settings.MQTT_BROKER_URL, settings.MQTT_BROKER_PORT, keepalive=30)
-        c.subscribe(settings.MQTT_ACCESS_TOPIC, qos=1)
-        threading.Thread(target=c.loop_forever, name="mqtt-access-loop", daemon=True).start()
-        logger.info(f"门禁订阅启动：tcp://{settings.MQTT_BROKER_URL}:{settings.MQTT_BROKER_PORT} topic={settings.MQTT_ACCESS_TOPIC}")
-    except Exception as e:
-        logger.warning(f"门禁MQTT未连接：{e}（启动不中断）")
-        return
+    # 注册门禁主题到统一 MQTT 连接（由 mqtt_router.start() 建立连接）
+    mqtt_router.register(settings.MQTT_ACCESS_TOPIC, _on_message, qos=1)
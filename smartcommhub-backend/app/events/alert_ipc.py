@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+预警 IPC（独立摄取进程 -> API 进程）
+- 背景：uvicorn --workers N 时，每个 worker 各自订阅 MQTT、各持一份 anomaly_engine 并重复写库；
+  独立摄取进程（python -m app.ingest）单实例订阅/评分/写库，API worker 只负责 HTTP 与 WS。
+- 通道：Unix 域套接字（INGEST_IPC_SOCKET）。openGauss 不支持 LISTEN/NOTIFY，故不走数据库。
+  - 摄取进程为服务端（AlertHub），每条预警编码为一行 JSON，扇出到所有已连接的 API worker；
+  - API worker 为客户端（run_alert_subscriber），逐行读取后 publish_warning()，断线按退避重连。
+- 慢订阅者：单连接发送积压超过 INGEST_IPC_BUFFER_KB 时丢弃发往该连接的新预警（计数），不阻塞摄取。
+- 控制消息（API -> 摄取进程，同一连接反向逐行 JSON，send_control）：API 侧老人增删/护理等级变更与规则重载、设备缓存失效
+  同步到摄取进程的老人ID索引、规则表与设备注册表（未连接时丢弃，由摄取进程的定时重载/查库兜底）。
+  连接变化时通知老人ID索引（elder_index.set_feed）：无 API 连接或重连后的全量重载完成前，
+  写库外键预检对未命中的 ID 回退为查库确认。
+- 统计：ipc.hub（连接数、发送/丢弃条数、控制消息数）；API 侧 ipc.received / ipc.control。
+"""
+from __future__ import annotations
+import asyncio
+import json
+import os
+import socket
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+from app.services.edge.elder_index import elder_index
+
+
+def socket_path() -> Path:
+    p = Path(settings.INGEST_IPC_SOCKET)
+    if not p.is_absolute():
+        p = Path(__file__).resolve().parents[2] / p
+    return p
+
+
+class AlertHub:
+    """摄取进程侧：Unix socket 服务端，向所有订阅连接扇出预警。"""
+
+    def __init__(self, path: Path, buffer_bytes: int):
+        self.path = path
+        self.buffer_bytes = max(1, buffer_bytes)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self.sent = 0
+        self.dropped = 0
+        self.controls = 0
+        self._clients = 0
+
+    async def start(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            # 残留套接字：能连上说明已有摄取进程在运行
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.path))
+                raise RuntimeError(f"摄取进程已在运行（{self.path}）")
+            except (ConnectionRefusedError, FileNotFoundError):
+                self.path.unlink(missing_ok=True)
+            finally:
+                probe.close()
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_unix_server(self._on_client, path=str(self.path))
+        os.chmod(self.path, 0o660)
+        elder_index.set_feed(False)  # 尚无 API 连接：增量变更收不到
+        metrics.register_collector("ipc.hub", self.stats)
+        logger.info(f"预警 IPC 已监听：{self.path}")
+
+    async def _on_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        self._clients += 1
+        elder_index.set_feed(True)
+        logger.info(f"API 进程已订阅预警（当前 {len(self._writers)} 个）")
+        try:
+            while True:
+                line = await reader.readline()  # 客户端只发送控制消息；读到 EOF 即断开
+                if not line:
+                    break
+                try:
+                    await _apply_control(json.loads(line))
+                    self.controls += 1
+                except Exception as e:
+                    logger.warning(f"预警 IPC 控制消息处理失败：{e}")
+        except Exception:
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._clients -= 1
+            elder_index.set_feed(self._clients > 0)
+            writer.close()
+
+    def _fanout(self, line: bytes) -> None:
+        for w in list(self._writers):
+            if w.is_closing():
+                self._writers.discard(w)
+                continue
+            if w.transport.get_write_buffer_size() > self.buffer_bytes:
+                self.dropped += 1
+                continue
+            w.write(line)
+            self.sent += 1
+
+    def publish(self, payload: Dict[str, Any]) -> None:
+        """线程安全：可从工作线程或事件循环内调用（用作 ws.set_warning_sink 的钩子）。"""
+        if self._loop is None:
+            return
+        line = (json.dumps(payload, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        self._loop.call_soon_threadsafe(self._fanout, line)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for w in list(self._writers):
+            w.close()
+        self._writers.clear()
+        self.path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"subscribers": len(self._writers), "sent": self.sent, "dropped": self.dropped, "controls": self.controls}
+
+
+async def _apply_control(msg: Dict[str, Any]) -> None:
+    """摄取进程侧：应用 API 进程发来的控制消息。"""
+    from app.services.edge.device_registry import device_registry
+    from app.services.edge.vital_rules import vital_rules
+
+    op = msg.get("op")
+    if op == "elder":
+        eid = int(msg["elderly_id"])
+        if msg.get("deleted"):
+            elder_index.discard(eid)
+        else:
+            elder_index.add(eid)
+        if "level" in msg:
+            await asyncio.to_thread(vital_rules.set_elder_level, eid, msg["level"])
+    elif op == "device":
+        device_registry.invalidate(str(msg["device_id"]))
+    elif op == "rules_reload":
+        await asyncio.to_thread(vital_rules.reload, True)
+    else:
+        raise ValueError(f"未知控制消息：{op}")
+
+
+# API 进程侧当前连接（事件循环, 写端）；未连接时为 None
+_CONTROL: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.StreamWriter]] = None
+
+
+def send_control(msg: Dict[str, Any]) -> bool:
+    """线程安全：API 进程向摄取进程发送控制消息；未连接（含内嵌摄取模式）时返回 False。"""
+    conn = _CONTROL
+    if conn is None:
+        return False
+    loop, writer = conn
+    line = (json.dumps(msg, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+    loop.call_soon_threadsafe(writer.write, line)
+    metrics.inc("ipc.control")
+    return True
+
+
+async def run_alert_subscriber(path: Optional[Path] = None) -> None:
+    """API 进程侧：连接摄取进程的预警套接字，收到的预警交给本进程 WS 广播；断线按退避重连。"""
+    from app.api.v1.ws import publish_warning  # 延迟导入，避免循环依赖
+
+    global _CONTROL
+    path = path or socket_path()
+    delay = 1.0
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(str(path), limit=1 << 20)
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            logger.debug(f"预警 IPC 未就绪（{e}），{delay:.0f}s 后重试")
+            await asyncio.sleep(delay)
+            delay = min(30.0, delay * 2)
+            continue
+        logger.info(f"已连接摄取进程预警通道：{path}")
+        delay = 1.0
+        _CONTROL = (asyncio.get_running_loop(), writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    publish_warning(json.loads(line))
+                    metrics.inc("ipc.received")
+                except ValueError:
+                    metrics.inc("ipc.corrupt")
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            logger.warning(f"预警 IPC 连接异常：{e}")
+        finally:
+            _CONTROL = None
+            writer.close()
+        logger.warning("摄取进程预警通道已断开，稍后重连")
+        await asyncio.sleep(delay)
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio 原生摄取管线（可选：INGEST_MODE=asyncio）
+- 与线程模式（paho 网络线程 -> queue.Queue -> 写库工作线程 -> deque 轮询广播）并列，全部运行在 FastAPI 事件循环上：
+    aiomqtt 客户端 -> 按 elderly_id 分片的 asyncio.Queue -> 写库协程（asyncpg 连接池）
+    -> ws.publish_warning()（asyncio.Queue 直达广播协程，无 200ms 轮询）
+- 分片、校验、去重、快速通道分流、重排、评分、告警行构造、写库（AsyncSession.run_sync）与 WS 消息格式复用 mqtt_consumer，
+  两种模式行为一致；指标名相同。
+- 线程池：解码/校验在事件循环上内联执行（设备注册表读取不查库，首次出现的设备交后台线程），不为每条消息付线程切换；
+  评分持异常引擎锁、可能与线程模式/门禁线程争用，每批一次交线程池执行，不阻塞事件循环。
+- 背压：分片队列满时 await put，暂停读取 MQTT（由 Broker 侧缓冲）；此模式不使用磁盘缓冲。
+- 门禁主题仍走 mqtt_router（线程模式），两种模式可同时存在。
+- 依赖：aiomqtt~=1.2（基于 paho-mqtt 1.6）、asyncpg；缺失时记录 warning，由调用方回退为线程模式。
+- 压测对比：tests/bench_ingest_modes.py（消息吞吐与 MQTT->WS 端到端 p99 延迟）。
+"""
+from __future__ import annotations
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.database import _normalize_url
+from app.core.logging import logger
+from app.core.metrics import metrics
+from app.events.batching import LANE_FAST, LANE_NORMAL, drain_batch_async, is_fast
+from app.events.mqtt_consumer import (
+    N_WORKERS,
+    _Shard,
+    _admit,
+    _decode_binary,
+    _decode_json,
+    _finish_batch,
+    _order_batch,
+    _score_alerts,
+    _unit,
+    _write_batch,
+)
+from app.events.mqtt_router import mqtt_router
+
+
+_SHARDS: List[_Shard] = []
+_TASKS: List["asyncio.Task"] = []
+_ENGINE = None
+
+
+def _async_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    # postgresql+psycopg2:// / postgresql:// -> postgresql+asyncpg://
+    return re.sub(r"^postgresql(\+\w+)?://", "postgresql+asyncpg://", _normalize_url(settings.DATABASE_URL), count=1)
+
+
+def _create_async_engine():
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    eng = create_async_engine(
+        _async_url(),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=True,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        echo=settings.DEBUG,
+        connect_args={"server_settings": {
+            "client_encoding": settings.DB_CLIENT_ENCODING,
+            "search_path": settings.DB_SEARCH_PATH,
+        }},
+    )
+    # openGauss 版本串无法解析时给出保底版本（同 app/core/database.py）
+    dialect = eng.sync_engine.dialect
+    orig = dialect._get_server_version_info
+
+    def _patched(connection):
+        try:
+            return orig(connection)
+        except AssertionError:
+            return (14, 0)
+
+    dialect._get_server_version_info = _patched
+    return eng
+
+
+async def _writer(shard: _Shard, session_factory) -> None:
+    # 写库协程（每分片一个）：攒批、按序评分，同事务入库，再直达 WS 广播
+    # 重排/评分/告警构造/写库与线程模式共用同一份实现；写库经 AsyncSession.run_sync 在 asyncpg 连接上执行
+    from app.api.v1.ws import publish_warning  # 延迟导入，避免循环依赖
+
+    reorder = shard.reorder
+    batcher = shard.batcher
+    async with session_factory() as db:
+        while True:
+            wait_s = reorder.next_due() if reorder is not None else None
+            units = await drain_batch_async(shard.q, batcher.size, batcher.linger_s, wait_s, urgent=is_fast)
+            batch: List[Dict[str, Any]] = []
+            try:
+                batch = _order_batch(shard, units)
+                if not batch:
+                    continue
+                personals, alerts = await asyncio.to_thread(_score_alerts, batch)
+                t0 = time.perf_counter()
+                written, alert_ids = await db.run_sync(_write_batch, batch, alerts)
+                cost_ms = (time.perf_counter() - t0) * 1000
+                _finish_batch(shard, units, batch, personals, alerts, written, alert_ids, cost_ms, publish_warning)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"健康数据批处理异常：{e}")
+            finally:
+                shard.processed += len(batch)
+
+
+async def _dispatch(items: List[Dict[str, Any]], rejected: int, counts: Optional[Dict[str, int]] = None) -> int:
+    """准入后按分片入队（队列满则等待）；返回入队条数（限流/重复条数见 counts）。"""
+    by_shard: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+    admitted = _admit(items, rejected, counts)
+    for item in admitted:
+        lane = LANE_FAST if item.get("fast") else LANE_NORMAL
+        by_shard.setdefault((hash(int(item["elderly_id"])) % N_WORKERS, lane), []).append(item)
+    for (idx, lane), readings in by_shard.items():
+        shard = _SHARDS[idx]
+        await shard.q.put(_unit(lane, readings))  # 满则等待（背压到 MQTT 读取）
+        shard.enqueued += len(readings)
+        if lane == LANE_FAST:
+            shard.fast += len(readings)
+    return len(admitted)
+
+
+def is_running() -> bool:
+    return bool(_TASKS)
+
+
+async def _mqtt_loop() -> None:
+    # 订阅循环：断线按指数退避重连（MQTT_RECONNECT_MIN_SECONDS ~ MQTT_RECONNECT_MAX_SECONDS）
+    import aiomqtt
+
+    lo = max(1, settings.MQTT_RECONNECT_MIN_SECONDS)
+    hi = max(lo, settings.MQTT_RECONNECT_MAX_SECONDS)
+    delay = lo
+    topics = [t for t in (settings.MQTT_TOPIC, settings.MQTT_BINARY_TOPIC) if t]
+    while True:
+        try:
+            async with aiomqtt.Client(
+                settings.MQTT_BROKER_URL,
+                settings.MQTT_BROKER_PORT,
+                client_id=mqtt_router.client_id("_async"),
+                keepalive=settings.MQTT_KEEPALIVE,
+                clean_session=True,
+            ) as client:
+                async with client.messages() as messages:
+                    for t in topics:
+                        await client.subscribe(t, qos=1)
+                    logger.info(
+                        f"MQTT(asyncio)已连接：tcp://{settings.MQTT_BROKER_URL}:{settings.MQTT_BROKER_PORT} topics={topics}"
+                    )
+                    delay = lo
+                    async for msg in messages:
+                        binary = bool(settings.MQTT_BINARY_TOPIC) and msg.topic.matches(settings.MQTT_BINARY_TOPIC)
+                        try:
+                            items, rejected = (_decode_binary if binary else _decode_json)(msg.payload)
+                        except Exception as e:
+                            logger.debug(f"MQTT消息解析异常：{e}")
+                            continue
+                        await _dispatch(items, rejected)
+        except aiomqtt.MqttError as e:
+            logger.warning(f"MQTT(asyncio)连接断开：{e}，{delay}s 后重连")
+            await asyncio.sleep(delay)
+            delay = min(hi, delay * 2)
+
+
+def start_async_ingest() -> bool:
+    """
+    在当前事件循环上启动 asyncio 摄取管线（须在协程内调用，如 FastAPI startup）。
+    依赖缺失或引擎创建失败时返回 False，调用方应回退为线程模式。
+    """
+    global _ENGINE
+    if _TASKS:
+        return True
+    try:
+        import aiomqtt  # noqa: F401  按需导入
+        import asyncpg  # noqa: F401
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+
+        _ENGINE = _create_async_engine()
+    except Exception as e:
+        logger.warning(f"asyncio 摄取模式未启用：{e}（回退为线程模式）")
+        return False
+    session_factory = async_sessionmaker(_ENGINE, autoflush=False, expire_on_commit=False)
+    _SHARDS[:] = [_Shard(i, asyncio.PriorityQueue(maxsize=settings.MQTT_QUEUE_MAXSIZE)) for i in range(N_WORKERS)]
+    metrics.register_collector("ingest.async.shards", lambda: [sh.stats() for sh in _SHARDS])
+    for sh in _SHARDS:
+        _TASKS.append(asyncio.create_task(_writer(sh, session_factory), name=f"ingest-writer-{sh.idx}"))
+    _TASKS.append(asyncio.create_task(_mqtt_loop(), name="ingest-mqtt"))
+    logger.info(f"asyncio 摄取模式已启动：{N_WORKERS} 个写库协程")
+    return True
+
+
+async def stop_async_ingest() -> None:
+    global _ENGINE
+    for t in _TASKS:
+        t.cancel()
+    await asyncio.gather(*_TASKS, return_exceptions=True)
+    _TASKS.clear()
+    if _ENGINE is not None:
+        await _ENGINE.dispose()
+        _ENGINE = None
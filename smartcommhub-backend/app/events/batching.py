@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+订阅端写库攒批（健康数据 / 门禁共用）
+- 队列元素为“单元” (入队时间, 记录列表)；按记录条数计批，不按单元数。
+- drain_batch 用于线程模式（queue.Queue），drain_batch_async 用于 asyncio 模式（asyncio.Queue），语义一致。
+- 优先级队列（健康数据分片）的元素为 LaneUnit (通道, 序号, 入队时间, 记录列表)，通道 0 为快速通道：
+  传入 urgent 时，取到紧急元素即停止攒批立即返回（不等 linger）。
+- AdaptiveBatcher：按提交耗时与队列积压自适应调整批大小与 linger（AIMD），
+  写库线程/协程每次攒批前取 size / linger_s，提交后 observe()。
+"""
+from __future__ import annotations
+import asyncio
+import queue
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+Unit = Tuple[float, List[Dict[str, Any]]]  # (入队时间 monotonic, 记录列表)
+LaneUnit = Tuple[int, int, float, List[Dict[str, Any]]]  # (通道, 序号, 入队时间, 记录列表)
+
+LANE_FAST = 0    # 异常读数：立即评分、入库、广播
+LANE_NORMAL = 1  # 正常读数：攒批写入
+
+
+def is_fast(u: LaneUnit) -> bool:
+    return u[0] == LANE_FAST
+
+
+# 批大小直方图桶（条）
+BATCH_SIZE_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class AdaptiveBatcher:
+    """
+    批大小 / linger 的 AIMD 调节（每个写库线程一个实例，非线程安全）：
+    - 提交耗时 > target_ms：批大小乘性减半、linger 加倍（数据库吃紧，少提交、小事务）；
+    - 提交正常且有积压（本批攒满或队列深度 >= 批大小）：批大小加性增加 step（高峰期提吞吐）；
+    - 提交正常且空闲（队列为空、本批不足半批）：linger 减半（夜间低负载，降低延迟）。
+    批大小限定在 [min_size, max_size]，linger 限定在 [min_linger_ms, max_linger_ms]。
+    enabled=False 时固定为 max_size / max_linger_ms（即静态配置）。
+    """
+
+    def __init__(
+        self, name: str, min_size: int, max_size: int, min_linger_ms: float, max_linger_ms: float,
+        target_ms: float, step: int, enabled: bool = True,
+    ):
+        self.name = name
+        self.max_size = max(1, max_size)
+        self.min_size = max(1, min(min_size, self.max_size))
+        self.max_linger_ms = max(0.0, max_linger_ms)
+        self.min_linger_ms = max(0.0, min(min_linger_ms, self.max_linger_ms))
+        self.target_ms = max(1.0, target_ms)
+        self.step = max(1, step)
+        self.enabled = enabled
+        self.size = self.min_size if enabled else self.max_size
+        self.linger_ms = self.max_linger_ms
+        self.increases = 0
+        self.decreases = 0
+        self._publish()
+
+    @property
+    def linger_s(self) -> float:
+        return self.linger_ms / 1000.0
+
+    def _publish(self) -> None:
+        metrics.set(f"{self.name}.batch.target_size", self.size)
+        metrics.set(f"{self.name}.batch.linger_ms", round(self.linger_ms, 2))
+
+    def observe(self, n: int, cost_ms: float, depth: int) -> None:
+        """一次提交后调用：n 为本批条数，cost_ms 为提交耗时，depth 为提交后队列深度。"""
+        if not self.enabled or n <= 0:
+            return
+        if cost_ms > self.target_ms:
+            size = max(self.min_size, self.size // 2)
+            linger = min(self.max_linger_ms, max(self.linger_ms * 2, 1.0))
+            if size < self.size:
+                self.decreases += 1
+        elif n >= self.size or depth >= self.size:
+            size = min(self.max_size, self.size + self.step)
+            linger = self.linger_ms
+            if size > self.size:
+                self.increases += 1
+        elif depth == 0 and n * 2 < self.size:
+            size = self.size
+            linger = max(self.min_linger_ms, self.linger_ms / 2)
+        else:
+            return
+        if size != self.size or linger != self.linger_ms:
+            self.size, self.linger_ms = size, linger
+            self._publish()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "linger_ms": round(self.linger_ms, 2),
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
+
+
+def commit_target_ms() -> float:
+    """
+    目标提交耗时：显式配置优先；否则取 DB_POOL_TIMEOUT 的 1/20 与 INGEST_FLUSH_WARN_MS 的 1/5 中较小者。
+    写库线程提交期间独占一个连接池连接，提交越长，API 请求越可能在 DB_POOL_TIMEOUT 内拿不到连接。
+    """
+    if settings.INGEST_COMMIT_TARGET_MS > 0:
+        return float(settings.INGEST_COMMIT_TARGET_MS)
+    return min(settings.DB_POOL_TIMEOUT * 1000 / 20, settings.INGEST_FLUSH_WARN_MS / 5)
+
+
+def make_batcher(name: str) -> AdaptiveBatcher:
+    """按 INGEST_BATCH_* 配置创建调节器（健康数据各分片与门禁写库线程共用同一组边界）。"""
+    return AdaptiveBatcher(
+        name,
+        min_size=settings.INGEST_BATCH_MIN_SIZE,
+        max_size=settings.INGEST_BATCH_MAX_SIZE,
+        min_linger_ms=settings.INGEST_BATCH_MIN_LINGER_MS,
+        max_linger_ms=settings.INGEST_BATCH_LINGER_MS,
+        target_ms=commit_target_ms(),
+        step=settings.INGEST_BATCH_STEP,
+        enabled=settings.INGEST_BATCH_ADAPTIVE,
+    )
+
+
+def drain_batch(
+    q: "queue.Queue", max_size: int, linger_s: float, wait_s: Optional[float] = None,
+    urgent: Optional[Callable[[Any], bool]] = None,
+) -> List[Any]:
+    """
+    取到第一个单元后继续攒批：记录满 max_size 条或等待超过 linger_s 即返回。
+    wait_s 为等待第一个单元的超时（None 表示一直阻塞），超时返回空列表。
+    urgent 判定为紧急的单元出现后不再等待：只继续带走已就绪的紧急单元，遇到非紧急单元即返回。
+    """
+    try:
+        units = [q.get(timeout=wait_s)]
+    except queue.Empty:
+        return []
+    total = len(units[0][-1])
+    deadline = time.monotonic() + linger_s
+    hurry = urgent is not None and urgent(units[0])
+    while total < max_size:
+        try:
+            if hurry:
+                u = q.get_nowait()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                u = q.get(timeout=remaining)
+        except queue.Empty:
+            break
+        units.append(u)
+        total += len(u[-1])
+        if urgent is not None:
+            if urgent(u):
+                hurry = True
+            elif hurry:
+                break
+    return units
+
+
+async def drain_batch_async(
+    q: "asyncio.Queue", max_size: int, linger_s: float, wait_s: Optional[float] = None,
+    urgent: Optional[Callable[[Any], bool]] = None,
+) -> List[Any]:
+    """drain_batch 的协程版本（asyncio.Queue）；取出的单元无需 task_done。"""
+    try:
+        units = [await asyncio.wait_for(q.get(), wait_s) if wait_s is not None else await q.get()]
+    except asyncio.TimeoutError:
+        return []
+    total = len(units[0][-1])
+    deadline = time.monotonic() + linger_s
+    hurry = urgent is not None and urgent(units[0])
+    while total < max_size:
+        try:
+            u = q.get_nowait()
+        except asyncio.QueueEmpty:
+            remaining = deadline - time.monotonic()
+            if hurry or remaining <= 0:
+                break
+            try:
+                u = await asyncio.wait_for(q.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+        units.append(u)
+        total += len(u[-1])
+        if urgent is not None:
+            if urgent(u):
+                hurry = True
+            elif hurry:
+                break
+    return units
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP 批量上报（无法使用 MQTT 的站点）：POST /api/health-records/bulk
+- 请求体：NDJSON（每行一个读数或 {"device_id":..., "elderly_id":..., "readings":[...]} 信封）
+  或 JSON 数组（[{...}, {...}]）；首个非空白字符为 "[" 且首行不是完整 JSON 值时按数组解析，否则按 NDJSON（行可为数组）。
+- 流式解析：逐块读取请求体（request.stream()），增量 UTF-8 解码 + JSONDecoder.raw_decode 逐个取出元素，
+  不把整个请求体读入内存；单个元素超过 HTTP_INGEST_MAX_LINE_KB 视为错误并中止。
+- 与 MQTT 共用同一管线：_normalize 校验 -> 去重/限流/分流（_admit）-> 分片队列 -> 评分、攒批写库、WS 预警。
+  每 HTTP_INGEST_CHUNK_SIZE 条提交一次；线程模式下校验与入队放到线程池，避免阻塞事件循环。
+- 管线归属：
+  - 本进程已运行订阅端（INGEST_EMBEDDED=true）时直接投递（asyncio 模式投递到协程管线）；
+  - 未启用 MQTT 时首次请求按需启动写库工作线程（start_workers）；
+  - 订阅端运行在独立摄取进程（INGEST_EMBEDDED=false）时返回 503，避免两个进程各持一份基线状态。
+- 返回：逐行（line，从 1 起）计数的 accepted（通过校验）/ rejected / queued（实际入队条数），
+  以及 rate_limited / duplicate（通过校验但被限流、判为重复而未入队的条数）和前若干条错误明细。
+"""
+from __future__ import annotations
+import codecs
+import json
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+_WS = " \t\r\n"
+_DELIM = _WS + ",]"
+MAX_ERRORS = 20
+
+
+class StreamFormatError(ValueError):
+    pass
+
+
+class _StreamParser:
+    """增量 JSON 元素解析器：feed(文本) 后 drain() 取出已完整的 (行号, 对象或错误)。"""
+
+    def __init__(self, max_item_chars: int):
+        self.buf = ""
+        self.pos = 0
+        self.mode: Optional[str] = None  # "ndjson" | "array"
+        self.done = False                # 数组已读到 "]"
+        self.expect_sep = False          # 数组模式：上一个元素之后应为 "," 或 "]"
+        self.line = 0
+        self.max_item_chars = max_item_chars
+        self._dec = json.JSONDecoder()
+
+    def feed(self, text: str) -> None:
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += text
+
+    def _skip_ws(self) -> None:
+        buf, i, n = self.buf, self.pos, len(self.buf)
+        while i < n and buf[i] in _WS:
+            i += 1
+        self.pos = i
+
+    def drain(self, final: bool = False) -> Iterator[Tuple[int, Any, Optional[str]]]:
+        if self.mode is None:
+            self._skip_ws()
+            if self.pos >= len(self.buf):
+                return
+            mode = self._detect(final)
+            if mode is None:
+                return  # 首行尚不完整，等待更多数据
+            self.mode = mode
+            if mode == "array":
+                self.pos += 1
+        if self.mode == "ndjson":
+            yield from self._drain_ndjson(final)
+        else:
+            yield from self._drain_array(final)
+
+    def _detect(self, final: bool) -> Optional[str]:
+        """
+        以 "[" 开头时区分 JSON 数组与「首行恰为数组」的 NDJSON：首行本身是完整 JSON 值（且不超长）即为 NDJSON，
+        否则（数组跨多行）为 JSON 数组；单行数组两种解释结果相同。
+        """
+        if self.buf[self.pos] != "[":
+            return "ndjson"
+        nl = self.buf.find("\n", self.pos)
+        if nl < 0:
+            if not final and len(self.buf) - self.pos <= self.max_item_chars:
+                return None
+            return "array"
+        if nl - self.pos > self.max_item_chars:
+            return "array"
+        try:
+            json.loads(self.buf[self.pos:nl])
+        except ValueError:
+            return "array"
+        return "ndjson"
+
+    def _drain_ndjson(self, final: bool) -> Iterator[Tuple[int, Any, Optional[str]]]:
+        while True:
+            nl = self.buf.find("\n", self.pos)
+            if nl < 0:
+                if len(self.buf) - self.pos > self.max_item_chars:
+                    raise StreamFormatError(f"第 {self.line + 1} 行超过 {settings.HTTP_INGEST_MAX_LINE_KB} KB")
+                if not final:
+                    return
+                nl = len(self.buf)
+            text = self.buf[self.pos:nl].strip()
+            self.pos = min(nl + 1, len(self.buf))
+            if text:
+                self.line += 1
+                try:
+                    yield self.line, json.loads(text), None
+                except ValueError as e:
+                    yield self.line, None, f"JSON 解析失败：{e.msg}"
+            if self.pos >= len(self.buf):
+                return
+
+    def _drain_array(self, final: bool) -> Iterator[Tuple[int, Any, Optional[str]]]:
+        while not self.done:
+            self._skip_ws()
+            if self.pos >= len(self.buf):
+                break
+            c = self.buf[self.pos]
+            if c == "]":
+                self.done = True
+                self.pos += 1
+                break
+            if self.expect_sep:
+                if c != ",":
+                    raise StreamFormatError(f"第 {self.line} 个元素之后缺少逗号")
+                self.pos += 1
+                self.expect_sep = False
+                continue
+            try:
+                obj, end = self._dec.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # 元素不完整：等待更多数据；已到结尾或超长则为格式错误
+                if final or len(self.buf) - self.pos > self.max_item_chars:
+                    raise StreamFormatError(f"第 {self.line + 1} 个元素无法解析：{e.msg}")
+                break
+            if not final and not isinstance(obj, (dict, list, str)) and (
+                end >= len(self.buf) or self.buf[end] not in _DELIM
+            ):
+                break  # 数字可能在块边界被截断（如 "2e|3"），见到分隔符后再解析
+            self.line += 1
+            self.pos = end
+            self.expect_sep = True
+            yield self.line, obj, None
+        if final and not self.done:
+            raise StreamFormatError("JSON 数组未闭合")
+
+
+def _expand(obj: Any) -> Tuple[List[Any], Dict[str, Any]]:
+    """一行 -> (读数列表, 缺省字段)；信封按 device_id / elderly_id 作为各条读数的缺省值。"""
+    if isinstance(obj, dict) and isinstance(obj.get("readings"), list):
+        return obj["readings"], {k: obj[k] for k in ("device_id", "elderly_id") if k in obj}
+    if isinstance(obj, list):
+        return obj, {}
+    return [obj], {}
+
+
+class BulkResult:
+    def __init__(self):
+        self.lines = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.duplicate = 0
+        self.rejected_lines = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def dropped(self, counts: Dict[str, int]) -> None:
+        self.rate_limited += counts.get("rate_limited", 0)
+        self.duplicate += counts.get("duplicate", 0)
+
+    def error(self, line: int, reason: str) -> None:
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "reason": reason})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "lines": self.lines,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "rejected_lines": self.rejected_lines,
+            "queued": self.queued,
+            "rate_limited": self.rate_limited,
+            "duplicate": self.duplicate,
+            "errors": self.errors,
+        }
+
+
+def _validate_chunk(rows: List[Tuple[int, Any]], res: BulkResult) -> Tuple[List[Dict[str, Any]], int]:
+    """逐行校验（同 mqtt_consumer._validate，但记录被拒读数所在行）；返回 (通过校验的读数, 被拒条数)。"""
+    from app.events.mqtt_consumer import _normalize
+
+    items: List[Dict[str, Any]] = []
+    rejected = 0
+    for line, obj in rows:
+        readings, defaults = _expand(obj)
+        bad = 0
+        for r in readings:
+            item = _normalize(r, defaults)
+            if item is None:
+                bad += 1
+            else:
+                items.append(item)
+        res.accepted += len(readings) - bad
+        res.rejected += bad
+        rejected += bad
+        if bad:
+            res.rejected_lines += 1
+            res.error(line, f"{bad}/{len(readings)} 条读数未通过校验")
+    return items, rejected
+
+
+class _Pipeline:
+    """按当前进程的摄取模式选择投递方式。"""
+
+    def __init__(self):
+        from app.events import async_ingest
+
+        self.async_mode = async_ingest.is_running()
+
+    async def ensure_started(self) -> None:
+        if not self.async_mode:
+            from app.events.mqtt_consumer import start_workers
+
+            await run_in_threadpool(start_workers)  # 首次调用会加载索引/规则（查库），放到线程池
+
+    async def submit(self, rows: List[Tuple[int, Any]], res: BulkResult) -> None:
+        counts: Dict[str, int] = {}
+        if self.async_mode:
+            from app.events.async_ingest import _dispatch
+
+            # 校验可能读穿透设备注册表（同步查库），放到线程池；入队在事件循环上等待（背压）
+            res.queued += await _dispatch(*await run_in_threadpool(_validate_chunk, rows, res), counts)
+        else:
+            from app.events.mqtt_consumer import _dispatch
+
+            def work() -> int:
+                return _dispatch(*_validate_chunk(rows, res), counts)
+
+            res.queued += await run_in_threadpool(work)
+        res.dropped(counts)
+
+
+def pipeline_available() -> bool:
+    """订阅端在独立摄取进程时，本进程不持有管线。"""
+    return not (settings.MQTT_ENABLED and not settings.INGEST_EMBEDDED)
+
+
+async def ingest_stream(chunks: AsyncIterator[bytes]) -> Dict[str, Any]:
+    """流式解析请求体并分块投递到摄取管线；格式错误时已投递的部分保留，结果附 error。"""
+    pipe = _Pipeline()
+    await pipe.ensure_started()
+    res = BulkResult()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = _StreamParser(max(1, settings.HTTP_INGEST_MAX_LINE_KB) * 1024)
+    chunk_size = max(1, settings.HTTP_INGEST_CHUNK_SIZE)
+    pending: List[Tuple[int, Any]] = []
+    fatal: Optional[str] = None
+
+    async def flush() -> None:
+        if pending:
+            await pipe.submit(list(pending), res)
+            pending.clear()
+
+    def take(final: bool) -> None:
+        for line, obj, err in parser.drain(final):
+            res.lines += 1
+            if err is not None:
+                res.rejected_lines += 1
+                res.rejected += 1
+                res.error(line, err)
+            else:
+                pending.append((line, obj))
+
+    try:
+        async for chunk in chunks:
+            parser.feed(decoder.decode(chunk))
+            take(False)
+            if len(pending) >= chunk_size:
+                await flush()
+        parser.feed(decoder.decode(b"", final=True))
+        take(True)
+    except StreamFormatError as e:
+        fatal = str(e)
+    await flush()
+    metrics.inc("ingest.http.requests")
+    metrics.inc("ingest.http.lines", res.lines)
+    out = res.as_dict()
+    if fatal:
+        metrics.inc("ingest.http.malformed")
+        out["error"] = fatal
+    return out
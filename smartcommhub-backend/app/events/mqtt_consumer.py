@@ -6,209 +6,762 @@ MQTT 订阅端（最小可用实现）
 
 消息格式（JSON）：
 {
-  "elderly_id": 123,                 # 老人ID（必填，外键）
-  "monitor_type": "heart_rate",     # heart_rate | blood_pressure（必填）
+  "elderly_id": 123,                 # 老人ID（外键；缺省时按 device 表由 device_id 补全）
+  "monitor_type": "heart_rate",     # 规则表中的类型：heart_rate | blood_pressure | spo2 | temperature | glucose ...（必填）
   "monitor_value": 98.0,             # 数值（必填）
-  "monitor_time": "2025-12-23 12:01:02",  # 时间（必填，YYYY-MM-DD HH:MM:SS）
-  "device_id": "mock_device_001"    # 设备ID（可选）
+  "monitor_time": "2025-12-23 12:01:02",  # 时间（必填，ISO 8601，如 YYYY-MM-DD HH:MM:SS）
+  "device_id": "mock_device_001"    # 设备ID（可选；已登记设备按注册表做类型白名单与校准）
 }
+批量：JSON 数组 [{...}, ...]，或信封 {"device_id":..., "elderly_id":..., "readings":[...]}（信封字段为各条缺省值）；
+二进制帧发布到 MQTT_BINARY_TOPIC，帧结构见 telemetry_codec.py。
+
+管线：解码 + 规则表判定（edge/vital_rules.py）-> 准入 _admit（限流 edge/rate_limit.py、去重 edge/dedup.py、
+快速通道分流）-> 按 hash(elderly_id) 分片的优先级队列（满则落盘 spool.py）-> 工作线程重排（edge/reorder.py）、
+自适应攒批（batching.py）、个性化评分、健康记录与告警同事务写入 -> WS 预警。各环节指标见 GET /api/edge/metrics。
+INGEST_MODE=asyncio 时由 async_ingest.py 在事件循环上运行同一管线，解码、准入、评分与写库复用本模块。
 
 可改进的核心算法（由你优化）：
-- is_abnormal 的判定策略：当前是简单阈值法（心率>100，血压>140）。建议引入滑动窗口与异常检测（如季节性阈值、多变量规则或轻量模型前置）。
-- 质量校验：可加入设备校准、字段异常纠正、时间回拨/重复检测等。
+- is_abnormal 的判定策略：规则表阈值（可按护理等级/老人覆盖）+ 个人基线（edge/anomaly.py）；
+  建议进一步引入多变量规则或轻量模型前置。
 """
 from __future__ import annotations
+import atexit
+import itertools
 import json
 import queue
 import threading
-from typing import Any, Dict
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from app.core.config import settings
 from app.core.database import SessionLocal
 from app.core.logging import logger
-from app.models.health_record import HealthRecord
-from app.models.elderly import Elderly
-from sqlalchemy import select
-from app.services.edge.anomaly import anomaly_engine
+from app.core.metrics import metrics
+from app.dao.alert_dao import alert_dao
+from app.dao.health_record_dao import health_record_dao
+from app.events.batching import (
+    BATCH_SIZE_BUCKETS, LANE_FAST, LANE_NORMAL, LaneUnit, drain_batch, is_fast, make_batcher,
+)
+from app.events.spool import Spool
+from app.events.mqtt_router import mqtt_router
+from app.events.telemetry_codec import TYPE_NAMES, decode_frame
+from sqlalchemy.orm import Session
+from app.services.edge.anomaly import anomaly_engine, start_baseline_eviction
+from app.services.edge.baseline_seed import start_baseline_seeding
+from app.services.edge.baseline_snapshot import start_baseline_snapshots
+from app.services.edge.elder_index import elder_index, start_elder_index
+from app.services.edge.dedup import dedup_index
+from app.services.edge.device_registry import device_registry, start_device_registry
+from app.services.edge.rate_limit import device_rate_limiter
+from app.services.edge.reorder import ReorderBuffer
+from app.services.edge.vital_rules import start_vital_rules, vital_rules
 
-# 跨线程缓冲队列（MQTT 线程 -> DB 工作线程）
-MSG_Q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=settings.MQTT_QUEUE_MAXSIZE)
+# 工作线程数：受连接池上限约束（每个工作线程同一时刻占用一个连接）
+N_WORKERS = max(1, min(settings.INGEST_WORKERS, settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW))
 
 
-def _value_valid(mt: str, v: float) -> bool:
-    # 基础范围校验（防脏数据）
-    if mt == "heart_rate":
-        return 0 <= v <= 220
-    if mt == "blood_pressure":
-        return 50 <= v <= 260
-    return False
+class _Shard:
+    """
+    一个分片 = 一条缓冲队列（MQTT 线程 -> DB 工作线程；asyncio 模式为协程间队列）+ 一个工作线程/写库协程。
+    队列元素为 LaneUnit (通道, 序号, 入队时间, 读数列表)：单条消息是 1 条读数的单元，批量消息按分片/通道拆成若干单元。
+    优先级队列：快速通道先出，同通道内按序号 FIFO。
+    """
+    __slots__ = ("idx", "q", "reorder", "batcher", "enqueued", "fast", "processed", "dropped", "last_lag_ms")
+
+    def __init__(self, idx: int, q: Any = None):
+        self.idx = idx
+        # 线程模式 queue.PriorityQueue；asyncio 模式由 async_ingest 传入 asyncio.PriorityQueue
+        self.q = q if q is not None else queue.PriorityQueue(maxsize=settings.MQTT_QUEUE_MAXSIZE)
+        self.reorder: Optional[ReorderBuffer] = (
+            ReorderBuffer(
+                settings.INGEST_REORDER_WINDOW_SECONDS,
+                settings.INGEST_REORDER_MAX_ITEMS // N_WORKERS,
+                settings.INGEST_REORDER_MAX_KEYS // N_WORKERS,
+            )
+            if settings.INGEST_REORDER_ENABLED else None
+        )
+        self.batcher = make_batcher(f"ingest.shard.{idx}")
+        self.enqueued = 0
+        self.fast = 0
+        self.processed = 0
+        self.dropped = 0
+        self.last_lag_ms = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "shard": self.idx,
+            "depth": self.q.qsize(),
+            "enqueued": self.enqueued,
+            "fast": self.fast,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "last_lag_ms": round(self.last_lag_ms, 3),
+            "batch": self.batcher.stats(),
+            **({"reorder": self.reorder.stats()} if self.reorder is not None else {}),
+        }
+
+
+# 按 elderly_id 分片：同一老人的读数始终进入同一队列/线程，保证基线按序更新
+SHARDS: List[_Shard] = [_Shard(i) for i in range(N_WORKERS)]
+
+
+def _shard_of(elderly_id: Any) -> _Shard:
+    return SHARDS[hash(int(elderly_id)) % N_WORKERS]
+
+
+# 同通道内的 FIFO 序号（PriorityQueue 按 (通道, 序号) 排序）
+_SEQ = itertools.count()
+
+
+def _unit(lane: int, readings: List[Dict[str, Any]]) -> LaneUnit:
+    return (lane, next(_SEQ), time.monotonic(), readings)
+
+
+metrics.register_collector("ingest.queue.depth", lambda: sum(sh.q.qsize() for sh in SHARDS))
+metrics.register_collector("ingest.shards", lambda: [sh.stats() for sh in SHARDS])
+metrics.register_collector("ingest.elder_index", elder_index.stats)
+metrics.register_collector("ingest.dedup", dedup_index.stats)
+metrics.register_collector("ingest.rate_limit", device_rate_limiter.stats)
+metrics.register_collector("ingest.vital_rules", vital_rules.stats)
+metrics.register_collector("ingest.device_registry", device_registry.stats)
+
+# 磁盘溢出缓冲（start_consumer 时打开；None 表示未启用）
+SPOOL: Optional[Spool] = None
+_SPOOL_EVT = threading.Event()
+
+
+def _to_row(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "elderly_id": item["elderly_id"],
+        "monitor_type": item["monitor_type"],
+        "monitor_value": item["monitor_value"],
+        "monitor_time": item["monitor_time"],
+        "is_abnormal": item["is_abnormal"],
+        "device_id": item.get("device_id", "mock_device_001"),
+    }
+
+
+def _insert_records(db: Session, rows: List[Dict[str, Any]]) -> List[bool]:
+    """健康记录多行插入；返回每行是否插入（自然键冲突跳过的行为 False）。"""
+    if settings.INGEST_IDEMPOTENT_INSERT:
+        return health_record_dao.bulk_insert_ignore(db, rows)
+    health_record_dao.bulk_insert(db, rows)
+    return [True] * len(rows)
+
+
+def _write_batch(
+    db: Session, items: List[Dict[str, Any]], alerts: List[Optional[Dict[str, Any]]]
+) -> Tuple[List[bool], List[Optional[int]]]:
+    """
+    一批健康记录及其告警在同一事务内写入（多行 insert + RETURNING alert_id + 单次 commit）。
+    - 先一次性校验外键，不存在的老人跳过写库（仍参与评分/广播）。
+    - 按自然键幂等插入（on conflict do nothing）：重发/回放的重复行跳过，其告警也不再重复写入。
+    - 整批失败时回滚，改为逐行 SAVEPOINT 重试（健康记录与其告警同进同退），隔离坏行。
+    返回与 items 等长的“是否已写库”标记与 alert_id（无告警或未写入为 None）。
+    """
+    written = [False] * len(items)
+    alert_ids: List[Optional[int]] = [None] * len(items)
+    duplicates = 0
+    t0 = time.perf_counter()
+    try:
+        # 验证外键是否存在，避免违反约束导致整批回滚
+        # 老人ID索引新鲜时免查库；索引可能过期时未命中的 ID 才一次 IN 查询确认（见 ElderIndex.resolve）
+        exists = elder_index.resolve(db, {int(it["elderly_id"]) for it in items}).__contains__
+        idx = []
+        for i, it in enumerate(items):
+            if exists(int(it["elderly_id"])):
+                idx.append(i)
+            else:
+                logger.warning(
+                    f"健康记录入库跳过：elderly_id={it['elderly_id']} 不存在（仅广播异常，不写库）"
+                )
+        metrics.inc("ingest.rows.skipped_fk", len(items) - len(idx))
+        if not idx:
+            return written, alert_ids
+        try:
+            fresh = _insert_records(db, [_to_row(items[i]) for i in idx])
+            ins_idx = [i for i, ok in zip(idx, fresh) if ok]
+            alert_idx = [i for i in ins_idx if alerts[i] is not None]
+            new_ids = alert_dao.bulk_insert_returning_ids(db, [alerts[i] for i in alert_idx])
+            db.commit()
+            duplicates = len(idx) - len(ins_idx)
+            for i in ins_idx:
+                written[i] = True
+            for i, aid in zip(alert_idx, new_ids):
+                alert_ids[i] = aid
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"批量写入失败，改为逐行写入：{e}")
+            duplicates = 0
+            for i in idx:
+                try:
+                    with db.begin_nested():
+                        ok = _insert_records(db, [_to_row(items[i])])[0]
+                        aid = alert_dao.bulk_insert_returning_ids(db, [alerts[i]]) if ok and alerts[i] else []
+                    written[i] = ok
+                    duplicates += 0 if ok else 1
+                    alert_ids[i] = aid[0] if aid else None
+                except Exception as row_err:
+                    metrics.inc("ingest.rows.failed")
+                    logger.warning(f"健康记录写入失败（已跳过该行）：{row_err}")
+            db.commit()
+    except AssertionError as e:
+        # openGauss 方言初始化可能因版本串导致断言失败
+        db.rollback()
+        logger.warning(f"DB dialect init failed: {e}")
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"DB写入失败：{e}")
+    finally:
+        cost_ms = (time.perf_counter() - t0) * 1000
+        metrics.observe("ingest.flush.ms", cost_ms)
+        metrics.observe("ingest.batch.size", len(items), buckets=BATCH_SIZE_BUCKETS)
+        metrics.inc("ingest.batches")
+        metrics.inc("ingest.rows.written", sum(written))
+        metrics.inc("ingest.rows.duplicate", duplicates)
+        metrics.inc("ingest.alerts.written", sum(1 for a in alert_ids if a is not None))
+        if cost_ms > settings.INGEST_FLUSH_WARN_MS:
+            logger.warning(f"健康记录批量提交较慢：{len(items)} 条 / {cost_ms:.1f} ms")
+    return written, alert_ids
+
+
+def _baseline_key(item: Dict[str, Any]) -> Tuple[int, str, str]:
+    return (
+        int(item["elderly_id"]),
+        str(item.get("device_id", "mock_device_001")),
+        str(item["monitor_type"]),
+    )
 
 
-def _is_abnormal(mt: str, v: float) -> int:
-    # 可由你改进的核心算法：阈值 -> 滑窗/分位/小模型
-    if mt == "heart_rate":
-        return 1 if v > 100 else 0
-    if mt == "blood_pressure":
-        return 1 if v > 140 else 0
-    return 0
+def _score_batch(batch: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    # 整批按序计算个性化评分（无论是否全局异常，均更新基线；仅在全局异常或个人化异常时广播）
+    # 迟到读数（早于该键已评分的最新时间）只入库，不更新基线
+    out: List[Optional[Dict[str, Any]]] = [None] * len(batch)
+    if not settings.ANOMALY_PERSONAL_ENABLED:
+        return out
+    idx = [i for i, it in enumerate(batch) if not it.get("late")]
+    try:
+        # 时段分桶（ANOMALY_SEASONAL）：按各读数 monitor_time 的小时取桶
+        buckets = [anomaly_engine.bucket_of(batch[i]["monitor_time"]) for i in idx] if anomaly_engine.buckets > 1 else None
+        results = anomaly_engine.score_batch(
+            [_baseline_key(batch[i]) for i in idx], [float(batch[i]["monitor_value"]) for i in idx], buckets
+        )
+    except Exception as e:
+        logger.warning(f"个性化评分失败（本批按无评分处理）：{e}")
+        return out
+    for i, r in zip(idx, results):
+        out[i] = r
+    return out
+
+
+def _should_alert(item: Dict[str, Any], personal: Optional[Dict[str, Any]]) -> bool:
+    return bool(item["is_abnormal"]) or bool(personal and personal.get("personal_abnormal"))
+
+
+def _alert_row(item: Dict[str, Any], personal: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # 告警行（与健康记录同批、同事务写入）
+    return {
+        "elderly_id": int(item["elderly_id"]),
+        "monitor_type": str(item["monitor_type"]),
+        "monitor_value": float(item["monitor_value"]),
+        "monitor_time": str(item["monitor_time"]),
+        "device_id": str(item.get("device_id", "mock_device_001")),
+        "global_abnormal": int(item["is_abnormal"]),
+        "personal_abnormal": int(1 if (personal and personal.get("personal_abnormal")) else 0),
+        "score": (personal.get("score") if personal else None),
+        "confidence": (personal.get("confidence") if personal else None),
+        "k": (personal.get("k") if personal else None),
+        "n": (personal.get("n") if personal else None),
+        "mu": (personal.get("mu") if personal else None),
+        "sigma": (personal.get("sigma") if personal else None),
+        "ack_status": "UNACKED",
+    }
+
+
+def _broadcast(
+    item: Dict[str, Any], personal: Optional[Dict[str, Any]], wrote: bool, alert_id: Optional[int], push_warning
+) -> None:
+    # 触发 WS 预警（携带个性化异常信息与 alert_id，客户端可直接 ack）
+    try:
+        push_warning({
+            "alert_id": alert_id,
+            "elderly_id": item["elderly_id"],
+            "monitor_type": item["monitor_type"],
+            "monitor_value": item["monitor_value"],
+            "monitor_time": str(item["monitor_time"]),
+            "device_id": item.get("device_id", "mock_device_001"),
+            "db_written": wrote,
+            "anomaly": {
+                "global": bool(item["is_abnormal"]),
+                **({
+                    "personal": bool(personal.get("personal_abnormal")),
+                    "score": personal.get("score"),
+                    "confidence": personal.get("confidence"),
+                    "k": personal.get("k"),
+                    "n": personal.get("n"),
+                    "mu": personal.get("mu"),
+                    "sigma": personal.get("sigma"),
+                } if personal else {})
+            },
+        }, urgent=bool(item.get("fast")))
+    except Exception as e:
+        logger.exception(f"WS 广播失败：{e}")
+
+
+def _observe_lanes(batch: List[Dict[str, Any]]) -> None:
+    # 分通道端到端延迟：收到消息（解码完成）-> 入库并广播完成
+    done = time.monotonic()
+    for item in batch:
+        t = item.get("recv_ts")
+        if t is not None and done >= t:
+            metrics.observe("ingest.lane.fast.ms" if item.get("fast") else "ingest.lane.normal.ms", (done - t) * 1000)
+
+
+def _order_batch(shard: _Shard, units: List[LaneUnit]) -> List[Dict[str, Any]]:
+    """取出的单元 -> 本轮待处理读数：记录排队延迟；有重排缓冲时按键重排，只返回已到期/迟到/紧急释放的读数。"""
+    batch = [item for *_, readings in units for item in readings]
+    now = time.monotonic()
+    lag_name = f"ingest.shard.{shard.idx}.lag.ms"
+    for _, _, enq_ts, _ in units:
+        lag_ms = (now - enq_ts) * 1000
+        metrics.observe(lag_name, lag_ms)
+        shard.last_lag_ms = lag_ms
+    reorder = shard.reorder
+    if reorder is None:
+        return batch
+    # 按键重排：到期的键按 monitor_time 有序释放；迟到读数直接放行（标记 late）
+    out: List[Dict[str, Any]] = []
+    for item in batch:
+        reorder.push(_baseline_key(item), item, now, out, urgent=item.get("fast", False))
+    batch = reorder.pop_ready(now, out)
+    metrics.inc("ingest.readings.late", sum(1 for it in batch if it.get("late")))
+    return batch
+
+
+def _score_alerts(batch: List[Dict[str, Any]]) -> Tuple[List[Optional[Dict[str, Any]]], List[Optional[Dict[str, Any]]]]:
+    """按序评分并构造告警行；返回 (个性化评分, 告警行或 None)。"""
+    personals = _score_batch(batch)
+    alerts = [_alert_row(item, p) if _should_alert(item, p) else None for item, p in zip(batch, personals)]
+    return personals, alerts
 
 
-def _worker_db_and_ws():
-    # 后台工作线程：入库并触发 WS 预警
+def _finish_batch(
+    shard: _Shard, units: List[LaneUnit], batch: List[Dict[str, Any]], personals, alerts,
+    written: List[bool], alert_ids: List[Optional[int]], cost_ms: float, push_warning,
+) -> None:
+    """写库之后：反馈攒批参数、广播预警（带 alert_id）、记录分通道延迟。"""
+    shard.batcher.observe(sum(len(u[-1]) for u in units), cost_ms, shard.q.qsize())
+    for item, p, a, wrote, aid in zip(batch, personals, alerts, written, alert_ids):
+        if a is not None:
+            _broadcast(item, p, wrote, aid, push_warning)
+    _observe_lanes(batch)
+
+
+def _worker_db_and_ws(shard: _Shard):
+    # 后台工作线程（每分片一个）：攒批、按序评分，健康记录与告警同事务入库，再触发 WS 预警
+    # 每个工作线程独占一个 Session，分片内按入队顺序处理
     # 注意：从线程里调用 WS 广播（异步）需通过队列桥接，ws 模块提供 push_warning()
     from app.api.v1.ws import push_warning  # 延迟导入，避免循环依赖
 
-    while True:
-        item = MSG_Q.get()
-        try:
-            wrote = False
+    reorder = shard.reorder
+    batcher = shard.batcher
+    with SessionLocal() as db:
+        while True:
+            # 有重排缓冲时按最近到期时间唤醒，保证无新消息时也能按时释放
+            wait_s = reorder.next_due() if reorder is not None else None
+            # 批大小 / linger 由 batcher 按提交耗时与积压自适应；取到快速通道单元即停止攒批
+            units = drain_batch(shard.q, batcher.size, batcher.linger_s, wait_s, urgent=is_fast)
+            batch: List[Dict[str, Any]] = []
             try:
-                with SessionLocal() as db:
-                    # 验证外键是否存在，避免违反约束导致回滚
-                    elder = db.get(Elderly, item["elderly_id"])  # SQLAlchemy 2.0 API
-                    if elder is None:
-                        logger.warning(
-                            f"健康记录入库跳过：elderly_id={item['elderly_id']} 不存在（仅广播异常，不写库）"
-                        )
-                    else:
-                        rec = HealthRecord(
-                            elderly_id=item["elderly_id"],
-                            monitor_type=item["monitor_type"],
-                            monitor_value=item["monitor_value"],
-                            monitor_time=item["monitor_time"],
-                            is_abnormal=item["is_abnormal"],
-                            device_id=item.get("device_id", "mock_device_001"),
-                        )
-                        db.add(rec)
-                        db.commit()
-                        wrote = True
-            except AssertionError as e:
-                # openGauss 方言初始化可能因版本串导致断言失败
-                logger.warning(f"DB dialect init failed: {e}")
+                batch = _order_batch(shard, units)
+                if not batch:
+                    continue
+                # 先按序评分，再把健康记录与告警一次事务写入，最后广播（带 alert_id）
+                personals, alerts = _score_alerts(batch)
+                t0 = time.perf_counter()
+                written, alert_ids = _write_batch(db, batch, alerts)
+                cost_ms = (time.perf_counter() - t0) * 1000
+                _finish_batch(shard, units, batch, personals, alerts, written, alert_ids, cost_ms, push_warning)
             except Exception as e:
-                logger.exception(f"DB写入失败：{e}")
+                logger.exception(f"健康数据批处理异常：{e}")
+            finally:
+                shard.processed += len(batch)
+                for _ in units:
+                    shard.q.task_done()
+
+
+def _spool_append(readings: List[Dict[str, Any]]) -> bool:
+    # recv_ts 为进程内单调时钟，落盘时换算为墙钟（recv_wall），回放（可能在重启后）时再换算回来
+    skew = time.time() - time.monotonic()
+    rows = []
+    for it in readings:
+        row = dict(it)
+        if "recv_ts" in row:
+            row["recv_wall"] = row.pop("recv_ts") + skew
+        rows.append(row)
+    payload = json.dumps(rows, default=str).encode("utf-8")
+    if SPOOL is not None and SPOOL.append(payload):
+        _SPOOL_EVT.set()
+        return True
+    return False
+
+
+def _enqueue(shard: _Shard, readings: List[Dict[str, Any]], lane: int = LANE_NORMAL) -> bool:
+    """
+    整体放入分片队列；队列满（或磁盘缓冲仍有积压，需保持 FIFO）时追加到磁盘缓冲。
+    快速通道不排在磁盘积压之后，直接尝试入队；磁盘缓冲写入失败时也退回直接入队。
+    返回是否保留（入队或落盘）；False 表示已丢弃。
+    """
+    spool_first = SPOOL is not None and SPOOL.pending and lane != LANE_FAST
+    if spool_first and _spool_append(readings):
+        return True
+    try:
+        shard.q.put_nowait(_unit(lane, readings))
+        shard.enqueued += len(readings)
+        if lane == LANE_FAST:
+            shard.fast += len(readings)
+        return True
+    except queue.Full:
+        if not spool_first and _spool_append(readings):
+            metrics.inc("ingest.queue.spooled", len(readings))
+            return True
+    shard.dropped += len(readings)
+    metrics.inc("ingest.queue.dropped", len(readings))
+    logger.warning(f"MQTT消息入队失败：队列已满且磁盘缓冲不可用（{len(readings)} 条读数）")
+    return False
 
-            # 触发 WS 预警（携带个性化异常信息；全局异常时广播）
-            # 计算个性化评分（无论是否全局异常，均更新基线；仅在全局异常或个人化异常时广播）
-            personal = None
-            try:
-                if settings.ANOMALY_PERSONAL_ENABLED:
-                    key = (
-                        int(item["elderly_id"]),
-                        str(item.get("device_id", "mock_device_001")),
-                        str(item["monitor_type"]),
-                    )
-                    personal = anomaly_engine.update_and_score(key, float(item["monitor_value"]))
-            except Exception:
-                personal = None
-
-            should_broadcast = bool(item["is_abnormal"]) or bool(personal and personal.get("personal_abnormal"))
-            if should_broadcast:
-                # 持久化告警
-                try:
-                    from app.models.alert import Alert
-                    with SessionLocal() as db:
-                        alert = Alert(
-                            elderly_id=int(item["elderly_id"]),
-                            monitor_type=str(item["monitor_type"]),
-                            monitor_value=float(item["monitor_value"]),
-                            monitor_time=str(item["monitor_time"]),
-                            device_id=str(item.get("device_id", "mock_device_001")),
-                            global_abnormal=int(item["is_abnormal"]),
-                            personal_abnormal=int(1 if (personal and personal.get("personal_abnormal")) else 0),
-                            score=(personal.get("score") if personal else None),
-                            confidence=(personal.get("confidence") if personal else None),
-                            k=(personal.get("k") if personal else None),
-                            n=(personal.get("n") if personal else None),
-                            mu=(personal.get("mu") if personal else None),
-                            sigma=(personal.get("sigma") if personal else None),
-                            ack_status="UNACKED",
-                        )
-                        db.add(alert)
-                        db.commit()
-                except Exception as e:
-                    logger.warning(f"告警持久化失败：{e}")
 
+def _spool_drain_loop(spool: Spool) -> None:
+    """磁盘缓冲回灌线程：按 FIFO 读出单元，阻塞放回分片队列（队列仍满则稍后重试）。"""
+    while True:
+        recs = spool.peek(256)
+        if not recs:
+            _SPOOL_EVT.wait(0.5)
+            _SPOOL_EVT.clear()
+            continue
+        n, pos = 0, None
+        for payload, nxt in recs:
+            if payload is not None:
                 try:
-                    push_warning({
-                        "elderly_id": item["elderly_id"],
-                        "monitor_type": item["monitor_type"],
-                        "monitor_value": item["monitor_value"],
-                        "monitor_time": str(item["monitor_time"]),
-                        "device_id": item.get("device_id", "mock_device_001"),
-                        "db_written": wrote,
-                        "anomaly": {
-                            "global": bool(item["is_abnormal"]),
-                            **({
-                                "personal": bool(personal.get("personal_abnormal")),
-                                "score": personal.get("score"),
-                                "confidence": personal.get("confidence"),
-                                "k": personal.get("k"),
-                                "n": personal.get("n"),
-                                "mu": personal.get("mu"),
-                                "sigma": personal.get("sigma"),
-                            } if personal else {})
-                        },
-                    })
+                    readings = json.loads(payload.decode("utf-8"))
+                    shard = _shard_of(readings[0]["elderly_id"])
                 except Exception as e:
-                    logger.exception(f"WS 广播失败：{e}")
-        finally:
-            MSG_Q.task_done()
+                    logger.warning(f"磁盘缓冲记录无法解析（已跳过）：{e}")
+                    readings = None
+                if readings:
+                    units = _replay_units(readings)
+                    try:
+                        shard.q.put(units[0], timeout=1.0)
+                    except queue.Full:
+                        break
+                    # 同一记录拆出的另一通道单元阻塞放回，避免游标未推进导致前一单元重复回放
+                    for unit in units[1:]:
+                        shard.q.put(unit)
+                    shard.enqueued += len(readings)
+            else:
+                metrics.inc("ingest.spool.corrupt")
+            n, pos = n + 1, nxt
+        if pos is not None:
+            spool.advance(pos, n)
+
+
+def _replay_units(readings: List[Dict[str, Any]]) -> List[LaneUnit]:
+    """回放记录 -> 通道单元：恢复 recv_ts（单调时钟），快速通道读数仍走快速通道。"""
+    skew = time.time() - time.monotonic()
+    now = time.monotonic()
+    fast: List[Dict[str, Any]] = []
+    normal: List[Dict[str, Any]] = []
+    for it in readings:
+        wall = it.pop("recv_wall", None)
+        it["recv_ts"] = min(now, wall - skew) if wall is not None else now
+        it["monitor_time"] = _parse_time(it["monitor_time"]) or it["monitor_time"]
+        (fast if it.get("fast") else normal).append(it)
+    return [_unit(lane, items) for lane, items in ((LANE_FAST, fast), (LANE_NORMAL, normal)) if items]
+
+
+def _open_spool() -> None:
+    global SPOOL
+    if not settings.INGEST_SPOOL_ENABLED or SPOOL is not None:
+        return
+    d = Path(settings.INGEST_SPOOL_DIR)
+    if not d.is_absolute():
+        d = Path(__file__).resolve().parents[2] / d
+    try:
+        SPOOL = Spool(d, settings.INGEST_SPOOL_SEGMENT_MB * 1024 * 1024, settings.INGEST_SPOOL_MAX_SEGMENTS)
+    except Exception as e:
+        logger.warning(f"磁盘缓冲未启用：{e}（队列满时将丢弃消息）")
+        return
+    atexit.register(SPOOL.close)
+    metrics.register_collector("ingest.spool", SPOOL.stats)
+    if SPOOL.recovered:
+        logger.info(f"磁盘缓冲发现 {SPOOL.recovered} 条待回放消息（{d}）")
+    threading.Thread(target=_spool_drain_loop, args=(SPOOL,), name="mqtt-spool-drain", daemon=True).start()
 
 
 # MQTT 回调
 
-def _on_message(client, userdata, msg):
+_REQUIRED = ("elderly_id", "monitor_type", "monitor_value", "monitor_time")
+
+
+def _parse_time(v: Any) -> Optional[datetime]:
+    """monitor_time -> naive datetime（与 timestamp without time zone 列及 RETURNING 取回值一致）；无法解析返回 None。"""
+    if not isinstance(v, datetime):
+        try:
+            v = datetime.fromisoformat(str(v).strip())
+        except ValueError:
+            return None
+    return v.replace(tzinfo=None) if v.tzinfo is not None else v
+
+
+def _normalize(data: Any, defaults: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """单条读数校验与规整；不合格返回 None。"""
+    if not isinstance(data, dict):
+        return None
+    if defaults:
+        data = {**defaults, **data}
+    # 设备注册表：补全 elderly_id（设备只带序列号时）、类型白名单与校准偏移
+    dev = None
+    if settings.DEVICE_REGISTRY_ENABLED and "device_id" in data:
+        dev = device_registry.get(str(data["device_id"]))
+        if dev is not None and "elderly_id" not in data:
+            data = {**data, "elderly_id": dev.elderly_id}
+    # 字段校验（最小必需）
+    if not all(k in data for k in _REQUIRED):
+        logger.debug("MQTT消息忽略：缺少必需字段")
+        return None
+    mt = str(data["monitor_type"]).strip()
     try:
-        data = json.loads(msg.payload.decode("utf-8"))
-        # 字段校验（最小必需）
-        if not all(k in data for k in ("elderly_id", "monitor_type", "monitor_value", "monitor_time")):
-            logger.debug("MQTT消息忽略：缺少必需字段")
-            return
-        mt = str(data["monitor_type"]).strip()
+        mv = float(data["monitor_value"])  # 转为 float
+        eid = int(data["elderly_id"])
+    except Exception:
+        logger.debug("MQTT消息忽略：monitor_value/elderly_id 无法转换为数值")
+        return None
+    # 时间统一为 datetime：幂等插入按自然键比对 RETURNING 结果，字符串格式差异会误判为重复
+    mt_time = _parse_time(data["monitor_time"])
+    if mt_time is None:
+        logger.debug("MQTT消息忽略：monitor_time 无法解析（需 ISO 8601）")
+        return None
+    if dev is not None:
+        if not dev.supports(mt):
+            logger.debug("MQTT消息忽略：设备不支持该监测类型")
+            return None
+        mv = dev.calibrate(mt, mv)
+    # 规则表：未知类型或超出有效范围 -> None；否则 0/1 为是否异常
+    flag = vital_rules.classify(mt, mv, eid)
+    if flag is None:
+        logger.debug("MQTT消息忽略：未知监测类型或数值超出有效范围")
+        return None
+    data["monitor_type"] = mt
+    data["monitor_value"] = mv
+    data["monitor_time"] = mt_time
+    data["is_abnormal"] = flag
+    return data
+
+
+def _validate(raw: Iterable[Any], defaults: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """一批读数单遍校验；返回 (通过校验的读数, 被拒条数)。"""
+    total = 0
+    items: List[Dict[str, Any]] = []
+    for r in raw:
+        total += 1
+        item = _normalize(r, defaults or {})
+        if item is not None:
+            items.append(item)
+    return items, total - len(items)
+
+
+def _dedup_key(item: Dict[str, Any]) -> Tuple[str, int, str, str]:
+    return (
+        str(item.get("device_id", "mock_device_001")),
+        int(item["elderly_id"]),
+        str(item["monitor_type"]),
+        str(item["monitor_time"]),
+    )
+
+
+def _is_urgent(item: Dict[str, Any]) -> bool:
+    # 解码阶段分流：阈值异常，或按当前个人基线只读预判为异常（不更新基线）
+    if item["is_abnormal"]:
+        return True
+    if settings.ANOMALY_PERSONAL_ENABLED:
         try:
-            mv = float(data["monitor_value"])  # 转为 float
+            return anomaly_engine.peek_abnormal(
+                _baseline_key(item), float(item["monitor_value"]), anomaly_engine.bucket_of(item["monitor_time"])
+            )
         except Exception:
-            logger.debug("MQTT消息忽略：monitor_value 无法转换为 float")
-            return
-        if not _value_valid(mt, mv):
-            logger.debug("MQTT消息忽略：数值超出有效范围")
-            return
-        data["monitor_value"] = mv
-        data["is_abnormal"] = _is_abnormal(mt, mv)
-        # 推入队列给后台线程
-        try:
-            MSG_Q.put_nowait(data)
-        except Exception as e:
-            logger.warning(f"MQTT消息入队失败：{e}")
-    except Exception as e:
-        # 忽略单条异常消息，避免阻塞
-        logger.debug(f"MQTT消息解析异常：{e}")
+            return False
+    return False
 
 
-def start_consumer():
+def _admit(
+    items: List[Dict[str, Any]], rejected: int = 0, counts: Optional[Dict[str, int]] = None
+) -> List[Dict[str, Any]]:
     """
-    启动 MQTT 订阅：
-    - 后台 DB+WS 工作线程
-    - MQTT 客户端 loop_forever 线程
+    计数、按设备限流、去重并分流（标记 fast / recv_ts）；返回需要入队的读数（线程模式与 asyncio 模式共用）。
+    传入 counts 时累加本批被限流（rate_limited）与判为重复（duplicate）的条数，供调用方回报。
     """
-    # 工作线程
-    threading.Thread(target=_worker_db_and_ws, name="mqtt-db-worker", daemon=True).start()
+    metrics.inc("ingest.readings.accepted", len(items))
+    metrics.inc("ingest.readings.rejected", rejected)
+    if settings.INGEST_DEVICE_LIMIT_ENABLED:
+        # 单设备超速上报：按消息计费（本批中同一 (设备, 老人) 的读数整体消耗 1 个令牌），超限整组丢弃/降采样
+        n = len(items)
+        groups: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+        for it in items:
+            groups.setdefault((str(it.get("device_id", "mock_device_001")), int(it["elderly_id"])), []).append(it)
+        kept = [grp for (dev, eid), grp in groups.items() if device_rate_limiter.allow(dev, eid, len(grp))]
+        if len(kept) < len(groups):
+            items = [it for grp in kept for it in grp]
+        metrics.inc("ingest.readings.rate_limited", n - len(items))
+        if counts is not None:
+            counts["rate_limited"] = counts.get("rate_limited", 0) + n - len(items)
+    if settings.INGEST_DEDUP_ENABLED:
+        # 重投/重复读数在入队前丢弃，不触达 DB 与基线
+        n = len(items)
+        items = [it for it in items if not dedup_index.seen(_dedup_key(it))]
+        metrics.inc("ingest.readings.duplicate", n - len(items))
+        if counts is not None:
+            counts["duplicate"] = counts.get("duplicate", 0) + n - len(items)
+    now = time.monotonic()
+    fast = 0
+    for it in items:
+        it["recv_ts"] = now
+        if settings.INGEST_FAST_LANE_ENABLED and _is_urgent(it):
+            it["fast"] = True
+            fast += 1
+    metrics.inc("ingest.readings.fast", fast)
+    return items
 
-    # MQTT 客户端
+
+def _dispatch(items: List[Dict[str, Any]], rejected: int = 0, counts: Optional[Dict[str, int]] = None) -> int:
+    """准入后按分片入队；返回入队条数（去重/限流丢弃的不计，明细见 counts）。"""
+    by_shard: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+    admitted = _admit(items, rejected, counts)
+    for item in admitted:
+        lane = LANE_FAST if item.get("fast") else LANE_NORMAL
+        by_shard.setdefault((_shard_of(item["elderly_id"]).idx, lane), []).append(item)
+    # 按 elderly_id 路由到分片队列给后台线程（满则溢出到磁盘缓冲）
+    queued = len(admitted)
+    for (idx, lane), readings in by_shard.items():
+        if not _enqueue(SHARDS[idx], readings, lane):
+            queued -= len(readings)
+            if settings.INGEST_DEDUP_ENABLED:
+                # 丢弃的读数撤销去重标记：Broker 重投时仍可入库
+                dedup_index.forget(_dedup_key(it) for it in readings)
+    return queued
+
+
+def _decode_json(payload: bytes) -> Tuple[List[Dict[str, Any]], int]:
+    # 单条 / JSON 数组 / {"device_id":..., "readings":[...]} 信封
+    data = json.loads(payload.decode("utf-8"))
+    metrics.inc("ingest.messages")
+    if isinstance(data, list):
+        return _validate(data)
+    if isinstance(data, dict) and isinstance(data.get("readings"), list):
+        defaults = {k: data[k] for k in ("device_id", "elderly_id") if k in data}
+        return _validate(data["readings"], defaults)
+    return _validate((data,))
+
+
+def _decode_binary(payload: bytes) -> Tuple[List[Dict[str, Any]], int]:
+    # 二进制帧：整帧 iter_unpack，只做范围校验，不经 JSON/float() 转换；整帧共用同一份规则表快照批量判定（classify_batch）
+    # elderly_id 为 0 的记录按设备注册表补全；设备校准偏移对整帧批量应用
+    device_id, records = decode_frame(payload)
+    metrics.inc("ingest.messages.binary")
+    records = list(records)
+    types = [TYPE_NAMES.get(code) for _, code, _, _ in records]
+    values = [mv for _, _, mv, _ in records]
+    dev = device_registry.get(device_id) if settings.DEVICE_REGISTRY_ENABLED else None
+    if dev is not None:
+        values = dev.calibrate_batch(types, values)
+    eids = [eid or (dev.elderly_id if dev is not None else 0) for eid, _, _, _ in records]
+    flags = vital_rules.table.classify_batch(types, values, eids)
+    items: List[Dict[str, Any]] = []
+    for (_, _, _, ms), eid, mt, mv, flag in zip(records, eids, types, values, flags):
+        if flag is None or not eid or (dev is not None and not dev.supports(mt)):
+            continue
+        items.append({
+            "elderly_id": eid,
+            "monitor_type": mt,
+            "monitor_value": round(mv, 2),
+            "monitor_time": datetime.fromtimestamp(ms / 1000),
+            "device_id": device_id,
+            "is_abnormal": flag,
+        })
+    return items, len(records) - len(items)
+
+
+def _on_message(client, userdata, msg):
     try:
-        import paho.mqtt.client as mqtt  # 按需导入，避免缺依赖导致后端无法启动
+        _dispatch(*_decode_json(msg.payload))
     except Exception as e:
-        logger.warning(f"MQTT未启用：缺少 paho-mqtt 依赖（{e}）")
-        return
-    c = mqtt.Client(client_id=settings.MQTT_CLIENT_ID, clean_session=True)
-    c.on_message = _on_message
+        # 忽略单条异常消息，避免阻塞
+        logger.debug(f"MQTT消息解析异常：{e}")
+
+
+def _on_binary_message(client, userdata, msg):
     try:
-        c.connect(settings.MQTT_BROKER_URL, settings.MQTT_BROKER_PORT, keepalive=30)
-        c.subscribe(settings.MQTT_TOPIC, qos=1)
-        threading.Thread(target=c.loop_forever, name="mqtt-loop", daemon=True).start()
-        logger.info(f"MQTT订阅已启动：tcp://{settings.MQTT_BROKER_URL}:{settings.MQTT_BROKER_PORT} topic={settings.MQTT_TOPIC}")
+        _dispatch(*_decode_binary(msg.payload))
     except Exception as e:
-        # Broker 未就绪时跳过，不阻断应用启动；可在 .env 里关闭 MQTT 或稍后重启
-        logger.warning(f"MQTT未连接：{e}（启动不中断）")
-        return
+        logger.debug(f"MQTT二进制帧解析异常：{e}")
+
+
+def start_edge_services() -> None:
+    """
+    摄取管线依赖的边缘组件（线程模式与 asyncio 模式共用同一份启动清单；各组件均幂等）：
+    - 老人ID索引加载与定时重载
+    - 生命体征规则表加载与热加载
+    - 设备注册表预加载与后台刷新
+    - 个性化基线快照挂载与定期写出、空闲键淘汰、冷启动播种
+    """
+    # 老人ID索引（外键预检）
+    start_elder_index()
+    # 生命体征规则（有效范围/异常阈值）
+    start_vital_rules()
+    # 设备注册表（device_id -> 老人/校准）
+    start_device_registry()
+    # 个性化基线快照（热重启）
+    start_baseline_snapshots()
+    # 基线内存上限（空闲键淘汰）
+    start_baseline_eviction()
+    # 基线冷启动播种（后台，已有样本的桶不覆盖）
+    start_baseline_seeding()
+
+
+_WORKERS_LOCK = threading.Lock()
+_WORKERS_STARTED = False
+
+
+def start_workers() -> None:
+    """
+    启动本进程的摄取管线（幂等；MQTT 订阅与 HTTP 批量上报共用）：
+    - 边缘组件（见 start_edge_services）
+    - 磁盘溢出缓冲与回灌线程
+    - 后台 DB+WS 工作线程池（按 elderly_id 分片）
+    """
+    global _WORKERS_STARTED
+    with _WORKERS_LOCK:
+        if _WORKERS_STARTED:
+            return
+        _WORKERS_STARTED = True
+        start_edge_services()
+        # 磁盘溢出缓冲（含崩溃后回放）
+        _open_spool()
+        # 工作线程（每分片一个）
+        for shard in SHARDS:
+            threading.Thread(
+                target=_worker_db_and_ws, args=(shard,), name=f"mqtt-db-worker-{shard.idx}", daemon=True
+            ).start()
+
+
+def start_consumer():
+    """
+    启动 MQTT 订阅：
+    - 摄取管线（见 start_workers）
+    - 向统一 MQTT 连接注册健康数据主题（JSON / 二进制）
+    """
+    start_workers()
+    # 注册主题到统一 MQTT 连接（由 mqtt_router.start() 建立连接）
+    mqtt_router.register(settings.MQTT_TOPIC, _on_message, qos=1)
+    mqtt_router.register(settings.MQTT_BINARY_TOPIC, _on_binary_message, qos=1)
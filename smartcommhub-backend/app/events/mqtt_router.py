@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+统一 MQTT 连接 + 主题路由
+- 进程内只建一个 paho 客户端（一个 TCP 连接、一个网络线程），各订阅端按主题注册回调：
+    mqtt_router.register(topic, handler, qos=1)
+  新增遥测主题只需注册，不再新建线程和连接。
+- 连接管理：connect_async + loop_start，断线由 paho 自动重连（指数退避，
+  MQTT_RECONNECT_MIN_SECONDS ~ MQTT_RECONNECT_MAX_SECONDS）；每次连上后重新订阅全部主题。
+- 客户端ID：MQTT_CLIENT_ID + 主机名 + 进程号，多 uvicorn worker / 多实例不再互相踢下线。
+- 统计：按主题的消息数、字节数、回调异常数与近似速率（条/秒），见 GET /api/edge/metrics -> mqtt。
+"""
+from __future__ import annotations
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+from app.core.logging import logger
+
+Handler = Callable[[Any, Any, Any], None]  # paho 回调签名 (client, userdata, msg)
+
+
+class _Route:
+    __slots__ = ("topic", "handler", "qos", "messages", "bytes", "errors", "_last_n", "_last_t")
+
+    def __init__(self, topic: str, handler: Handler, qos: int):
+        self.topic = topic
+        self.handler = handler
+        self.qos = qos
+        self.messages = 0
+        self.bytes = 0
+        self.errors = 0
+        self._last_n = 0
+        self._last_t = time.monotonic()
+
+    def __call__(self, client, userdata, msg) -> None:
+        self.messages += 1
+        self.bytes += len(msg.payload)
+        try:
+            self.handler(client, userdata, msg)
+        except Exception as e:
+            self.errors += 1
+            logger.debug(f"MQTT回调异常（topic={msg.topic}）：{e}")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        dt = now - self._last_t
+        rate = (self.messages - self._last_n) / dt if dt > 0 else 0.0
+        self._last_n, self._last_t = self.messages, now
+        return {
+            "qos": self.qos,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "errors": self.errors,
+            "rate_per_s": round(rate, 2),
+        }
+
+
+class MqttRouter:
+    def __init__(self):
+        self._routes: Dict[str, _Route] = {}
+        self._client = None
+        self._lock = threading.Lock()
+        self.connected = False
+        self.connects = 0
+        self.disconnects = 0
+
+    @staticmethod
+    def client_id(suffix: str = "") -> str:
+        return f"{settings.MQTT_CLIENT_ID}{suffix}_{socket.gethostname()}_{os.getpid()}"
+
+    def register(self, topic: str, handler: Handler, qos: int = 1) -> None:
+        """注册主题回调；启动后注册的主题在已连接时立即订阅。"""
+        if not topic:
+            return
+        route = _Route(topic, handler, qos)
+        with self._lock:
+            self._routes[topic] = route
+            c = self._client
+        if c is not None:
+            c.message_callback_add(topic, route)
+            if self.connected:
+                c.subscribe(topic, qos=qos)
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc != 0:
+            logger.warning(f"MQTT连接被拒绝：rc={rc}")
+            return
+        self.connected = True
+        self.connects += 1
+        with self._lock:
+            routes = list(self._routes.values())
+        for r in routes:
+            client.subscribe(r.topic, qos=r.qos)
+        logger.info(
+            f"MQTT已连接：tcp://{settings.MQTT_BROKER_URL}:{settings.MQTT_BROKER_PORT} "
+            f"topics={[r.topic for r in routes]}"
+        )
+
+    def _on_disconnect(self, client, userdata, rc):
+        self.connected = False
+        self.disconnects += 1
+        if rc != 0:
+            logger.warning(f"MQTT连接断开（rc={rc}），将自动重连")
+
+    def start(self) -> None:
+        """建立唯一的 MQTT 连接（异步连接 + 自动重连），重复调用无副作用。"""
+        if self._client is not None:
+            return
+        try:
+            import paho.mqtt.client as mqtt  # 按需导入，避免缺依赖导致后端无法启动
+        except Exception as e:
+            logger.warning(f"MQTT未启用：缺少 paho-mqtt 依赖（{e}）")
+            return
+        c = mqtt.Client(client_id=self.client_id(), clean_session=True)
+        c.on_connect = self._on_connect
+        c.on_disconnect = self._on_disconnect
+        c.reconnect_delay_set(
+            min_delay=max(1, settings.MQTT_RECONNECT_MIN_SECONDS),
+            max_delay=max(1, settings.MQTT_RECONNECT_MAX_SECONDS),
+        )
+        with self._lock:
+            for r in self._routes.values():
+                c.message_callback_add(r.topic, r)
+            self._client = c
+        try:
+            c.connect_async(settings.MQTT_BROKER_URL, settings.MQTT_BROKER_PORT, keepalive=settings.MQTT_KEEPALIVE)
+            c.loop_start()  # 单个网络线程；Broker 未就绪时后台按退避重试，不阻断应用启动
+        except Exception as e:
+            logger.warning(f"MQTT未连接：{e}（启动不中断）")
+
+    def stop(self) -> None:
+        c, self._client = self._client, None
+        if c is not None:
+            try:
+                c.disconnect()
+                c.loop_stop()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = dict(self._routes)
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "topics": {t: r.stats() for t, r in routes.items()},
+        }
+
+
+# 全局实例（进程级）
+mqtt_router = MqttRouter()
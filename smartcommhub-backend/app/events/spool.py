@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+本地磁盘溢出缓冲（分段、只追加、mmap）
+- 用途：内存队列满（DB 变慢/卡住）时，订阅端把消息追加到磁盘，而不是直接丢弃；
+  工作线程追上后按 FIFO 顺序回灌；进程崩溃/重启后从游标处继续回放。
+- 结构：目录下若干固定大小的段文件 seg-<序号>.spl（预分配 + mmap），按序号组成环：
+  写满一段即封段并新建下一段；读完一段即删除；段数达到上限时拒绝写入（计入 dropped）。
+- 记录格式：<u32 长度><u32 crc32><payload>；长度 0 表示该段尚未写到这里，
+  长度 0xFFFFFFFF 表示封段（后续记录在下一段）。先写 payload 再写长度，撕裂写表现为“未写”。
+- 游标：cursor 文件保存 (段序号, 段内偏移)，原子替换写入。
+
+说明：数据写入 mmap 后即进入页缓存，进程崩溃不丢；掉电场景依赖封段/关闭时的 flush。
+回灌进内存队列即推进游标，与内存队列同等语义（at-most-once 的窗口仅限内存队列中的消息）。
+"""
+from __future__ import annotations
+import mmap
+import os
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+_HDR = struct.Struct("<II")
+_CURSOR = struct.Struct("<QQ")
+_SEAL = 0xFFFFFFFF
+
+Pos = Tuple[int, int]  # (段序号, 段内偏移)
+
+
+class _Segment:
+    __slots__ = ("seq", "path", "f", "mm")
+
+    def __init__(self, directory: Path, seq: int, size: int, create: bool):
+        self.seq = seq
+        self.path = directory / f"seg-{seq:010d}.spl"
+        if create:
+            with open(self.path, "wb") as f:
+                f.truncate(size)
+        self.f = open(self.path, "r+b")
+        self.mm = mmap.mmap(self.f.fileno(), 0)
+
+    def close(self) -> None:
+        try:
+            self.mm.flush()
+            self.mm.close()
+        finally:
+            self.f.close()
+
+
+class Spool:
+    def __init__(self, directory: str | Path, segment_bytes: int, max_segments: int):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = max(1 << 16, int(segment_bytes))
+        self.max_segments = max(2, int(max_segments))
+        self._lock = threading.Lock()
+        self._segs: Dict[int, _Segment] = {}
+        self._write: Pos = (1, 0)
+        self._read: Pos = (1, 0)
+        self.pending = 0          # 尚未回灌的记录数
+        self.appended = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.recovered = 0        # 启动时发现的待回放记录数
+        self._open()
+
+    # ---- 启动恢复 ----
+    def _open(self) -> None:
+        seqs = sorted(int(p.stem[4:]) for p in self.dir.glob("seg-*.spl"))
+        cur = self._load_cursor()
+        if not seqs:
+            self._segs[1] = _Segment(self.dir, 1, self.segment_bytes, create=True)
+            self._write = self._read = (1, 0)
+            return
+        for seq in seqs:
+            self._segs[seq] = _Segment(self.dir, seq, self.segment_bytes, create=False)
+        self._read = cur if (cur and cur[0] in self._segs) else (seqs[0], 0)
+        # 清理游标之前的残留段
+        for seq in seqs:
+            if seq < self._read[0]:
+                self._drop_segment(seq)
+        # 定位写入位置：最后一段中第一条“未写”记录
+        last = seqs[-1]
+        mm = self._segs[last].mm
+        off = 0
+        while off + _HDR.size <= len(mm):
+            ln, _ = _HDR.unpack_from(mm, off)
+            if ln == 0 or ln == _SEAL:
+                break
+            off += _HDR.size + ln
+        self._write = (last, off)
+        # 统计待回放记录数（只扫描长度头，不解析 payload）
+        n = 0
+        pos = self._read
+        while True:
+            nxt = self._next_record(pos)
+            if nxt is None:
+                break
+            pos = nxt[1]
+            n += 1
+        self.pending = self.recovered = n
+
+    def _load_cursor(self) -> Optional[Pos]:
+        p = self.dir / "cursor"
+        try:
+            data = p.read_bytes()
+            if len(data) == _CURSOR.size:
+                return _CURSOR.unpack(data)
+        except FileNotFoundError:
+            pass
+        return None
+
+    def _save_cursor(self) -> None:
+        tmp = self.dir / "cursor.tmp"
+        with open(tmp, "wb") as f:
+            f.write(_CURSOR.pack(*self._read))
+        os.replace(tmp, self.dir / "cursor")
+
+    def _drop_segment(self, seq: int) -> None:
+        seg = self._segs.pop(seq, None)
+        if seg is not None:
+            seg.close()
+            try:
+                seg.path.unlink()
+            except FileNotFoundError:
+                pass
+
+    # ---- 写入 ----
+    def append(self, payload: bytes) -> bool:
+        """追加一条记录；环已满或单条超过段大小时返回 False。"""
+        need = _HDR.size + len(payload)
+        if need + _HDR.size > self.segment_bytes:
+            self.dropped += 1
+            return False
+        with self._lock:
+            seq, off = self._write
+            seg = self._segs[seq]
+            if off + need + _HDR.size > self.segment_bytes:
+                # 当前段放不下：封段并切到下一段
+                if len(self._segs) >= self.max_segments:
+                    self.dropped += 1
+                    return False
+                _HDR.pack_into(seg.mm, off, _SEAL, 0)
+                seg.mm.flush()
+                seq, off = seq + 1, 0
+                seg = _Segment(self.dir, seq, self.segment_bytes, create=True)
+                self._segs[seq] = seg
+            seg.mm[off + _HDR.size: off + need] = payload
+            _HDR.pack_into(seg.mm, off, len(payload), zlib.crc32(payload))
+            self._write = (seq, off + need)
+            self.pending += 1
+            self.appended += 1
+            return True
+
+    # ---- 读取 ----
+    def _next_record(self, pos: Pos) -> Optional[Tuple[Optional[bytes], Pos]]:
+        """返回 (payload 或 None[校验失败], 下一位置)；无数据时返回 None。"""
+        seq, off = pos
+        while True:
+            if pos == self._write:
+                return None
+            seg = self._segs.get(seq)
+            if seg is None:
+                return None
+            if off + _HDR.size > self.segment_bytes:
+                ln = _SEAL
+            else:
+                ln, crc = _HDR.unpack_from(seg.mm, off)
+            if ln == _SEAL:
+                if seq + 1 not in self._segs:
+                    return None
+                seq, off = seq + 1, 0
+                pos = (seq, off)
+                continue
+            if ln == 0:
+                return None
+            payload = bytes(seg.mm[off + _HDR.size: off + _HDR.size + ln])
+            ok = zlib.crc32(payload) == crc
+            return (payload if ok else None), (seq, off + _HDR.size + ln)
+
+    def peek(self, max_n: int) -> List[Tuple[Optional[bytes], Pos]]:
+        """按 FIFO 读取至多 max_n 条（不推进游标）。"""
+        out: List[Tuple[Optional[bytes], Pos]] = []
+        with self._lock:
+            pos = self._read
+            while len(out) < max_n:
+                nxt = self._next_record(pos)
+                if nxt is None:
+                    break
+                out.append(nxt)
+                pos = nxt[1]
+        return out
+
+    def advance(self, pos: Pos, n: int) -> None:
+        """确认已回灌 n 条，游标推进到 pos，并删除已读完的段。"""
+        with self._lock:
+            self._read = pos
+            self.pending = max(0, self.pending - n)
+            self.replayed += n
+            for seq in [s for s in self._segs if s < pos[0]]:
+                self._drop_segment(seq)
+            self._save_cursor()
+
+    def close(self) -> None:
+        with self._lock:
+            self._save_cursor()
+            for seg in self._segs.values():
+                seg.close()
+            self._segs.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "recovered": self.recovered,
+            "dropped": self.dropped,
+            "segments": len(self._segs),
+            "bytes_on_disk": len(self._segs) * self.segment_bytes,
+            "read_pos": list(self._read),
+            "write_pos": list(self._write),
+        }
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+设备遥测二进制帧（紧凑格式，走 MQTT_BINARY_TOPIC）
+- 目的：避免 JSON 解析与逐字段 float() 转换，整帧用 struct.iter_unpack 批量解码。
+- 帧结构（小端）：
+  头部：magic "SCHB" | version u8 | flags u8 | count u16 | device_id（UTF-8，NUL 填充）
+    - v1 共 28 字节，device_id 20 字节；v2 共 58 字节，device_id 50 字节（与 device.device_id 等长）。
+    - 编码端 device_id 放得下 20 字节时仍写 v1（帧更短），否则写 v2；超过 50 字节拒绝编码，不截断。
+  记录 17 字节 × count：elderly_id u32（0 表示按设备注册表补全）| type u8 | value f32 | epoch_ms i64
+- 类型码：见 TYPE_NAMES（新增类型时两端同步追加，勿改已有编号）。
+"""
+from __future__ import annotations
+import struct
+from typing import Iterable, Iterator, Tuple
+
+MAGIC = b"SCHB"
+VERSION = 2
+
+HEADERS = {1: struct.Struct("<4sBBH20s"), 2: struct.Struct("<4sBBH50s")}
+HEADER = HEADERS[VERSION]
+RECORD = struct.Struct("<IBfq")
+
+TYPE_NAMES = {1: "heart_rate", 2: "blood_pressure", 3: "spo2", 4: "temperature", 5: "glucose"}
+TYPE_CODES = {v: k for k, v in TYPE_NAMES.items()}
+
+Record = Tuple[int, int, float, int]  # (elderly_id, type_code, value, epoch_ms)
+
+
+class FrameError(ValueError):
+    pass
+
+
+def encode_frame(device_id: str, records: Iterable[Record]) -> bytes:
+    recs = list(records)
+    if len(recs) > 0xFFFF:
+        raise FrameError("单帧记录数超过 65535")
+    dev = device_id.encode("utf-8")
+    ver = next((v for v, h in HEADERS.items() if len(dev) <= h.size - 8), None)
+    if ver is None:
+        raise FrameError(f"device_id 超过 {HEADER.size - 8} 字节")
+    header = HEADERS[ver]
+    buf = bytearray(header.size + RECORD.size * len(recs))
+    header.pack_into(buf, 0, MAGIC, ver, 0, len(recs), dev)
+    off = header.size
+    for r in recs:
+        RECORD.pack_into(buf, off, *r)
+        off += RECORD.size
+    return bytes(buf)
+
+
+def decode_frame(payload: bytes) -> Tuple[str, Iterator[Record]]:
+    """返回 (device_id, 记录迭代器)；记录为元组，不逐条构造 dict。"""
+    header = HEADERS.get(payload[4]) if len(payload) > 4 else None
+    if header is None or payload[:4] != MAGIC:
+        raise FrameError("magic/version 不匹配")
+    if len(payload) < header.size:
+        raise FrameError("帧长度不足")
+    _magic, _ver, _flags, count, dev = header.unpack_from(payload, 0)
+    end = header.size + RECORD.size * count
+    if len(payload) < end:
+        raise FrameError("帧长度与记录数不符")
+    body = memoryview(payload)[header.size:end]
+    return dev.rstrip(b"\x00").decode("utf-8", "replace"), RECORD.iter_unpack(body)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+独立摄取进程：python -m app.ingest
+- 运行 MQTT 订阅端（健康数据 + 门禁）、边缘异常引擎与写库工作线程/协程，与 API 进程解耦；
+  API 侧设置 INGEST_EMBEDDED=false 后只负责 HTTP 与 WS，可按需开多个 uvicorn worker。
+- 预警经 Unix socket（INGEST_IPC_SOCKET）推送给所有 API worker，见 app/events/alert_ipc.py；
+  API 侧老人增删/护理等级变更与规则重载经同一连接反向同步到本进程（老人ID索引未命中时另有查库兜底）。
+- 基线/限流/规则等进程内状态只在本进程中有效：API 侧 /api/edge/baseline、/rate-limits、/rules 返回 503，
+  /rules/reload 转发到本进程。
+- 同一台机器只应运行一个摄取进程（套接字已被占用时拒绝启动）。
+- INGEST_EMBEDDED=true（默认）时 app.main 在 API 进程内调用 start_ingest()，行为与单进程部署一致。
+"""
+from __future__ import annotations
+import asyncio
+import signal
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.logging import logger
+from app.events.access_consumer import start_access_consumer
+from app.events.mqtt_consumer import start_consumer, start_edge_services
+from app.events.mqtt_router import mqtt_router
+from app.services.edge.baseline_snapshot import flush_baseline_snapshots
+
+
+def start_ingest() -> None:
+    """
+    启动订阅端（须在事件循环内调用）：
+    - INGEST_MODE=asyncio 时健康数据走协程管线（依赖缺失则回退线程模式）
+    - 门禁订阅端，以及统一 MQTT 连接
+    """
+    if not (settings.INGEST_MODE == "asyncio" and _start_async_health_ingest()):
+        start_consumer()
+    start_access_consumer()
+    mqtt_router.start()
+
+
+def _start_async_health_ingest() -> bool:
+    from app.events.async_ingest import start_async_ingest
+
+    # 启动失败（依赖缺失）时回退 start_consumer()，边缘组件幂等，不会重复启动
+    start_edge_services()
+    return start_async_ingest()
+
+
+async def stop_ingest() -> None:
+    mqtt_router.stop()
+    if settings.INGEST_MODE == "asyncio":
+        from app.events.async_ingest import stop_async_ingest
+        await stop_async_ingest()
+    # 最后一次基线快照（写库队列中未处理的读数不计入）
+    await asyncio.to_thread(flush_baseline_snapshots)
+
+
+async def _run() -> None:
+    from app.api.v1.ws import set_warning_sink
+    from app.events.alert_ipc import AlertHub, socket_path
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("Ingest DB ping OK")
+    except AssertionError as e:
+        logger.warning(f"Ingest DB ping skipped due to dialect init: {e}")
+
+    hub = AlertHub(socket_path(), settings.INGEST_IPC_BUFFER_KB * 1024)
+    await hub.start()
+    # 本进程不做 WS 广播：全部预警转发给 API 进程
+    set_warning_sink(hub.publish)
+    start_ingest()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    logger.info(f"摄取进程已启动（INGEST_MODE={settings.INGEST_MODE}）")
+    await stop.wait()
+    logger.info("摄取进程退出中...")
+    await stop_ingest()
+    set_warning_sink(None)
+    await hub.close()
+
+
+def main() -> None:
+    if not settings.MQTT_ENABLED:
+        logger.warning("MQTT_ENABLED=false，摄取进程无事可做")
+        return
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
@@ -8,8 +9,9 @@ from app.api.api import api_router
 from app.core.config import settings
 
 # 订阅端与 WS 预警
-from app.events.mqtt_consumer import start_consumer
-from app.events.access_consumer import start_access_consumer
+from app.ingest import start_ingest, stop_ingest
+from app.services.edge.baseline_snapshot import flush_baseline_snapshots
+from app.events.alert_ipc import run_alert_subscriber
 from app.api.v1.ws import router as ws_router, start_broadcast_loop
 
 app = FastAPI(title="SmartCommHub Backend", version="1.0.0")
@@ -41,10 +43,22 @@ async def on_startup():
 
     # 启动 WS 广播后台任务（协程）
     await start_broadcast_loop()
-    # 启动 MQTT 订阅端（线程）
+    # 启动 MQTT 订阅端：各订阅端注册主题，共用一个 MQTT 连接（INGEST_MODE=asyncio 时健康数据走协程管线）
+    # INGEST_EMBEDDED=false 时订阅端由独立进程 python -m app.ingest 运行，本进程经 Unix socket 接收预警
     if settings.MQTT_ENABLED:
-        start_consumer()
-        start_access_consumer()
+        if settings.INGEST_EMBEDDED:
+            start_ingest()
+        else:
+            asyncio.create_task(run_alert_subscriber(), name="ingest-alert-subscriber")
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    if settings.MQTT_ENABLED and settings.INGEST_EMBEDDED:
+        await stop_ingest()
+    elif not settings.MQTT_ENABLED:
+        # 仅 HTTP 批量上报时管线按需启动，同样在关闭时写出基线快照
+        await asyncio.to_thread(flush_baseline_snapshots)
 
 app.include_router(api_router, prefix="/api")
 app.include_router(ws_router, prefix="")  # /ws/warning
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, BigInteger, Integer, String, Text, TIMESTAMP, ForeignKey
+from sqlalchemy.sql import text
+from app.models.base import Base
+
+
+class Device(Base):
+    __tablename__ = "device"
+
+    # 设备序列号（可穿戴设备只知道自己的序列号）
+    device_id = Column(String(50), primary_key=True)
+    # 绑定的老人；上报未携带 elderly_id 时据此补全
+    elderly_id = Column(BigInteger, ForeignKey("elderly.elderly_id", ondelete="CASCADE"), nullable=False, index=True)
+    # 支持的监测类型，逗号分隔（NULL 表示不限制）
+    monitor_types = Column(String(200), nullable=True)
+    # 校准偏移 JSON：{"heart_rate": -2.0, "temperature": 0.3}，读数 + 偏移后再校验
+    calibration = Column(Text, nullable=True)
+    # 启用标记：0/1
+    enabled = Column(Integer, nullable=False, default=1)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP, nullable=False, server_default=text("now()"))
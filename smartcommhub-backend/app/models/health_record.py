@@ -1,15 +1,20 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Index
 from app.models.base import Base
 
 
+# 自然键：同一设备对同一老人、同一类型、同一时刻只有一条读数（重试/回放按此去重）
+NATURAL_KEY = ("elderly_id", "device_id", "monitor_type", "monitor_time")
+
+
 class HealthRecord(Base):
     __tablename__ = "health_record"
+    __table_args__ = (Index("uq_health_record_natural", *NATURAL_KEY, unique=True),)
 
     # 主键
     record_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     # 关联老人ID
     elderly_id = Column(Integer, ForeignKey("elderly.elderly_id"), nullable=False)
-    # 监控类型：heart_rate / blood_pressure
+    # 监控类型：heart_rate / blood_pressure / spo2 ...（由生命体征规则表定义）
     monitor_type = Column(String(32), nullable=False)
     # 数值型监控值，便于聚合与建模
     monitor_value = Column(Numeric(6, 2), nullable=False)
@@ -18,4 +23,4 @@ class HealthRecord(Base):
     # 异常标记：0/1，默认0
     is_abnormal = Column(Integer, nullable=False, default=0)
     # 设备ID：模拟设备标识，默认 mock_device_001
-    device_id = Column(String(20), nullable=False, default="mock_device_001")
+    device_id = Column(String(50), nullable=False, default="mock_device_001")
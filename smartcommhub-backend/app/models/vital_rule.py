@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Numeric, TIMESTAMP
+from sqlalchemy.sql import text
+from app.models.base import Base
+
+
+class VitalRule(Base):
+    __tablename__ = "vital_rule"
+
+    rule_id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    # 监控类型：heart_rate / blood_pressure / spo2 / temperature / glucose ...
+    monitor_type = Column(String(32), nullable=False)
+    # 作用范围：default（全局）/ level（按 health_level）/ elder（按老人）
+    scope = Column(String(10), nullable=False, default="default")
+    # 范围键：scope=level 时为 health_level，scope=elder 时为 elderly_id
+    scope_key = Column(String(20), nullable=True)
+    # 有效范围与异常上下限（NULL 表示沿用上级/不设限）
+    valid_min = Column(Numeric(8, 2), nullable=True)
+    valid_max = Column(Numeric(8, 2), nullable=True)
+    abnormal_low = Column(Numeric(8, 2), nullable=True)
+    abnormal_high = Column(Numeric(8, 2), nullable=True)
+    # 启用标记：0/1
+    enabled = Column(Integer, nullable=False, default=1)
+    updated_at = Column(TIMESTAMP, nullable=False, server_default=text("now()"))
@@ -7,67 +7,400 @@
 - 判定：当样本数 >= min_samples 且 z > k_sigma 记为个人化异常
 - 置信度：综合样本量占比与偏差幅度（0-1）
 
-说明：该模块为内存级状态（进程生命周期有效）。如需持久化，可扩展至数据库。
+时段分桶（ANOMALY_SEASONAL）：心率等体征昼夜差异明显，单一基线会在凌晨与白天两头误报。
+- off：每键一组 (n, mu, mdev)；hour：按读数 monitor_time 的小时分 24 桶；daynight：白天/夜间 2 桶
+  （白天为 [ANOMALY_DAY_START_HOUR, ANOMALY_NIGHT_START_HOUR)）。
+- 分桶时每键状态为定长数组（SeasonalState：n / mu / mdev 各 B 个元素），评分只读写读数所在的桶，仍为 O(1)；
+  各桶独立累计样本数，某时段样本不足 min_samples 时该时段不判个性化异常。
+- 快照按键连续存放 B 个桶（见 baseline_snapshot.py）；切换分桶方式后旧快照按 _fit 换算
+  （-> 分桶：各桶样本数置 0，由冷启动播种或实时读数重新建立；分桶 -> 不分桶：取样本最多的桶）。
+
+持久化：基线定期写入紧凑二进制快照（见 baseline_snapshot.py），重启时 mmap 挂载；
+内存中没有的键首次访问时从快照按需取回（_get / peek_abnormal / get_state），启动无需逐键反序列化。
+
+内存上限：每键状态为 __slots__ 对象（n / mu / mdev / seen），键中的字符串驻留（sys.intern）共享；
+后台线程每 ANOMALY_EVICT_INTERVAL_SECONDS 扫描一次（evict）：
+- 超过 ANOMALY_IDLE_SECONDS 无读数的键淘汰（更换下来的设备、停用的监测类型）；
+- 仍超过 ANOMALY_MAX_KEYS 时按最久未更新（seen）继续淘汰；两次扫描之间允许短暂超出。
+淘汰的键在 ANOMALY_EVICT_TO_SNAPSHOT（且快照定期写出）时暂存为元组，下一次快照写出后释放；之前再次出现的键从暂存区取回。
+统计（键数、估算字节、淘汰计数）见 stats() / 指标 anomaly.store。
 """
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict, Tuple, Optional
+import heapq
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, Optional
 
 from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import metrics
 
 
 Key = Tuple[int, str, str]  # (elderly_id, device_id, monitor_type)
+Pending = Tuple[Any, Any, Any, float]  # 淘汰暂存：(n, mu, mdev, seen)；分桶时前三项为长度 B 的序列
+
+SEASONAL_BUCKETS = {"off": 1, "daynight": 2, "hour": 24}
 
 
-@dataclass
 class State:
-    n: int = 0
-    mu: float = 0.0
-    mdev: float = 0.0  # EWMA of absolute deviation
+    __slots__ = ("n", "mu", "mdev", "seen")
+
+    def __init__(self, n: int = 0, mu: float = 0.0, mdev: float = 0.0, seen: float = 0.0):
+        self.n = n
+        self.mu = mu
+        self.mdev = mdev  # EWMA of absolute deviation
+        self.seen = seen  # 最近一次更新的时间戳（epoch 秒），淘汰依据
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, State):
+            return NotImplemented
+        return (self.n, self.mu, self.mdev) == (other.n, other.mu, other.mdev)
+
+    def __repr__(self) -> str:
+        return f"State(n={self.n}, mu={self.mu}, mdev={self.mdev}, seen={self.seen})"
+
+
+class SeasonalState:
+    """分桶基线：n / mu / mdev 为长度 B 的定长数组（array 连续存放，不逐桶建对象）。"""
+
+    __slots__ = ("n", "mu", "mdev", "seen")
+
+    def __init__(self, n: Sequence[int], mu: Sequence[float], mdev: Sequence[float], seen: float = 0.0):
+        self.n = array("q", n)
+        self.mu = array("d", mu)
+        self.mdev = array("d", mdev)
+        self.seen = seen
+
+    @classmethod
+    def empty(cls, buckets: int) -> "SeasonalState":
+        return cls([0] * buckets, [0.0] * buckets, [0.0] * buckets)
+
+    def bucket(self, b: int) -> State:
+        return State(self.n[b], self.mu[b], self.mdev[b], self.seen)
+
+
+# 每键内存估算（不含共享的字符串）：状态对象 + 其中的 float + 键元组 + elderly_id
+_STATE_BYTES = sys.getsizeof(State()) + 3 * sys.getsizeof(0.0)
+_KEY_BYTES = sys.getsizeof((0, "", "")) + sys.getsizeof(1 << 20)
+_PENDING_BYTES = sys.getsizeof((0, 0.0, 0.0, 0.0)) + 3 * sys.getsizeof(0.0) + _KEY_BYTES
+
+
+def _seasonal_bytes(buckets: int) -> int:
+    return sys.getsizeof(SeasonalState.empty(0)) + sys.getsizeof(0.0) + sum(
+        sys.getsizeof(array(t, [0] * buckets)) for t in ("q", "d", "d")
+    )
+
+
+def pending_bytes(buckets: int) -> int:
+    """单个淘汰暂存条目的估算字节（分桶时三个定长数组）。"""
+    return _PENDING_BYTES if buckets == 1 else _seasonal_bytes(buckets) + _KEY_BYTES
 
 
-class AnomalyEngine:
-    def __init__(self, alpha: float, k_sigma: float, min_samples: int):
+def intern_key(key: Key) -> Key:
+    """新键入库前驻留字符串：同一设备/类型的所有键共享一份 str。"""
+    eid, dev, mt = key
+    return (eid, sys.intern(dev), sys.intern(mt))
+
+
+def hour_map(mode: str, day_start: int = 7, night_start: int = 22) -> Tuple[int, ...]:
+    """小时 -> 桶号（24 项）：off 全为 0；hour 为小时本身；daynight 白天 0、夜间 1。"""
+    if mode == "hour":
+        return tuple(range(24))
+    if mode == "daynight":
+        return tuple(0 if day_start <= h < night_start else 1 for h in range(24))
+    return (0,) * 24
+
+
+def hour_of(t: Any) -> int:
+    """读数时间的小时（"YYYY-MM-DD HH:MM:SS" / ISO 字符串或 datetime）；无法解析时取当前小时。"""
+    if isinstance(t, datetime):
+        return t.hour
+    try:
+        return int(str(t)[11:13]) % 24
+    except ValueError:
+        return time.localtime().tm_hour
+
+
+class _BaselineStore:
+    """两种引擎共用：时段分桶、淘汰预算、暂存区与计数。"""
+
+    def _init_store(
+        self, seasonal: str, day_start: int, night_start: int,
+        max_keys: int, idle_seconds: float, evict_to_snapshot: bool,
+    ) -> None:
+        self.seasonal = seasonal if seasonal in SEASONAL_BUCKETS else "off"
+        self.buckets = SEASONAL_BUCKETS[self.seasonal]
+        self.hour_buckets = hour_map(self.seasonal, day_start, night_start)
+        self.max_keys = max(0, int(max_keys))
+        self.idle_seconds = max(0.0, float(idle_seconds))
+        self.evict_to_snapshot = bool(evict_to_snapshot)
+        self._evicted: Dict[Key, Pending] = {}
+        self.evicted_idle = 0
+        self.evicted_budget = 0
+        self.sweeps = 0
+        self.sweep_ms = 0.0
+
+    def bucket_of(self, monitor_time: Any) -> int:
+        """读数所在的时段桶（不分桶时恒为 0）。"""
+        return 0 if self.buckets == 1 else self.hour_buckets[hour_of(monitor_time)]
+
+    def bucket_of_hour(self, hour: int) -> int:
+        return self.hour_buckets[hour % 24]
+
+    def _fit(self, rec: Pending) -> Pending:
+        """快照记录换算为本引擎的分桶数（分桶方式变更后首次加载旧快照）。"""
+        n, mu, mdev, seen = rec
+        flat = not isinstance(n, (list, tuple, array))
+        B = self.buckets
+        if flat and B == 1 or not flat and len(n) == B:
+            return rec
+        if B > 1:
+            # 全天基线不能代表任一时段：各桶按冷启动处理（n=0），不直接启用个性化检测
+            return [0] * B, [0.0] * B, [0.0] * B, seen
+        i = max(range(len(n)), key=n.__getitem__)  # 样本最多的桶
+        return n[i], mu[i], mdev[i], seen
+
+    def _stash(self, key: Key, rec: Pending) -> None:
+        if self.evict_to_snapshot:
+            self._evicted[key] = rec
+
+    def _lookup(self, key: Key, take: bool = False) -> Optional[Pending]:
+        """暂存区优先（比快照新），其次快照；take=True 时从暂存区取出。"""
+        rec = self._evicted.pop(key, None) if take else self._evicted.get(key)
+        snap = self._snapshot
+        if rec is None and snap is not None:
+            rec = snap.lookup(key)
+            if rec is not None and snap.buckets != self.buckets:
+                rec = self._fit(rec)
+        return rec
+
+    def _seed_skip(self, key: Key, bucket: int) -> bool:
+        """不在内存中的键：暂存区/快照中该桶已有样本则不播种（缺样本的桶照常填充）。"""
+        rec = self._lookup(key)
+        if rec is None:
+            return False
+        n = rec[0]
+        return bool(n[bucket] if self.buckets > 1 else n)
+
+    def evicted_pending(self) -> Dict[Key, Pending]:
+        """暂存区拷贝（写快照用，写出后交给 release_evicted）。"""
+        return dict(self._evicted)
+
+    def release_evicted(self, written: Dict[Key, Pending]) -> None:
+        """快照已写出：释放其中的暂存条目（写出期间被替换的条目保留到下一次）。"""
+        ev = self._evicted
+        for key, rec in written.items():
+            if ev.get(key) is rec:
+                ev.pop(key, None)
+
+    def _offline(self, live: Any, evicted: Dict[Key, Pending], min_seen: float) -> Iterator[Tuple[Any, ...]]:
+        """不在内存中的基线：暂存区 + 快照（两者中 seen < min_seen 的键均丢弃）。"""
+        for key, (n, mu, mdev, seen) in evicted.items():
+            if seen >= min_seen and key not in live:
+                yield key, n, mu, mdev, seen
+        snap = self._snapshot
+        if snap is not None:
+            fit = snap.buckets != self.buckets
+            for key, n, mu, mdev, seen in snap.records():
+                if seen >= min_seen and key not in live and key not in evicted:
+                    yield (key, *self._fit((n, mu, mdev, seen))) if fit else (key, n, mu, mdev, seen)
+
+    def _evict_stats(self, keys: int, nbytes: int) -> Dict[str, Any]:
+        return {
+            "keys": keys,
+            "bytes": nbytes,
+            "buckets": self.buckets,
+            "max_keys": self.max_keys,
+            "idle_seconds": self.idle_seconds,
+            "evicted_idle": self.evicted_idle,
+            "evicted_budget": self.evicted_budget,
+            "pending_evicted": len(self._evicted),
+            "restored": self.restored,
+            "sweeps": self.sweeps,
+            "sweep_ms": round(self.sweep_ms, 3),
+        }
+
+
+class AnomalyEngine(_BaselineStore):
+    def __init__(
+        self,
+        alpha: float,
+        k_sigma: float,
+        min_samples: int,
+        seasonal: str = "off",
+        day_start: int = 7,
+        night_start: int = 22,
+        max_keys: int = 0,
+        idle_seconds: float = 0,
+        evict_to_snapshot: bool = False,
+    ):
         self.alpha = max(0.001, min(alpha, 0.999))
         self.k = max(0.5, k_sigma)
         self.min_samples = max(1, min_samples)
-        self._store: Dict[Key, State] = {}
+        self._store: Dict[Key, Any] = {}  # 不分桶为 State，分桶为 SeasonalState
+        self._snapshot: Any = None  # baseline_snapshot.Snapshot（只读 mmap），未挂载为 None
+        self.updates = 0
+        self.restored = 0
+        # 键已按分片分配给工作线程；锁只防播种/淘汰线程与工作线程交错（无竞争时开销很小）
+        self._lock = threading.Lock()
+        self._init_store(seasonal, day_start, night_start, max_keys, idle_seconds, evict_to_snapshot)
+        self._state_bytes = _seasonal_bytes(self.buckets) if self.buckets > 1 else _STATE_BYTES
+        self._pending_bytes = pending_bytes(self.buckets)
+
+    def attach_snapshot(self, snap: Any) -> None:
+        """挂载（或替换为新写出的）快照；已在内存中的键以内存为准。"""
+        self._snapshot = snap
+
+    def _new_state(self, rec: Optional[Pending] = None) -> Any:
+        if self.buckets > 1:
+            return SeasonalState(*rec) if rec is not None else SeasonalState.empty(self.buckets)
+        return State(*rec) if rec is not None else State()
 
-    def _get(self, key: Key) -> State:
+    def _from_snapshot(self, key: Key) -> Optional[Any]:
+        rec = self._lookup(key)
+        return self._new_state(rec) if rec is not None else None
+
+    def _get(self, key: Key) -> Any:
         st = self._store.get(key)
         if st is None:
-            st = State()
-            self._store[key] = st
+            rec = self._lookup(key, take=True)
+            if rec is not None:
+                self.restored += 1
+            st = self._new_state(rec)
+            self._store[intern_key(key)] = st
         return st
 
-    def update_and_score(self, key: Key, x: float) -> Dict[str, float | int | bool]:
+    @staticmethod
+    def _record(st: Any, copy: bool = True) -> Pending:
+        if isinstance(st, SeasonalState) and copy:
+            return array("q", st.n), array("d", st.mu), array("d", st.mdev), st.seen
+        return st.n, st.mu, st.mdev, st.seen
+
+    def items(
+        self, evicted: Optional[Dict[Key, Pending]] = None, min_seen: float = 0.0
+    ) -> Iterator[Tuple[Any, ...]]:
+        """全部基线（内存 + 淘汰暂存 + 快照中尚未取回的键），供写快照使用；(key, n, mu, mdev, seen)。"""
+        live = dict(self._store)  # 拷贝一份，避免迭代期间工作线程增删键
+        for key, st in live.items():
+            yield (key, *self._record(st))
+        yield from self._offline(live, self.evicted_pending() if evicted is None else evicted, min_seen)
+
+    def seed(self, key: Key, n: int, mu: float, mdev: float, seen: float = 0.0, bucket: int = 0) -> bool:
+        """
+        冷启动播种（见 baseline_seed.py）：只填充尚无样本的键/桶，不覆盖已有基线；
+        淘汰暂存或快照中的键先取回内存（其中已有样本的桶同样不覆盖）。
+        """
+        with self._lock:
+            if key not in self._store and self._seed_skip(key, bucket):
+                return False
+            st = self._get(key)
+            if self.buckets > 1:
+                if st.n[bucket]:
+                    return False
+                st.n[bucket], st.mu[bucket], st.mdev[bucket] = int(n), float(mu), float(mdev)
+            else:
+                if st.n:
+                    return False  # 播种期间实时读数已建立该键
+                st.n, st.mu, st.mdev = int(n), float(mu), float(mdev)
+            st.seen = max(st.seen, float(seen))
+            self.updates += 1
+        return True
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """淘汰空闲键与超出预算的最久未更新键；返回淘汰数。"""
+        t0 = time.perf_counter()
+        now = time.time() if now is None else now
+        store = self._store
+        # 选择在锁外进行（全量扫描），移出在锁内进行，并跳过选中后又被更新的键
+        snapshot = [(k, st, st.seen) for k, st in list(store.items())]
+        victims: List[Tuple[Key, Any, float]] = []
+        if self.idle_seconds > 0:
+            cutoff = now - self.idle_seconds
+            victims = [v for v in snapshot if v[2] < cutoff]
+        n_idle = len(victims)
+        over = len(snapshot) - n_idle - self.max_keys if self.max_keys > 0 else 0
+        if over > 0:
+            gone = {v[0] for v in victims}
+            rest = (v for v in snapshot if v[0] not in gone)
+            victims.extend(heapq.nsmallest(over, rest, key=lambda v: v[2]))
+        idle = evicted = 0
+        with self._lock:
+            for i, (key, st, seen) in enumerate(victims):
+                if store.get(key) is not st or st.seen != seen:
+                    continue
+                del store[key]
+                self._stash(key, self._record(st, copy=False))  # 已移出内存，无需拷贝
+                evicted += 1
+                if i < n_idle:
+                    idle += 1
+        self.evicted_idle += idle
+        self.evicted_budget += evicted - idle
+        self.sweeps += 1
+        self.sweep_ms = (time.perf_counter() - t0) * 1000
+        return evicted
+
+    def memory_bytes(self) -> int:
+        """内存占用估算（字节）：dict 表 + 每键状态与键元组 + 淘汰暂存区。"""
+        n = len(self._store)
+        pending = len(self._evicted)
+        return (
+            sys.getsizeof(self._store) + n * (self._state_bytes + _KEY_BYTES)
+            + sys.getsizeof(self._evicted) + pending * self._pending_bytes
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return self._evict_stats(len(self._store), self.memory_bytes())
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def update_and_score(
+        self, key: Key, x: float, now: Optional[float] = None, bucket: int = 0
+    ) -> Dict[str, float | int | bool]:
         """
-        更新基线并返回评分结果：
+        更新基线（分桶时只更新 bucket 桶）并返回评分结果：
         - score: z 值（越大偏差越大）
         - confidence: 0-1
         - personal_abnormal: 是否触发个性化异常
         - n: 当前样本数
         - mu/mdev/sigma: 当前基线摘要
         """
+        with self._lock:
+            return self._update(key, x, now, bucket)
+
+    def _update(self, key: Key, x: float, now: Optional[float], bucket: int) -> Dict[str, float | int | bool]:
         st = self._get(key)
         a = self.alpha
-        if st.n == 0:
-            st.mu = x
-            st.mdev = 0.0
+        if self.buckets > 1:
+            n, mu, mdev = st.n[bucket], st.mu[bucket], st.mdev[bucket]
+        else:
+            n, mu, mdev = st.n, st.mu, st.mdev
+        if n == 0:
+            mu = x
+            mdev = 0.0
+        else:
+            mu = (1 - a) * mu + a * x
+            mdev = (1 - a) * mdev + a * abs(x - mu)
+        n += 1
+        if self.buckets > 1:
+            st.n[bucket], st.mu[bucket], st.mdev[bucket] = n, mu, mdev
         else:
-            st.mu = (1 - a) * st.mu + a * x
-            st.mdev = (1 - a) * st.mdev + a * abs(x - st.mu)
-        st.n += 1
+            st.n, st.mu, st.mdev = n, mu, mdev
+        st.seen = time.time() if now is None else now
+        self.updates += 1
 
-        sigma = 1.253 * st.mdev  # Laplace 近似
+        sigma = 1.253 * mdev  # Laplace 近似
         eps = 1e-6
-        z = abs(x - st.mu) / (sigma + eps)
+        z = abs(x - mu) / (sigma + eps)
 
-        enough = st.n >= self.min_samples
+        enough = n >= self.min_samples
         personal_abnormal = bool(enough and z > self.k)
 
         # 置信度：样本量比例 * 偏差幅度比例（截断）
-        sample_ratio = min(st.n / self.min_samples, 1.0)
+        sample_ratio = min(n / self.min_samples, 1.0)
         deviation_ratio = min(z / (2 * self.k), 1.0)
         confidence = max(0.0, min(1.0, 0.2 + 0.8 * sample_ratio * deviation_ratio))
 
@@ -75,20 +408,108 @@ class AnomalyEngine:
             "score": float(z),
             "confidence": float(confidence),
             "personal_abnormal": personal_abnormal,
-            "n": st.n,
-            "mu": float(st.mu),
-            "mdev": float(st.mdev),
+            "n": n,
+            "mu": float(mu),
+            "mdev": float(mdev),
             "sigma": float(sigma),
             "k": float(self.k),
         }
 
-    def get_state(self, key: Key) -> Optional[State]:
-        return self._store.get(key)
+    def score_batch(
+        self, keys: Sequence[Key], values: Sequence[float], buckets: Optional[Sequence[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """按序逐条 update_and_score（与 VectorAnomalyEngine.score_batch 接口一致）；buckets 为各条读数的时段桶。"""
+        now = time.time()
+        update = self._update
+        with self._lock:
+            if buckets is None or self.buckets == 1:
+                return [update(k, x, now, 0) for k, x in zip(keys, values)]
+            return [update(k, x, now, b) for k, x, b in zip(keys, values, buckets)]
+
+    def get_state(self, key: Key, bucket: int = 0) -> Optional[State]:
+        """某键（分桶时为其某一时段桶）的基线；不存在返回 None。"""
+        st = self._store.get(key)
+        if st is None:
+            st = self._from_snapshot(key)
+        if st is None:
+            return None
+        return st.bucket(bucket) if isinstance(st, SeasonalState) else st
+
+    def peek_abnormal(self, key: Key, x: float, bucket: int = 0) -> bool:
+        """
+        只读预判：若此刻以 x 更新，是否会判为个人化异常（不修改基线）。
+        供解码阶段分流使用；并发更新下为近似结果，最终以 update_and_score 为准。
+        """
+        st = self.get_state(key, bucket)
+        if st is None or st.n + 1 < self.min_samples:
+            return False
+        a = self.alpha
+        mu = (1 - a) * st.mu + a * x
+        mdev = (1 - a) * st.mdev + a * abs(x - mu)
+        return abs(x - mu) / (1.253 * mdev + 1e-6) > self.k
+
+
+def make_engine() -> Any:
+    """按 ANOMALY_ENGINE 创建引擎：scalar（默认）| vector（NumPy 结构数组，缺少 numpy 时回退 scalar）。"""
+    kwargs = dict(
+        alpha=settings.ANOMALY_ALPHA,
+        k_sigma=settings.ANOMALY_K_SIGMA,
+        min_samples=settings.ANOMALY_MIN_SAMPLES,
+        seasonal=settings.ANOMALY_SEASONAL,
+        day_start=settings.ANOMALY_DAY_START_HOUR,
+        night_start=settings.ANOMALY_NIGHT_START_HOUR,
+        max_keys=settings.ANOMALY_MAX_KEYS,
+        idle_seconds=settings.ANOMALY_IDLE_SECONDS,
+        # 暂存区只在下一次定期快照写出后释放：未启用定期写出时不暂存（否则一直累积到退出）
+        evict_to_snapshot=(
+            settings.ANOMALY_EVICT_TO_SNAPSHOT
+            and settings.ANOMALY_SNAPSHOT_ENABLED
+            and settings.ANOMALY_SNAPSHOT_INTERVAL_SECONDS > 0
+        ),
+    )
+    if settings.ANOMALY_SEASONAL not in SEASONAL_BUCKETS:
+        logger.warning(f"未知的 ANOMALY_SEASONAL={settings.ANOMALY_SEASONAL!r}，按 off 处理")
+    if settings.ANOMALY_ENGINE == "vector":
+        try:
+            from app.services.edge.anomaly_vector import VectorAnomalyEngine
+
+            return VectorAnomalyEngine(**kwargs)
+        except ImportError as e:
+            logger.warning(f"向量化异常引擎不可用（{e}），回退为标量引擎")
+    return AnomalyEngine(**kwargs)
+
+
+def _evict_loop(engine: Any, interval_s: int) -> None:
+    while True:
+        time.sleep(interval_s)
+        try:
+            n = engine.evict()
+            if n:
+                logger.info(f"基线淘汰 {n} 个键（剩余 {len(engine)} 个，{engine.sweep_ms:.1f} ms）")
+        except Exception as e:
+            logger.warning(f"基线淘汰扫描失败：{e}")
+
+
+_EVICTION_STARTED = False
+_EVICTION_LOCK = threading.Lock()
+
+
+def start_baseline_eviction() -> None:
+    """注册 anomaly.store 指标 + 定期淘汰线程；重复调用无副作用。"""
+    global _EVICTION_STARTED
+    with _EVICTION_LOCK:
+        if _EVICTION_STARTED:
+            return
+        _EVICTION_STARTED = True
+    metrics.register_collector("anomaly.store", anomaly_engine.stats)
+    if settings.ANOMALY_EVICT_INTERVAL_SECONDS > 0 and (settings.ANOMALY_MAX_KEYS > 0 or settings.ANOMALY_IDLE_SECONDS > 0):
+        threading.Thread(
+            target=_evict_loop,
+            args=(anomaly_engine, settings.ANOMALY_EVICT_INTERVAL_SECONDS),
+            name="anomaly-evict",
+            daemon=True,
+        ).start()
 
 
 # 全局实例（进程级）
-anomaly_engine = AnomalyEngine(
-    alpha=settings.ANOMALY_ALPHA,
-    k_sigma=settings.ANOMALY_K_SIGMA,
-    min_samples=settings.ANOMALY_MIN_SAMPLES,
-)
+anomaly_engine = make_engine()
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+向量化个性化异常检测引擎（结构数组 + 批量评分，ANOMALY_ENGINE=vector）
+- 与 AnomalyEngine 算法一致（EWMA 均值 μ、EWMA 绝对偏差 mdev、z = |x-μ| / (1.253·mdev + eps)），逐位等价；
+  等价性校验见 tests/test_anomaly_vector.py，性能对比见 tests/bench_anomaly_engines.py。
+- 结构：(elderly_id, device_id, monitor_type) 键驻留为整数槽位（dict 键 -> slot），
+  状态为 NumPy 数组 n / mu / mdev（按槽位下标，容量不足时倍增）。
+  时段分桶（ANOMALY_SEASONAL）时每槽位连续占 B 个单元：单元下标 = slot * B + bucket，评分按单元更新。
+- 批量评分：update_and_score_batch(slots, values) 以向量运算完成 EWMA 更新与 z 值计算。
+  同批内重复的槽位必须按顺序更新：先算出每个元素在同槽位中的出现序号（rank），
+  再按 rank = 0, 1, 2, ... 分轮，每轮内槽位互不相同，可整体向量化（轮数 = 同批单键最大重复次数）。
+- 线程：分片工作线程共用一个实例，槽位驻留与数组更新在同一把锁内完成（扩容会替换数组引用）。
+- 淘汰：与 AnomalyEngine 相同的预算/空闲规则（evict），seen 数组记录最近访问时间（slots() 时刷新）；
+  被淘汰键的槽位进入空闲链表，供新键复用，数组容量不回缩。
+- 依赖：numpy（可选）；缺失时 anomaly.make_engine 回退为标量引擎。
+"""
+from __future__ import annotations
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.edge.anomaly import _KEY_BYTES, Key, Pending, State, _BaselineStore, intern_key, pending_bytes
+
+_EPS = 1e-6
+
+
+class VectorAnomalyEngine(_BaselineStore):
+    def __init__(
+        self,
+        alpha: float,
+        k_sigma: float,
+        min_samples: int,
+        capacity: int = 1024,
+        seasonal: str = "off",
+        day_start: int = 7,
+        night_start: int = 22,
+        max_keys: int = 0,
+        idle_seconds: float = 0,
+        evict_to_snapshot: bool = False,
+    ):
+        self.alpha = max(0.001, min(alpha, 0.999))
+        self.k = max(0.5, k_sigma)
+        self.min_samples = max(1, min_samples)
+        self._slot: Dict[Key, int] = {}
+        self._keys: List[Optional[Key]] = []  # 槽位 -> 键；已淘汰的槽位为 None
+        self._free: List[int] = []
+        self._init_store(seasonal, day_start, night_start, max_keys, idle_seconds, evict_to_snapshot)
+        cap = max(16, int(capacity))
+        cells = cap * self.buckets
+        self.n = np.zeros(cells, dtype=np.int64)
+        self.mu = np.zeros(cells, dtype=np.float64)
+        self.mdev = np.zeros(cells, dtype=np.float64)
+        self.seen = np.zeros(cap, dtype=np.float64)  # 按槽位（不分桶）
+        self._lock = threading.Lock()
+        self._snapshot: Any = None
+        self.updates = 0
+        self.restored = 0
+
+    # 槽位驻留
+
+    def _grow(self, need: int) -> None:
+        cap = len(self.seen)
+        while cap < need:
+            cap *= 2
+        for name in ("n", "mu", "mdev", "seen"):
+            old = getattr(self, name)
+            arr = np.zeros(cap if name == "seen" else cap * self.buckets, dtype=old.dtype)
+            arr[: len(old)] = old
+            setattr(self, name, arr)
+
+    def _intern(self, key: Key) -> int:
+        s = self._slot.get(key)
+        if s is None:
+            key = intern_key(key)
+            if self._free:
+                s = self._free.pop()
+                self._keys[s] = key
+            else:
+                s = len(self._keys)
+                if s >= len(self.seen):
+                    self._grow(s + 1)
+                self._keys.append(key)
+            self._slot[key] = s
+            rec = self._lookup(key, take=True)
+            if rec is not None:
+                c = self._cells(s)
+                self.n[c], self.mu[c], self.mdev[c] = rec[0], rec[1], rec[2]
+                self.seen[s] = rec[3]
+                self.restored += 1
+        return s
+
+    def _cells(self, s: int) -> slice:
+        return slice(s * self.buckets, (s + 1) * self.buckets)
+
+    def _record(self, s: int) -> Pending:
+        if self.buckets == 1:
+            return int(self.n[s]), float(self.mu[s]), float(self.mdev[s]), float(self.seen[s])
+        c = self._cells(s)
+        return self.n[c].tolist(), self.mu[c].tolist(), self.mdev[c].tolist(), float(self.seen[s])
+
+    def slots(self, keys: Sequence[Key]) -> np.ndarray:
+        """键 -> 槽位数组（新键分配槽位，快照中有的键取回基线）；同时刷新 seen，避免评分前被淘汰。"""
+        with self._lock:
+            return self._slots(keys, time.time())
+
+    def _slots(self, keys: Sequence[Key], now: float) -> np.ndarray:
+        out = np.fromiter((self._intern(k) for k in keys), dtype=np.int64, count=len(keys))
+        self.seen[out] = now
+        return out
+
+    # 批量评分
+
+    @staticmethod
+    def _ranks(slots: np.ndarray) -> np.ndarray:
+        """每个元素在同槽位元素中的出现序号（保持原顺序：第一次出现为 0）。"""
+        order = np.argsort(slots, kind="stable")
+        sorted_slots = slots[order]
+        m = len(slots)
+        start = np.ones(m, dtype=bool)
+        start[1:] = sorted_slots[1:] != sorted_slots[:-1]
+        group_start = np.maximum.accumulate(np.where(start, np.arange(m), 0))
+        ranks = np.empty(m, dtype=np.int64)
+        ranks[order] = np.arange(m) - group_start
+        return ranks
+
+    def update_and_score_batch(
+        self, slots: np.ndarray, values: np.ndarray, buckets: Optional[Sequence[int]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        按输入顺序更新基线并评分（分桶时按 buckets 定位单元）；返回与输入等长的数组：
+        score / confidence / personal_abnormal / n / mu / mdev / sigma。
+        槽位须在持锁期间仍有效：与 slots() 分开调用时，调用方需保证其间没有淘汰（否则用 score_batch）。
+        """
+        x_all = np.asarray(values, dtype=np.float64)
+        with self._lock:
+            res = self._update(np.asarray(slots, dtype=np.int64), x_all, buckets)
+        return self._scores(res)
+
+    def _update(self, slots: np.ndarray, x_all: np.ndarray, buckets: Optional[Sequence[int]]) -> Dict[str, np.ndarray]:
+        # 调用方持有 self._lock
+        if self.buckets > 1 and buckets is not None:
+            slots = slots * self.buckets + np.asarray(buckets, dtype=np.int64)
+        elif self.buckets > 1:
+            slots = slots * self.buckets
+        m = len(slots)
+        out_n = np.empty(m, dtype=np.int64)
+        out_mu = np.empty(m, dtype=np.float64)
+        out_mdev = np.empty(m, dtype=np.float64)
+        a = self.alpha
+        ranks = self._ranks(slots) if m > 1 else np.zeros(m, dtype=np.int64)
+        n, mu, mdev = self.n, self.mu, self.mdev
+        max_rank = int(ranks.max()) if m else -1
+        for r in range(max_rank + 1):
+            sel = np.arange(m) if max_rank == 0 else np.flatnonzero(ranks == r)
+            s = slots[sel]
+            x = x_all[sel]
+            first = n[s] == 0
+            mu_s = np.where(first, x, (1 - a) * mu[s] + a * x)
+            mdev_s = np.where(first, 0.0, (1 - a) * mdev[s] + a * np.abs(x - mu_s))
+            mu[s] = mu_s
+            mdev[s] = mdev_s
+            n[s] += 1
+            out_n[sel] = n[s]
+            out_mu[sel] = mu_s
+            out_mdev[sel] = mdev_s
+        self.updates += m
+        return {"n": out_n, "mu": out_mu, "mdev": out_mdev, "x": x_all}
+
+    def _scores(self, res: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        # 评分在锁外进行（只读本批结果）
+        out_n, out_mu, out_mdev = res.pop("n"), res.pop("mu"), res.pop("mdev")
+        sigma = 1.253 * out_mdev
+        z = np.abs(res.pop("x") - out_mu) / (sigma + _EPS)
+        enough = out_n >= self.min_samples
+        abnormal = enough & (z > self.k)
+        sample_ratio = np.minimum(out_n / self.min_samples, 1.0)
+        deviation_ratio = np.minimum(z / (2 * self.k), 1.0)
+        confidence = np.clip(0.2 + 0.8 * sample_ratio * deviation_ratio, 0.0, 1.0)
+        return {
+            "score": z,
+            "confidence": confidence,
+            "personal_abnormal": abnormal,
+            "n": out_n,
+            "mu": out_mu,
+            "mdev": out_mdev,
+            "sigma": sigma,
+        }
+
+    def _score(
+        self, keys: Sequence[Key], values: Sequence[float], buckets: Optional[Sequence[int]], now: float
+    ) -> List[Dict[str, Any]]:
+        x_all = np.asarray(values, dtype=np.float64)
+        # 分配槽位与更新在同一次持锁内完成，期间淘汰线程无法回收/复用这些槽位
+        with self._lock:
+            res = self._update(self._slots(keys, now), x_all, buckets)
+        res = self._scores(res)
+        k = float(self.k)
+        cols = [res[c].tolist() for c in ("score", "confidence", "personal_abnormal", "n", "mu", "mdev", "sigma")]
+        return [
+            {
+                "score": z, "confidence": c, "personal_abnormal": ab, "n": n,
+                "mu": mu, "mdev": md, "sigma": sg, "k": k,
+            }
+            for z, c, ab, n, mu, md, sg in zip(*cols)
+        ]
+
+    def score_batch(
+        self, keys: Sequence[Key], values: Sequence[float], buckets: Optional[Sequence[int]] = None
+    ) -> List[Dict[str, Any]]:
+        """与 AnomalyEngine.score_batch 相同的接口：按序更新并返回逐条结果字典。"""
+        if not keys:
+            return []
+        return self._score(keys, values, buckets, time.time())
+
+    def update_and_score(
+        self, key: Key, x: float, now: Optional[float] = None, bucket: int = 0
+    ) -> Dict[str, Any]:
+        """与 AnomalyEngine.update_and_score 相同的签名（now 为本次更新记录的 seen）。"""
+        return self._score([key], [x], [bucket], time.time() if now is None else now)[0]
+
+    # 与 AnomalyEngine 一致的只读接口
+
+    def attach_snapshot(self, snap: Any) -> None:
+        self._snapshot = snap
+
+    def get_state(self, key: Key, bucket: int = 0) -> Optional[State]:
+        s = self._slot.get(key)
+        if s is not None:
+            i = s * self.buckets + bucket
+            return State(int(self.n[i]), float(self.mu[i]), float(self.mdev[i]), float(self.seen[s]))
+        rec = self._lookup(key)
+        if rec is None:
+            return None
+        if self.buckets == 1:
+            return State(*rec)
+        return State(int(rec[0][bucket]), float(rec[1][bucket]), float(rec[2][bucket]), rec[3])
+
+    def peek_abnormal(self, key: Key, x: float, bucket: int = 0) -> bool:
+        st = self.get_state(key, bucket)
+        if st is None or st.n + 1 < self.min_samples:
+            return False
+        a = self.alpha
+        mu = (1 - a) * st.mu + a * x
+        mdev = (1 - a) * st.mdev + a * abs(x - mu)
+        return abs(x - mu) / (1.253 * mdev + _EPS) > self.k
+
+    def items(
+        self, evicted: Optional[Dict[Key, Pending]] = None, min_seen: float = 0.0
+    ) -> Iterator[Tuple[Key, int, float, float, float]]:
+        B = self.buckets
+        with self._lock:
+            keys = list(self._keys)
+            m = len(keys)
+            if B == 1:
+                n, mu, mdev = self.n[:m].tolist(), self.mu[:m].tolist(), self.mdev[:m].tolist()
+            else:
+                n = self.n[: m * B].reshape(m, B).tolist()
+                mu = self.mu[: m * B].reshape(m, B).tolist()
+                mdev = self.mdev[: m * B].reshape(m, B).tolist()
+            seen = self.seen[:m].tolist()
+        held = set(keys)
+        for rec in zip(keys, n, mu, mdev, seen):
+            if rec[0] is not None:
+                yield rec
+        yield from self._offline(held, self.evicted_pending() if evicted is None else evicted, min_seen)
+
+    def seed(self, key: Key, n: int, mu: float, mdev: float, seen: float = 0.0, bucket: int = 0) -> bool:
+        """冷启动播种：与 AnomalyEngine.seed 相同，只填充尚无样本的键/桶。"""
+        with self._lock:
+            if key not in self._slot and self._seed_skip(key, bucket):
+                return False
+            s = self._intern(key)
+            i = s * self.buckets + bucket
+            if self.n[i]:
+                return False
+            self.n[i], self.mu[i], self.mdev[i] = int(n), float(mu), float(mdev)
+            self.seen[s] = max(float(self.seen[s]), float(seen))
+            self.updates += 1
+        return True
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """淘汰空闲键与超出预算的最久未更新键，槽位回收到空闲链表；返回淘汰数。"""
+        t0 = time.perf_counter()
+        now = time.time() if now is None else now
+        with self._lock:
+            live = np.fromiter(self._slot.values(), dtype=np.int64, count=len(self._slot))
+            seen = self.seen[live]
+            idle_mask = seen < now - self.idle_seconds if self.idle_seconds > 0 else np.zeros(len(live), dtype=bool)
+            victims = live[idle_mask]
+            idle = len(victims)
+            over = len(live) - idle - self.max_keys if self.max_keys > 0 else 0
+            if over > 0:
+                rest, rest_seen = live[~idle_mask], seen[~idle_mask]
+                victims = np.concatenate([victims, rest[np.argpartition(rest_seen, over - 1)[:over]]])
+            for s in victims.tolist():
+                key = self._keys[s]
+                self._stash(key, self._record(s))
+                del self._slot[key]
+                self._keys[s] = None
+                c = self._cells(s)
+                self.n[c] = 0
+                self.mu[c] = self.mdev[c] = 0.0
+                self.seen[s] = 0.0
+                self._free.append(s)
+        self.evicted_idle += idle
+        self.evicted_budget += len(victims) - idle
+        self.sweeps += 1
+        self.sweep_ms = (time.perf_counter() - t0) * 1000
+        return len(victims)
+
+    def memory_bytes(self) -> int:
+        """内存占用估算（字节）：状态数组 + 键 -> 槽位 dict + 键元组 + 淘汰暂存区。"""
+        arrays = self.n.nbytes + self.mu.nbytes + self.mdev.nbytes + self.seen.nbytes
+        return (
+            arrays + sys.getsizeof(self._slot) + sys.getsizeof(self._keys) + len(self._slot) * _KEY_BYTES
+            + sys.getsizeof(self._evicted) + len(self._evicted) * pending_bytes(self.buckets)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        out = self._evict_stats(len(self._slot), self.memory_bytes())
+        out["capacity"] = len(self.seen)
+        return out
+
+    def __len__(self) -> int:
+        return len(self._slot)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+个性化基线冷启动播种（从 health_record 历史读数）
+- 背景：新实例（无快照或快照缺键）的基线从 n=0 开始，要等 ANOMALY_MIN_SAMPLES 条实时读数后个性化检测才生效，
+  而 health_record 中已有数月读数。
+- 聚合：单条 SQL 在库内按 (elderly_id, device_id, monitor_type) 分组（见 HealthRecordDAO.baseline_stats），
+  只取最近 ANOMALY_SEED_WINDOW_DAYS 天、且读数不少于 ANOMALY_SEED_MIN_COUNT 条的组：
+  - 中心：中位数（percentile_cont(0.5)），不受偶发异常值影响；
+  - 离散度：IQR / 1.349 近似 σ（IQR 为 0 的整数型读数退回样本标准差），再按引擎的 σ ≈ 1.253·mdev 换算为 mdev；
+  - n：组内读数条数（达到 ANOMALY_MIN_SAMPLES 即立即启用个性化检测）；seen：组内最近读数时间。
+  - 最近读数早于 ANOMALY_IDLE_SECONDS 的组不播种（播种后会被下一次淘汰扫描立即清出，计入 stale）。
+- 时段分桶（ANOMALY_SEASONAL）：SQL 再按 monitor_time 的小时映射到桶分组，每桶单独播种。
+- 写入：服务端游标分批取回（ANOMALY_SEED_FETCH_SIZE 行/批），逐行 anomaly_engine.seed；
+  只填充尚无样本的键/桶：实时读数与快照总是比历史聚合新，已有样本的桶不覆盖；快照/暂存区中的键先取回内存再填充其空桶。
+- 调度：订阅端启动时在快照挂载之后开后台线程执行一次，不阻塞启动；进度见指标 anomaly.seed。
+"""
+from __future__ import annotations
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+from app.services.edge.anomaly import anomaly_engine
+
+# 正态分布下 IQR ≈ 1.349σ；引擎以 σ ≈ 1.253·mdev 评分
+_IQR_TO_SIGMA = 1.349
+_SIGMA_TO_MDEV = 1.253
+_LOG_EVERY = 10000
+
+
+def seed_state(row: Any) -> Optional[tuple]:
+    """聚合行 -> (n, mu, mdev, seen)；中心值缺失时返回 None。"""
+    if row.median is None:
+        return None
+    iqr = float(row.q3 - row.q1) if row.q1 is not None and row.q3 is not None else 0.0
+    sigma = iqr / _IQR_TO_SIGMA if iqr > 0 else float(row.stddev or 0.0)
+    last = row.last_time
+    seen = last.timestamp() if isinstance(last, datetime) else time.time()
+    return int(row.n), float(row.median), sigma / _SIGMA_TO_MDEV, seen
+
+
+class BaselineSeeder:
+    def __init__(self, engine: Any):
+        self.engine = engine
+        self.state = "idle"  # idle | running | done | failed
+        self.groups = 0
+        self.seeded = 0
+        self.skipped = 0
+        self.stale = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def run(self, window_days: int, min_count: int, fetch_size: int) -> int:
+        """执行一次播种；返回写入的键数。"""
+        from app.core.database import SessionLocal
+        from app.dao.health_record_dao import health_record_dao
+
+        self.state = "running"
+        self.started_at = time.time()
+        since = datetime.now() - timedelta(days=max(1, window_days))
+        idle_s = self.engine.idle_seconds
+        stale_before = time.time() - idle_s if idle_s > 0 else 0.0
+        try:
+            with SessionLocal() as db:
+                hours = self.engine.hour_buckets if self.engine.buckets > 1 else None
+                parts = health_record_dao.baseline_stats(db, since, max(1, min_count), max(1, fetch_size), hours)
+                for part in parts:
+                    for row in part:
+                        self.groups += 1
+                        rec = seed_state(row)
+                        key = (int(row.elderly_id), str(row.device_id), str(row.monitor_type))
+                        bucket = int(row.bucket) if hours is not None else 0
+                        if rec is not None and rec[3] < stale_before:
+                            self.stale += 1
+                        elif rec is not None and self.engine.seed(key, *rec, bucket=bucket):
+                            self.seeded += 1
+                        else:
+                            self.skipped += 1
+                        if self.groups % _LOG_EVERY == 0:
+                            logger.info(f"基线播种进行中：{self.groups} 组，写入 {self.seeded}")
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            raise
+        finally:
+            self.finished_at = time.time()
+        self.state = "done"
+        return self.seeded
+
+    def stats(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "state": self.state,
+            "groups": self.groups,
+            "seeded": self.seeded,
+            "skipped": self.skipped,
+            "stale": self.stale,
+            "elapsed_s": round(end - self.started_at, 3) if self.started_at else None,
+            "error": self.error,
+        }
+
+
+def _seed_once() -> None:
+    try:
+        n = baseline_seeder.run(
+            settings.ANOMALY_SEED_WINDOW_DAYS,
+            settings.ANOMALY_SEED_MIN_COUNT,
+            settings.ANOMALY_SEED_FETCH_SIZE,
+        )
+        s = baseline_seeder.stats()
+        logger.info(f"基线播种完成：{s['groups']} 组，写入 {n}，跳过 {s['skipped']}（{s['elapsed_s']} s）")
+    except Exception as e:
+        logger.warning(f"基线播种失败（个性化基线从实时读数建立）：{e}")
+
+
+_SEED_STARTED = False
+_SEED_LOCK = threading.Lock()
+
+
+def start_baseline_seeding() -> None:
+    """后台执行一次播种（应在快照挂载之后调用）；重复调用无副作用。"""
+    global _SEED_STARTED
+    if not (settings.ANOMALY_PERSONAL_ENABLED and settings.ANOMALY_SEED_ENABLED):
+        return
+    with _SEED_LOCK:
+        if _SEED_STARTED:
+            return
+        _SEED_STARTED = True
+    metrics.register_collector("anomaly.seed", baseline_seeder.stats)
+    threading.Thread(target=_seed_once, name="anomaly-seed", daemon=True).start()
+
+
+# 全局实例（进程级）
+baseline_seeder = BaselineSeeder(anomaly_engine)
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+个性化基线快照（AnomalyEngine 状态持久化，快速热重启）
+- 背景：基线只在内存中，每次发布/崩溃后所有键回到 n=0，个性化告警要再等 ANOMALY_MIN_SAMPLES 条读数。
+- 文件格式（小端，按 8 字节对齐，单文件）：
+  头部 40 字节：magic "SCHA" | version u16 | flags u16 | count u64 | strtab_bytes u64 | created_at f64 | alpha f64
+  扩展头 8 字节（v3 起）：buckets u32 | 保留 u32（时段分桶数 B，不分桶为 1；v1/v2 按 1 计）
+  keys  u64 × count：(elderly_id << 32) | crc32(device_id + "\\x1f" + monitor_type)，升序
+  mu    f64 × count × B（同一键的 B 个桶连续存放，下同）
+  mdev  f64 × count × B
+  n     u32 × count × B
+  sref  u32 × count：该键 (device_id, monitor_type) 在字符串表中的序号（crc32 碰撞时据此区分）
+  seen  u32 × count：最近一次更新时间（epoch 秒；v2 起，v1 文件按 created_at 计）
+  strtab：UTF-8，"device_id\\x1fmonitor_type" 以 "\\0" 分隔（设备×类型组合数远小于键数）
+- 写入：后台线程每 ANOMALY_SNAPSHOT_INTERVAL_SECONDS 写一次（基线无更新则跳过），关闭时再写一次；
+  先写临时文件并 fsync，再 os.replace 原子替换，崩溃不会留下半个快照。
+  内存中被淘汰的键（ANOMALY_EVICT_TO_SNAPSHOT）随下一次写出落盘，写出后从暂存区释放；
+  快照中超过 ANOMALY_SNAPSHOT_RETENTION_DAYS 未更新的键在写出时丢弃，文件不会无限增长。
+- 恢复：启动时 mmap 整个文件，各数组为 memoryview.cast 零拷贝视图，不逐键反序列化（100 万键挂载为毫秒级）；
+  引擎首次访问某键时按 keys 二分查找取回（见 AnomalyEngine._get），之后以内存为准。
+  快照分桶数与引擎（ANOMALY_SEASONAL）不一致时，取回的记录按引擎的 _fit 换算，下一次写出即为新布局。
+- 限制：elderly_id 需小于 2^32（与二进制遥测帧一致）。
+"""
+from __future__ import annotations
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+from app.services.edge.anomaly import anomaly_engine
+
+MAGIC = b"SCHA"
+VERSION = 3
+FLAG_LE = 1
+HEADER = struct.Struct("<4sHHQQdd")
+HEADER_EXT = struct.Struct("<II")  # v3：buckets | 保留
+_SEP = "\x1f"
+
+Key = Tuple[int, str, str]
+Record = Tuple[Key, Any, Any, Any, float]  # (key, n, mu, mdev, seen)；分桶时 n/mu/mdev 为长度 B 的序列
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def key_id(elderly_id: int, dev_type: str) -> int:
+    return ((int(elderly_id) & 0xFFFFFFFF) << 32) | zlib.crc32(dev_type.encode("utf-8"))
+
+
+class Snapshot:
+    """只读快照：mmap + memoryview 视图，按键二分查找。"""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mv = memoryview(self._mm)
+        if len(mv) < HEADER.size:
+            raise SnapshotError("快照文件过短")
+        magic, version, flags, count, str_bytes, created_at, alpha = HEADER.unpack_from(mv, 0)
+        if magic != MAGIC or not 1 <= version <= VERSION:
+            raise SnapshotError(f"快照格式不匹配：{magic!r} v{version}")
+        if not (flags & FLAG_LE) or sys.byteorder != "little":
+            raise SnapshotError("快照字节序与本机不一致")
+        off = HEADER.size
+        buckets = 1
+        if version >= 3:
+            buckets, _ = HEADER_EXT.unpack_from(mv, off)
+            off += HEADER_EXT.size
+        if buckets < 1:
+            raise SnapshotError(f"快照分桶数无效：{buckets}")
+        need = off + count * (8 + 20 * buckets + (4 if version >= 2 else 0)) + str_bytes
+        if len(mv) < need:
+            raise SnapshotError(f"快照文件不完整：{len(mv)} < {need}")
+
+        def view(width: int, fmt: str, per_key: int = 1) -> memoryview:
+            nonlocal off
+            size = width * count * per_key
+            v = mv[off: off + size].cast(fmt)
+            off += size
+            return v
+
+        self.keys = view(8, "Q")
+        self.mu = view(8, "d", buckets)
+        self.mdev = view(8, "d", buckets)
+        self.n = view(4, "I", buckets)
+        self.sref = view(4, "I")
+        self.seen = view(4, "I") if version >= 2 else None
+        self.buckets = buckets
+        raw = bytes(mv[off: off + str_bytes]).decode("utf-8")
+        self.strings = raw.split("\0") if raw else []
+        self.count = count
+        self.created_at = created_at
+        self.alpha = alpha
+        self.path = path
+
+    def _state(self, i: int) -> Tuple[Any, Any, Any]:
+        B = self.buckets
+        if B == 1:
+            return int(self.n[i]), self.mu[i], self.mdev[i]
+        lo, hi = i * B, (i + 1) * B
+        return self.n[lo:hi].tolist(), self.mu[lo:hi].tolist(), self.mdev[lo:hi].tolist()
+
+    def lookup(self, key: Key) -> Optional[Tuple[Any, Any, Any, float]]:
+        """(elderly_id, device_id, monitor_type) -> (n, mu, mdev, seen)；不存在返回 None。"""
+        eid, dev, mt = key
+        s = f"{dev}{_SEP}{mt}"
+        kid = key_id(eid, s)
+        keys = self.keys
+        i = bisect_left(keys, kid)
+        while i < self.count and keys[i] == kid:
+            if self.strings[self.sref[i]] == s:
+                return (*self._state(i), self._seen(i))
+            i += 1
+        return None
+
+    def _seen(self, i: int) -> float:
+        return float(self.seen[i]) if self.seen is not None else self.created_at
+
+    def records(self) -> Iterator[Record]:
+        pairs = [s.split(_SEP, 1) for s in self.strings]
+        keys, sref = self.keys, self.sref
+        seen = self.seen if self.seen is not None else [self.created_at] * self.count
+        state = self._state
+        for i in range(self.count):
+            dev, mt = pairs[sref[i]]
+            yield ((keys[i] >> 32, dev, mt), *state(i), float(seen[i]))
+
+
+def write_snapshot(path: Path, records: Iterable[Record], alpha: float, buckets: int = 1) -> int:
+    """按键排序写出快照（临时文件 + fsync + 原子替换）；返回键数。buckets > 1 时各记录的 n/mu/mdev 为长度 buckets 的序列。"""
+    strings: Dict[str, int] = {}
+    rows = []
+    for (eid, dev, mt), n, mu, mdev, seen in records:
+        s = f"{dev}{_SEP}{mt}"
+        idx = strings.setdefault(s, len(strings))
+        rows.append((key_id(eid, s), idx, n, mu, mdev, seen))
+    rows.sort(key=lambda r: (r[0], r[1]))
+    keys = array("Q", [r[0] for r in rows])
+    sref = array("I", [r[1] for r in rows])
+    if buckets == 1:
+        n = array("I", [min(r[2], 0xFFFFFFFF) for r in rows])
+        mu = array("d", [r[3] for r in rows])
+        mdev = array("d", [r[4] for r in rows])
+    else:
+        n, mu, mdev = array("I"), array("d"), array("d")
+        for r in rows:
+            if not (len(r[2]) == len(r[3]) == len(r[4]) == buckets):
+                raise SnapshotError(f"记录分桶数与快照不一致：需要 {buckets}")
+            n.extend(min(v, 0xFFFFFFFF) for v in r[2])
+            mu.extend(r[3])
+            mdev.extend(r[4])
+    seen = array("I", [min(max(int(r[5]), 0), 0xFFFFFFFF) for r in rows])
+    strtab = "\0".join(strings).encode("utf-8")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, FLAG_LE, len(rows), len(strtab), time.time(), alpha))
+        f.write(HEADER_EXT.pack(buckets, 0))
+        for arr in (keys, mu, mdev, n, sref, seen):
+            arr.tofile(f)
+        f.write(strtab)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return len(rows)
+
+
+def snapshot_path() -> Path:
+    p = Path(settings.ANOMALY_SNAPSHOT_FILE)
+    if not p.is_absolute():
+        p = Path(__file__).resolve().parents[3] / p
+    return p
+
+
+class BaselineSnapshots:
+    """快照调度：启动恢复、定期写出、关闭时刷新。"""
+
+    def __init__(self, engine: Any):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._saved_updates: Optional[int] = None
+        self.started = False
+        self.loaded = 0
+        self.load_ms = 0.0
+        self.saved = 0
+        self.save_ms = 0.0
+        self.saves = 0
+        self.errors = 0
+        self.saved_at: Optional[float] = None
+
+    def load(self, path: Optional[Path] = None) -> int:
+        path = path or snapshot_path()
+        if not path.exists():
+            return 0
+        t0 = time.perf_counter()
+        snap = Snapshot(path)
+        self.engine.attach_snapshot(snap)
+        self.load_ms = (time.perf_counter() - t0) * 1000
+        self.loaded = snap.count
+        self._saved_updates = self.engine.updates
+        return snap.count
+
+    def save(self, force: bool = False, path: Optional[Path] = None) -> int:
+        """写出快照并改为挂载新文件；基线自上次写出后无更新、无待落盘的淘汰键且非强制时跳过（返回 -1）。"""
+        path = path or snapshot_path()
+        with self._lock:
+            updates = self.engine.updates
+            evicted = self.engine.evicted_pending()
+            if not force and updates == self._saved_updates and not evicted:
+                return -1
+            t0 = time.perf_counter()
+            days = settings.ANOMALY_SNAPSHOT_RETENTION_DAYS
+            min_seen = time.time() - days * 86400 if days > 0 else 0.0
+            n = write_snapshot(path, self.engine.items(evicted, min_seen), self.engine.alpha, self.engine.buckets)
+            self.engine.attach_snapshot(Snapshot(path))
+            self.engine.release_evicted(evicted)
+            self.save_ms = (time.perf_counter() - t0) * 1000
+            self._saved_updates = updates
+            self.saved = n
+            self.saves += 1
+            self.saved_at = time.time()
+            metrics.observe("anomaly.snapshot.save.ms", self.save_ms)
+            return n
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(snapshot_path()),
+            "loaded": self.loaded,
+            "load_ms": round(self.load_ms, 3),
+            "restored_keys": self.engine.restored,
+            "saved": self.saved,
+            "save_ms": round(self.save_ms, 3),
+            "saves": self.saves,
+            "errors": self.errors,
+            "saved_at": self.saved_at,
+        }
+
+
+def _save_loop(snaps: BaselineSnapshots, interval_s: int) -> None:
+    while True:
+        time.sleep(interval_s)
+        try:
+            n = snaps.save()
+            if n >= 0:
+                logger.debug(f"基线快照已写出：{n} 个键 / {snaps.save_ms:.1f} ms")
+        except Exception as e:
+            snaps.errors += 1
+            logger.warning(f"基线快照写出失败：{e}")
+
+
+def start_baseline_snapshots() -> None:
+    """挂载已有快照（失败则从空基线开始）+ 定期写出线程；重复调用无副作用。"""
+    if not settings.ANOMALY_SNAPSHOT_ENABLED or baseline_snapshots.started:
+        return
+    baseline_snapshots.started = True
+    try:
+        n = baseline_snapshots.load()
+        if n:
+            logger.info(f"基线快照已挂载：{n} 个键 / {baseline_snapshots.load_ms:.1f} ms")
+    except Exception as e:
+        baseline_snapshots.errors += 1
+        logger.warning(f"基线快照无法加载（从空基线开始）：{e}")
+    metrics.register_collector("anomaly.snapshot", baseline_snapshots.stats)
+    if settings.ANOMALY_SNAPSHOT_INTERVAL_SECONDS > 0:
+        threading.Thread(
+            target=_save_loop,
+            args=(baseline_snapshots, settings.ANOMALY_SNAPSHOT_INTERVAL_SECONDS),
+            name="anomaly-snapshot",
+            daemon=True,
+        ).start()
+
+
+def flush_baseline_snapshots() -> None:
+    """关闭时写出最后一次快照（未启动快照时为空操作）。"""
+    if not baseline_snapshots.started:
+        return
+    try:
+        n = baseline_snapshots.save()
+        if n >= 0:
+            logger.info(f"基线快照已写出：{n} 个键")
+    except Exception as e:
+        baseline_snapshots.errors += 1
+        logger.warning(f"基线快照写出失败：{e}")
+
+
+# 全局实例（进程级）
+baseline_snapshots = BaselineSnapshots(anomaly_engine)
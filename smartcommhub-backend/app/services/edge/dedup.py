@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+重复/重投递抑制（有界、按时间窗口）
+- 背景：订阅 qos=1，断线重连后 Broker 会重投，重复读数会多写一行 health_record 并重复计入 EWMA 基线。
+- 键：(device_id, elderly_id, monitor_type, monitor_time)，只保存其 hash 值（int），节省内存。
+- 结构：两代哈希集合轮转（current / previous）：
+  - 查重时同时查两代；新键写入 current；
+  - current 存活超过半个窗口或达到容量一半时轮转：previous 丢弃，current 变为 previous；
+  - 因此任一键至少被记住 window/2 秒，至多 window 秒；总容量不超过 max_keys。
+- 入队失败（队列满且磁盘缓冲不可用）的读数由调用方 forget 撤销标记，Broker 重投时不会被误判为重复。
+- 统计：hits（判为重复）/ misses / rotations / size。
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Dict, Hashable, Iterable, Set
+
+from app.core.config import settings
+
+
+class DedupIndex:
+    def __init__(self, window_s: float, max_keys: int):
+        self.half_window = max(1.0, float(window_s)) / 2
+        self.half_cap = max(1, int(max_keys) // 2)
+        self._cur: Set[int] = set()
+        self._prev: Set[int] = set()
+        self._born = time.monotonic()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rotations = 0
+
+    def _maybe_rotate(self, now: float) -> None:
+        if len(self._cur) >= self.half_cap or now - self._born >= self.half_window:
+            self._prev = self._cur
+            self._cur = set()
+            self._born = now
+            self.rotations += 1
+
+    def seen(self, key: Hashable) -> bool:
+        """已见过返回 True（重复）；否则记录该键并返回 False。"""
+        h = hash(key)
+        with self._lock:
+            if h in self._cur or h in self._prev:
+                self.hits += 1
+                return True
+            self._maybe_rotate(time.monotonic())
+            self._cur.add(h)
+            self.misses += 1
+            return False
+
+    def forget(self, keys: Iterable[Hashable]) -> None:
+        """撤销 seen 对这些键的记录（读数最终未被保留时调用）。"""
+        hs = [hash(k) for k in keys]
+        with self._lock:
+            for h in hs:
+                self._cur.discard(h)
+                self._prev.discard(h)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cur) + len(self._prev),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "rotations": self.rotations,
+        }
+
+
+# 全局实例（进程级）
+dedup_index = DedupIndex(
+    window_s=settings.INGEST_DEDUP_WINDOW_SECONDS,
+    max_keys=settings.INGEST_DEDUP_MAX_KEYS,
+)
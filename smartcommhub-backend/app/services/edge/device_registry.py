@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+设备注册表缓存（device_id -> 老人、支持类型、校准偏移）
+- 背景：可穿戴设备只知道自己的序列号，上报中可不带 elderly_id，由订阅端按 device 表补全。
+- 结构：进程内 dict，device_id -> _Entry(__slots__)；未登记的设备也缓存（负缓存），避免反复查库。
+- 读穿透 + TTL：
+  - 启动时全量预加载，热路径（_on_message）对已登记设备零 DB 往返；
+  - 条目过期后照常返回旧值，同时交给后台线程单行刷新（stale-while-revalidate），热路径不等待；
+  - 首次出现的设备同样交给后台线程查库（订阅线程不做同步 DB 往返），查到之前按未登记处理；
+    未登记结果按 DEVICE_REGISTRY_NEGATIVE_TTL_SECONDS 负缓存。
+- 有界：负缓存单独存放（按过期顺序），超过 DEVICE_REGISTRY_NEGATIVE_MAX 淘汰最早的条目，过期条目随写入清理；
+  后台刷新队列上限 DEVICE_REGISTRY_REFRESH_QUEUE，已在队列中的设备不重复入队，队满时丢弃（计数 dropped，
+  负缓存过期后再次出现时重试）。随机 device_id 刷量不会无限占用内存，也不会无限积压查库。
+- 校准：calibrate(mt, v) 单条加偏移；calibrate_batch(types, values) 对整帧读数批量加偏移（二进制帧路径）。
+- 失效：invalidate(device_id) 丢弃条目并后台重新查库（改绑/停用设备后调用，管理端见 POST /edge/devices/{id}/invalidate，
+  独立摄取进程时经 IPC 转发）；统计见 ingest.device_registry。
+"""
+from __future__ import annotations
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence
+
+from app.core.config import settings
+from app.core.logging import logger
+
+
+class _Entry:
+    __slots__ = ("elderly_id", "types", "offsets", "expires")
+
+    def __init__(self, elderly_id: Optional[int], types: FrozenSet[str], offsets: Dict[str, float], expires: float):
+        self.elderly_id = elderly_id   # None 表示查库未找到（刷新时转入负缓存）
+        self.types = types             # 空集表示不限制监测类型
+        self.offsets = offsets
+        self.expires = expires
+
+    def supports(self, mt: str) -> bool:
+        return not self.types or mt in self.types
+
+    def calibrate(self, mt: str, v: float) -> float:
+        off = self.offsets.get(mt)
+        return v + off if off else v
+
+    def calibrate_batch(self, types: Sequence[str], values: Sequence[float]) -> List[float]:
+        offs = self.offsets
+        if not offs:
+            return list(values)
+        get = offs.get
+        return [v + get(mt, 0.0) for mt, v in zip(types, values)]
+
+
+def _parse_types(raw: Optional[str]) -> FrozenSet[str]:
+    if not raw:
+        return frozenset()
+    return frozenset(t.strip() for t in raw.split(",") if t.strip())
+
+
+def _parse_calibration(raw: Optional[str]) -> Dict[str, float]:
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+        return {str(k): float(v) for k, v in data.items() if v is not None}
+    except (ValueError, TypeError, AttributeError):
+        logger.warning(f"设备校准配置无法解析，已忽略：{raw!r}")
+        return {}
+
+
+class DeviceRegistry:
+    def __init__(self, ttl_s: float, negative_ttl_s: float, negative_max: int = 10000, queue_max: int = 1024):
+        self.ttl_s = max(1.0, float(ttl_s))
+        self.negative_ttl_s = max(1.0, float(negative_ttl_s))
+        self.negative_max = max(1, int(negative_max))
+        self._map: Dict[str, _Entry] = {}      # 已登记设备
+        self._negative: "OrderedDict[str, float]" = OrderedDict()  # 未登记设备 -> 过期时间（按过期顺序）
+        self._refresh_q: "queue.Queue[str]" = queue.Queue(maxsize=max(1, int(queue_max)))
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self.ready = False
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.lookups = 0
+        self.pending = 0
+        self.invalidations = 0
+        self.dropped = 0
+        self.errors = 0
+        self.loaded_at: Optional[float] = None
+
+    def _mark_negative(self, device_id: str, now: float) -> None:
+        """登记/续期负缓存（调用方持锁）：先清理过期条目，再按上限淘汰最早的。"""
+        neg = self._negative
+        neg.pop(device_id, None)
+        neg[device_id] = now + self.negative_ttl_s
+        while neg:
+            oldest, exp = next(iter(neg.items()))
+            if exp >= now and len(neg) <= self.negative_max:
+                break
+            del neg[oldest]
+
+    def _entry(self, row: Any, now: float) -> _Entry:
+        if row is None:
+            return _Entry(None, frozenset(), {}, now + self.negative_ttl_s)
+        return _Entry(
+            int(row.elderly_id),
+            _parse_types(row.monitor_types),
+            _parse_calibration(row.calibration),
+            now + self.ttl_s,
+        )
+
+    def _fetch(self, device_id: str) -> _Entry:
+        from app.core.database import SessionLocal
+        from app.dao.device_dao import device_dao
+
+        self.lookups += 1
+        with SessionLocal() as db:
+            row = device_dao.get_enabled(db, device_id)
+        return self._entry(row, time.monotonic())
+
+    def load_from_db(self) -> int:
+        """全量预加载（构建在锁外，最后整体替换）。"""
+        from app.core.database import SessionLocal
+        from app.dao.device_dao import device_dao
+
+        now = time.monotonic()
+        with SessionLocal() as db:
+            fresh = {str(r.device_id): self._entry(r, now) for r in device_dao.list_enabled(db)}
+        with self._lock:
+            self._map = fresh
+            for device_id in fresh.keys() & self._negative.keys():
+                del self._negative[device_id]
+        self.ready = True
+        self.loaded_at = time.time()
+        return len(fresh)
+
+    def get(self, device_id: str) -> Optional[_Entry]:
+        """返回已登记设备的条目；未登记/停用返回 None。热路径：命中即返回，过期条目后台刷新。"""
+        e = self._map.get(device_id)
+        if e is not None:
+            if e.expires < time.monotonic():
+                self.stale += 1
+                self._schedule_refresh(device_id)
+            self.hits += 1
+            return e
+        self.misses += 1
+        exp = self._negative.get(device_id)
+        now = time.monotonic()
+        if exp is not None and exp >= now:
+            return None
+        # 首次出现（或负缓存已过期）的设备：先登记负缓存占位，后台线程查库后替换；本次按未登记处理
+        with self._lock:
+            if device_id in self._map:
+                return None
+            self._mark_negative(device_id, now)
+        self.pending += 1
+        self._schedule_refresh(device_id)
+        return None
+
+    def resolve_elder(self, device_id: str) -> Optional[int]:
+        e = self.get(device_id)
+        return e.elderly_id if e is not None else None
+
+    def invalidate(self, device_id: str) -> None:
+        """丢弃条目并安排后台重新查库；刷新完成前该设备按未登记处理。"""
+        with self._lock:
+            self._map.pop(device_id, None)
+            self._negative.pop(device_id, None)
+        self.invalidations += 1
+        self._schedule_refresh(device_id)
+
+    def _schedule_refresh(self, device_id: str) -> None:
+        with self._lock:
+            if device_id in self._refreshing:
+                return
+            self._refreshing.add(device_id)
+        try:
+            self._refresh_q.put_nowait(device_id)
+        except queue.Full:
+            with self._lock:
+                self._refreshing.discard(device_id)
+            self.dropped += 1
+
+    def _refresh_loop(self) -> None:
+        while True:
+            device_id = self._refresh_q.get()
+            try:
+                e = self._fetch(device_id)
+            except Exception as ex:
+                self.errors += 1
+                logger.debug(f"设备注册表刷新失败（沿用旧条目）：{ex}")
+                e = None
+            with self._lock:
+                self._refreshing.discard(device_id)
+                now = time.monotonic()
+                if e is None:
+                    old = self._map.get(device_id)
+                    if old is not None:
+                        old.expires = now + self.negative_ttl_s  # 刷新失败：稍后再试
+                    else:
+                        self._mark_negative(device_id, now)
+                elif e.elderly_id is None:
+                    self._map.pop(device_id, None)  # 已停用/解绑
+                    self._mark_negative(device_id, now)
+                else:
+                    self._map[device_id] = e
+                    self._negative.pop(device_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "devices": len(self._map),
+            "negative": len(self._negative),
+            "queued": self._refresh_q.qsize(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "lookups": self.lookups,
+            "pending": self.pending,
+            "invalidations": self.invalidations,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "loaded_at": self.loaded_at,
+        }
+
+
+_REGISTRY_STARTED = False
+_REGISTRY_LOCK = threading.Lock()
+
+
+def start_device_registry() -> None:
+    """全量预加载 + 后台刷新线程；预加载失败时按需读穿透。重复调用无副作用。"""
+    global _REGISTRY_STARTED
+    if not settings.DEVICE_REGISTRY_ENABLED:
+        return
+    with _REGISTRY_LOCK:
+        if _REGISTRY_STARTED:
+            return
+        _REGISTRY_STARTED = True
+    try:
+        n = device_registry.load_from_db()
+        logger.info(f"设备注册表已加载：{n} 台")
+    except Exception as e:
+        logger.warning(f"设备注册表加载失败（按需查库）：{e}")
+    threading.Thread(target=device_registry._refresh_loop, name="device-registry-refresh", daemon=True).start()
+
+
+# 全局实例（进程级）
+device_registry = DeviceRegistry(
+    ttl_s=settings.DEVICE_REGISTRY_TTL_SECONDS,
+    negative_ttl_s=settings.DEVICE_REGISTRY_NEGATIVE_TTL_SECONDS,
+    negative_max=settings.DEVICE_REGISTRY_NEGATIVE_MAX,
+    queue_max=settings.DEVICE_REGISTRY_REFRESH_QUEUE,
+)
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+老人ID存在性索引（进程内位图）
+- 用途：订阅端写库前的外键预检，命中位图即认为 elderly_id 存在，无需访问数据库。
+- 结构：bytearray 位图，第 i 位表示 elderly_id=i 是否存在（10 万老人约 12KB）。
+- 维护：
+  - 订阅端启动时全量加载；
+  - elderly_service.create/delete 成功提交后增量 add/discard；
+  - 后台线程按 ELDER_INDEX_RELOAD_SECONDS 定时全量重载，兜底脚本/SQL 直接改表的情况。
+- 外键预检策略（resolve = check + 按需查库 + confirm，健康与门禁写库共用）：
+  - 索引命中即存在；索引新鲜时未命中直接判为不存在，不查库；
+  - 索引可能过期时（未就绪、独立摄取进程的 IPC 控制通道断开、或重连后的全量重载尚未完成），
+    未命中的 ID 交给调用方一次 IN 查询确认：存在的补入索引，不存在的进入有界负缓存
+    （ELDER_INDEX_NEGATIVE_TTL_SECONDS / ELDER_INDEX_NEGATIVE_MAX），期间不再重复查库。
+  - 增量通道由 set_feed 维护：内嵌摄取时增量变更在进程内直接生效，始终新鲜。
+- 统计：size（老人数）、hits/misses（存在/不存在的查询次数）、stale、negative、db_checks。
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.logging import logger
+
+
+class ElderIndex:
+    def __init__(self, negative_ttl_s: float = 60, negative_max: int = 10000):
+        self._bits = bytearray()
+        self._size = 0
+        self._lock = threading.Lock()
+        # 全量重载期间发生的增量变更，重载完成后回放，避免被旧快照覆盖
+        self._pending: Optional[List[Tuple[int, bool]]] = None
+        # 增量通道：断开期间（及重连后首次全量重载完成前）索引可能漏掉变更
+        self._feed = True
+        self._missed = False
+        self._feed_gen = 0
+        self._reload_evt = threading.Event()
+        # 负缓存：查库确认不存在的 ID -> 过期时间（按插入顺序，有界）
+        self.negative_ttl_s = max(1.0, float(negative_ttl_s))
+        self.negative_max = max(1, int(negative_max))
+        self._negative: "OrderedDict[int, float]" = OrderedDict()
+        self.ready = False
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.db_checks = 0
+        self.loaded_at: Optional[float] = None
+
+    @staticmethod
+    def _set(bits: bytearray, eid: int, on: bool) -> int:
+        """置位/清位，返回 size 变化量（+1/-1/0）。"""
+        byte, mask = eid >> 3, 1 << (eid & 7)
+        if byte >= len(bits):
+            if not on:
+                return 0
+            bits.extend(b"\x00" * (byte + 1 - len(bits) + 1024))  # 预留余量，减少扩容次数
+        was = bool(bits[byte] & mask)
+        if on and not was:
+            bits[byte] |= mask
+            return 1
+        if not on and was:
+            bits[byte] &= ~mask & 0xFF
+            return -1
+        return 0
+
+    def _apply(self, eid: int, on: bool) -> None:
+        if eid < 0:
+            return
+        with self._lock:
+            self._size += self._set(self._bits, eid, on)
+            if self._pending is not None:
+                self._pending.append((eid, on))
+            if on:
+                self._negative.pop(eid, None)
+
+    def add(self, eid: int) -> None:
+        self._apply(int(eid), True)
+
+    def discard(self, eid: int) -> None:
+        self._apply(int(eid), False)
+
+    def contains(self, eid: int) -> bool:
+        eid = int(eid)
+        bits = self._bits
+        byte = eid >> 3
+        ok = 0 <= byte < len(bits) and bool(bits[byte] & (1 << (eid & 7)))
+        if ok:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return ok
+
+    @property
+    def stale(self) -> bool:
+        """索引可能漏掉变更（未就绪 / 增量通道断开 / 重连后尚未全量重载）。"""
+        return not self.ready or not self._feed or self._missed
+
+    def set_feed(self, up: bool) -> None:
+        """
+        增量通道（独立摄取进程的 IPC 控制连接）发生变化：任一 API 进程连上/断开都可能漏掉了变更，
+        标记为可能过期；仍有连接时立即安排一次全量重载，重载完成后恢复新鲜。
+        """
+        with self._lock:
+            if not up and not self._feed:
+                return
+            self._feed = up
+            self._missed = True
+            self._feed_gen += 1
+        if up:
+            self._reload_evt.set()
+
+    def check(self, ids: Iterable[int]) -> Tuple[Set[int], Set[int]]:
+        """外键预检：返回 (确认存在的 ID, 需查库确认的 ID)；其余 ID 视为不存在。"""
+        known: Set[int] = set()
+        unsure: Set[int] = set()
+        stale = self.stale
+        now = time.monotonic()
+        for eid in set(ids):
+            if self.ready and self.contains(eid):
+                known.add(eid)
+            elif stale and not self._negative_hit(eid, now):
+                unsure.add(eid)
+        return known, unsure
+
+    def _negative_hit(self, eid: int, now: float) -> bool:
+        exp = self._negative.get(eid)
+        if exp is None:
+            return False
+        if exp > now:
+            return True
+        with self._lock:
+            self._negative.pop(eid, None)
+        return False
+
+    def confirm(self, checked: Set[int], found: Set[int]) -> None:
+        """记录一次查库结果：存在的补入索引，其余进入负缓存（超出上限时淘汰最早的条目）。"""
+        self.db_checks += 1
+        if self.ready:
+            for eid in found:
+                self.add(eid)
+        expires = time.monotonic() + self.negative_ttl_s
+        with self._lock:
+            neg = self._negative
+            for eid in checked - found:
+                neg.pop(eid, None)
+                neg[eid] = expires
+            while len(neg) > self.negative_max:
+                neg.popitem(last=False)
+
+    def resolve(self, db, ids: Iterable[int]) -> Set[int]:
+        """按上述策略返回 ids 中存在的老人ID（需要时用调用方会话做一次 IN 查询）。"""
+        known, unsure = self.check(ids)
+        if unsure:
+            from sqlalchemy import select
+            from app.models.elderly import Elderly
+
+            found = set(db.execute(select(Elderly.elderly_id).where(Elderly.elderly_id.in_(unsure))).scalars())
+            self.confirm(unsure, found)
+            known |= found
+        return known
+
+    def reload(self, ids: Iterable[int]) -> int:
+        """用全量 ID 重建位图（构建在锁外进行，最后原子替换）。"""
+        with self._lock:
+            self._pending = []
+            gen = self._feed_gen
+        bits = bytearray()
+        size = 0
+        for eid in ids:
+            if eid is not None and int(eid) >= 0:
+                size += self._set(bits, int(eid), True)
+        with self._lock:
+            for eid, on in self._pending or []:
+                size += self._set(bits, eid, on)
+            self._pending = None
+            self._bits = bits
+            self._size = size
+            self._negative.clear()
+            if gen == self._feed_gen and self._feed:
+                self._missed = False  # 重载开始时通道已连通：其后的变更都经增量通道到达
+        self.ready = True
+        self.reloads += 1
+        self.loaded_at = time.time()
+        return size
+
+    def load_from_db(self) -> int:
+        from sqlalchemy import select
+        from app.core.database import SessionLocal
+        from app.models.elderly import Elderly
+
+        with SessionLocal() as db:
+            ids = db.execute(select(Elderly.elderly_id)).scalars()
+            return self.reload(ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "size": self._size,
+            "bytes": len(self._bits),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+            "stale": self.stale,
+            "negative": len(self._negative),
+            "db_checks": self.db_checks,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _reload_loop(index: ElderIndex, interval_s: int) -> None:
+    while True:
+        # 定时重载；增量通道重连时提前唤醒（interval_s 为 0 时只按需重载）
+        index._reload_evt.wait(interval_s if interval_s > 0 else None)
+        index._reload_evt.clear()
+        try:
+            n = index.load_from_db()
+            logger.debug(f"老人ID索引已重载：{n} 条")
+        except Exception as e:
+            logger.warning(f"老人ID索引重载失败（沿用旧索引）：{e}")
+
+
+_INDEX_STARTED = False
+_INDEX_LOCK = threading.Lock()
+
+
+def start_elder_index() -> None:
+    """首次加载 + 定时重载线程；加载失败时索引保持未就绪，写库路径回退为 DB 校验。重复调用无副作用。"""
+    global _INDEX_STARTED
+    if not settings.ELDER_INDEX_ENABLED:
+        return
+    with _INDEX_LOCK:
+        if _INDEX_STARTED:
+            return
+        _INDEX_STARTED = True
+    try:
+        n = elder_index.load_from_db()
+        logger.info(f"老人ID索引已加载：{n} 条")
+    except Exception as e:
+        logger.warning(f"老人ID索引加载失败（回退为 DB 校验）：{e}")
+    threading.Thread(
+        target=_reload_loop,
+        args=(elder_index, settings.ELDER_INDEX_RELOAD_SECONDS),
+        name="elder-index-reload",
+        daemon=True,
+    ).start()
+
+
+# 全局实例（进程级）
+elder_index = ElderIndex(
+    negative_ttl_s=settings.ELDER_INDEX_NEGATIVE_TTL_SECONDS,
+    negative_max=settings.ELDER_INDEX_NEGATIVE_MAX,
+)
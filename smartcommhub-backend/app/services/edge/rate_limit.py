@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+按设备令牌桶限流（入队前）
+- 背景：单个配置错误的设备（如 50Hz 上报）会占满分片队列，挤掉其他老人的读数。
+- 每个 (device_id, elderly_id) 一个令牌桶：速率 rate（消息/秒）、容量 burst；按消息计费：
+  一条消息中属于同一 (设备, 老人) 的读数整体消耗 1 个令牌，因此批量信封、二进制帧与 HTTP 批量补发
+  （网关离线后回灌成百上千条历史读数）不会因条数多而被截断，超速的是“消息频率”而非“读数条数”。
+  网关/二进制帧常以同一 device_id 代发多位老人的读数，按 (设备, 老人) 计桶，避免整网关被误限。
+- 超限处理（mode）：
+  - drop：超限消息的读数直接丢弃；
+  - downsample：超限消息每 downsample_every 条保留 1 条（保留趋势，压低频率）。
+- 内存：桶为 __slots__ 小对象；超过 idle 秒未上报的设备定期清除，设备数超过 max_devices 时拒绝新建桶（放行并计数）。
+- 统计：超限计数与桶状态分开保存（桶被空闲清除后计数仍在），offenders(top) 按超限读数条数排序，
+  供 GET /api/edge/rate-limits（管理员）查看；计数表同样以 max_devices 为上限。
+"""
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.core.config import settings
+
+
+class _Bucket:
+    __slots__ = ("tokens", "ts", "passed")
+
+    def __init__(self, tokens: float, ts: float):
+        self.tokens = tokens
+        self.ts = ts
+        self.passed = 0        # 放行的读数条数
+
+
+class _Offender:
+    __slots__ = ("messages", "limited", "kept", "last_limited")
+
+    def __init__(self):
+        self.messages = 0      # 超限消息数
+        self.limited = 0       # 超限读数条数（含降采样保留的）
+        self.kept = 0          # 超限但按降采样保留的读数条数
+        self.last_limited = 0.0
+
+
+class DeviceRateLimiter:
+    def __init__(
+        self, rate: float, burst: float, mode: str = "drop", downsample_every: int = 10,
+        idle_s: float = 600, max_devices: int = 100000,
+    ):
+        self.rate = max(0.001, float(rate))
+        self.burst = max(1.0, float(burst))
+        self.mode = mode if mode in ("drop", "downsample") else "drop"
+        self.every = max(1, int(downsample_every))
+        self.idle_s = max(1.0, float(idle_s))
+        self.max_devices = max(1, int(max_devices))
+        self._buckets: Dict[Tuple[str, int], _Bucket] = {}
+        self._offenders: Dict[Tuple[str, int], _Offender] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + self.idle_s
+        self.evicted = 0
+        self.untracked = 0
+        self.limited = 0
+
+    def _sweep(self, now: float) -> None:
+        cutoff = now - self.idle_s
+        idle = [d for d, b in self._buckets.items() if b.ts < cutoff]
+        for d in idle:
+            del self._buckets[d]
+        self.evicted += len(idle)
+        self._next_sweep = now + self.idle_s
+
+    def allow(self, device_id: str, elderly_id: int, readings: int = 1) -> bool:
+        """一条消息中该 (设备, 老人) 的 readings 条读数是否放行（整体消耗 1 个令牌）。"""
+        key = (device_id, elderly_id)
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            b = self._buckets.get(key)
+            if b is None:
+                if len(self._buckets) >= self.max_devices:
+                    self.untracked += 1
+                    return True
+                b = _Bucket(self.burst, now)
+                self._buckets[key] = b
+            else:
+                b.tokens = min(self.burst, b.tokens + (now - b.ts) * self.rate)
+                b.ts = now
+            if b.tokens >= 1.0:
+                b.tokens -= 1.0
+                b.passed += readings
+                return True
+            self.limited += readings
+            o = self._offenders.get(key)
+            if o is None and len(self._offenders) < self.max_devices:
+                o = self._offenders[key] = _Offender()
+            if o is not None:
+                o.messages += 1
+                o.limited += readings
+                o.last_limited = time.time()
+            keep = self.mode == "downsample" and (o.messages if o is not None else self.limited) % self.every == 0
+            if keep and o is not None:
+                o.kept += readings
+            return keep
+
+    def offenders(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = sorted(self._offenders.items(), key=lambda r: r[1].limited, reverse=True)[: max(1, limit)]
+            out = []
+            for d, o in rows:
+                b = self._buckets.get(d)
+                out.append({
+                    "device_id": d[0],
+                    "elderly_id": d[1],
+                    "messages": o.messages,
+                    "limited": o.limited,
+                    "kept": o.kept,
+                    "passed": b.passed if b is not None else None,
+                    "tokens": round(b.tokens, 2) if b is not None else None,
+                    "last_limited": o.last_limited,
+                })
+            return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "devices": len(self._buckets),
+            "offenders": len(self._offenders),
+            "limited": self.limited,
+            "evicted": self.evicted,
+            "untracked": self.untracked,
+            "rate": self.rate,
+            "burst": self.burst,
+            "mode": self.mode,
+        }
+
+
+# 全局实例（进程级）
+device_rate_limiter = DeviceRateLimiter(
+    rate=settings.INGEST_DEVICE_RATE,
+    burst=settings.INGEST_DEVICE_BURST,
+    mode=settings.INGEST_DEVICE_LIMIT_MODE,
+    downsample_every=settings.INGEST_DEVICE_DOWNSAMPLE_EVERY,
+    idle_s=settings.INGEST_DEVICE_IDLE_SECONDS,
+    max_devices=settings.INGEST_DEVICE_MAX_TRACKED,
+)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+按键重排缓冲（乱序时间戳 -> 按 monitor_time 有序释放）
+- 背景：网关离线缓存后补发，读数乱序到达；anomaly_engine 的 EWMA 需按时间顺序更新。
+- 键：(elderly_id, device_id, monitor_type)，与基线键一致。
+- 规则：
+  - 某键缓冲从空变为非空时开始计时，最长持有 window 秒，到期后该键缓冲按 monitor_time 排序整体释放；
+  - 每键记录已释放的最大时间（水位）；早于水位的读数为“迟到”，立即返回并标记，照常入库但不参与个性化评分；
+    水位表按最近释放顺序保留至多 max_keys 个键（LRU），长期不上报的键随之淘汰；
+  - 全部键缓冲总条数超过 max_items 时，提前释放最早开始计时的键（内存上限）；
+  - 紧急读数（快速通道）放入后立即释放其所在键，不等窗口到期；紧急释放不抬高水位——
+    同键更早入队、被快速通道越过的普通读数随后到达时仍按正常读数缓冲并评分，而不是被判为迟到。
+- 计时队列中的条目带代号（每次键缓冲从空变为非空时分配），键被提前释放后残留的旧条目按代号识别并跳过，
+  不会让随后重新积累的缓冲提前到期。
+- 非线程安全：每个写库分片（工作线程）各持一个实例，键天然不跨分片。
+"""
+from __future__ import annotations
+import heapq
+import itertools
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+Key = Tuple[int, str, str]  # (elderly_id, device_id, monitor_type)
+
+
+def event_ts(item: Dict[str, Any]) -> float:
+    """monitor_time -> epoch 秒；无法解析时按到达时间处理。"""
+    t = item.get("monitor_time")
+    if isinstance(t, datetime):
+        return t.timestamp()
+    try:
+        return datetime.fromisoformat(str(t)).timestamp()
+    except Exception:
+        return time.time()
+
+
+class ReorderBuffer:
+    def __init__(self, window_s: float, max_items: int, max_keys: int = 100000):
+        self.window = max(0.0, float(window_s))
+        self.max_items = max(1, int(max_items))
+        self.max_keys = max(1, int(max_keys))
+        self._heaps: Dict[Key, List[Tuple[float, int, Dict[str, Any]]]] = {}
+        self._since: Deque[Tuple[float, int, Key]] = deque()  # (开始计时, 代号, 键)，按时间递增
+        self._gen: Dict[Key, int] = {}  # 键 -> 当前缓冲的代号
+        self._watermark: "OrderedDict[Key, float]" = OrderedDict()
+        self._seq = itertools.count()
+        self.held = 0
+        self.late = 0
+        self.forced = 0
+        self.urgent = 0
+        self.wm_evicted = 0
+
+    def _release(self, key: Key, out: List[Dict[str, Any]], advance: bool = True) -> None:
+        heap = self._heaps.pop(key, None)
+        self._gen.pop(key, None)
+        if not heap:
+            return
+        heap.sort()
+        for ts, _, item in heap:
+            out.append(item)
+        self.held -= len(heap)
+        if not advance:
+            return
+        wm = self._watermark.pop(key, heap[-1][0])
+        self._watermark[key] = max(wm, heap[-1][0])
+        if len(self._watermark) > self.max_keys:
+            self._watermark.popitem(last=False)
+            self.wm_evicted += 1
+
+    def _pop_since(self) -> Optional[Key]:
+        """弹出计时队列队首；残留的旧代号条目返回 None。"""
+        _, gen, key = self._since.popleft()
+        return key if self._gen.get(key) == gen else None
+
+    def push(
+        self, key: Key, item: Dict[str, Any], now: Optional[float] = None, out: Optional[List] = None,
+        urgent: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        放入一条读数；迟到读数（早于该键水位）直接追加到 out 并标记 item["late"]=True。
+        超出内存上限时提前释放最早的键；urgent=True 时立即释放该键；释放结果同样追加到 out。
+        """
+        out = [] if out is None else out
+        now = time.monotonic() if now is None else now
+        ts = event_ts(item)
+        wm = self._watermark.get(key)
+        if wm is not None and ts < wm:
+            item["late"] = True
+            self.late += 1
+            out.append(item)
+            return out
+        heap = self._heaps.get(key)
+        seq = next(self._seq)
+        if heap is None:
+            heap = []
+            self._heaps[key] = heap
+            self._gen[key] = seq
+            self._since.append((now, seq, key))
+        heapq.heappush(heap, (ts, seq, item))
+        self.held += 1
+        if urgent:
+            # _since 中该键的条目随代号失效；不抬高水位（见模块说明）
+            self.urgent += 1
+            self._release(key, out, advance=False)
+        while self.held > self.max_items and self._since:
+            k = self._pop_since()
+            if k is not None:
+                self.forced += 1
+                self._release(k, out)
+        return out
+
+    def pop_ready(self, now: Optional[float] = None, out: Optional[List] = None) -> List[Dict[str, Any]]:
+        """释放所有持有时间已满 window 的键（各键内按 monitor_time 有序）。"""
+        out = [] if out is None else out
+        now = time.monotonic() if now is None else now
+        while self._since and now - self._since[0][0] >= self.window:
+            key = self._pop_since()
+            if key is not None:
+                self._release(key, out)
+        return out
+
+    def next_due(self, now: Optional[float] = None) -> Optional[float]:
+        """距下一次到期还有多少秒（无缓冲时返回 None）。"""
+        while self._since and self._gen.get(self._since[0][2]) != self._since[0][1]:
+            self._since.popleft()  # 丢弃残留的旧代号条目，避免空转唤醒
+        if not self._since:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.window - (now - self._since[0][0]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "held": self.held,
+            "keys": len(self._heaps),
+            "watermarks": len(self._watermark),
+            "late": self.late,
+            "forced": self.forced,
+            "urgent": self.urgent,
+            "wm_evicted": self.wm_evicted,
+        }
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+"""
+生命体征规则表（表驱动、可热加载）
+- 取代订阅端硬编码的 if/else 阈值：按 monitor_type 定义有效范围与异常上下限，
+  可按 health_level（护理等级）或单个老人覆盖；新增血氧/体温/血糖等类型只需改规则，不改代码。
+- 规则来源（VITAL_RULES_SOURCE）：
+  - file：JSON 文件（VITAL_RULES_FILE），格式见同目录 vital_rules.json：
+      {"types":  {"heart_rate": {"valid": [0, 220], "abnormal_low": null, "abnormal_high": 100}, ...},
+       "levels": {"C": {"heart_rate": {"abnormal_high": 95}}},
+       "elders": {"123": {"blood_pressure": {"abnormal_high": 150}}}}
+  - db：vital_rule 表（scripts/sql/06_vital_rules.sql），scope = default | level | elder。
+- 编译：规则展开为行（0 = 默认，随后各 health_level，再各老人），每行按类型下标存 4 个阈值，
+  平铺为 array('d')：下标 = 行号 × 类型数 + 类型号；老人 -> 行号预先算好（老人覆盖 > 等级覆盖 > 默认）。
+  单条评估 = 2 次 dict 查找 + 4 次数组读取，O(1)；批量接口复用同一份编译结果。
+- 判定：有效 ⇔ valid_min <= v <= valid_max；异常 ⇔ v > abnormal_high 或 v < abnormal_low（缺省为不设限）。
+- 热加载：后台线程按 VITAL_RULES_RELOAD_SECONDS 检查（文件看 mtime，DB 直接重读），
+  也可调用 POST /api/edge/rules/reload；新表编译完成后整体替换引用，读取侧无锁。
+- 护理等级变更（set_elder_level）：同样以“新表替换”生效——用旧表保存的规则输入加上新的老人等级重新编译，
+  老人级覆盖随之叠加在新等级之上；已发布的表从不原地修改。
+"""
+from __future__ import annotations
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.logging import logger
+
+_FIELDS = ("valid_min", "valid_max", "abnormal_low", "abnormal_high")
+_INF = math.inf
+
+# 内置默认规则（规则文件/表缺失时使用，与历史硬编码阈值一致）
+BUILTIN_TYPES: Dict[str, Dict[str, Any]] = {
+    "heart_rate": {"valid": [0, 220], "abnormal_high": 100},
+    "blood_pressure": {"valid": [50, 260], "abnormal_high": 140},
+}
+
+Spec = Dict[str, Optional[float]]  # 字段 -> 值（None 表示沿用上级/不设限）
+
+
+def _spec(raw: Dict[str, Any]) -> Spec:
+    """JSON 规则项 -> 标准字段（valid: [lo, hi] 展开为 valid_min / valid_max）。"""
+    out: Spec = {}
+    valid = raw.get("valid")
+    if isinstance(valid, (list, tuple)) and len(valid) == 2:
+        out["valid_min"], out["valid_max"] = valid
+    for f in _FIELDS:
+        if f in raw:
+            out[f] = raw[f]
+    return {k: (None if v is None else float(v)) for k, v in out.items()}
+
+
+class RuleTable:
+    """编译后的只读规则表（重载时整体替换，不原地修改阈值）。"""
+
+    def __init__(
+        self,
+        types: Dict[str, Spec],
+        levels: Dict[str, Dict[str, Spec]],
+        elders: Dict[int, Dict[str, Spec]],
+        elder_levels: Dict[int, str],
+        source: str,
+    ):
+        # 编译输入（set_elder_level 据此重新编译出新表）
+        self._inputs = (types, levels, elders, elder_levels)
+        self.type_index: Dict[str, int] = {t: i for i, t in enumerate(types)}
+        self.types: Tuple[str, ...] = tuple(types)
+        nt = max(1, len(self.types))
+        rows: List[Dict[str, Spec]] = [types]
+        level_row: Dict[str, int] = {}
+        for lv, over in levels.items():
+            level_row[lv] = len(rows)
+            rows.append(self._merge(types, over))
+        self.elder_row: Dict[int, int] = {}
+        for eid, lv in elder_levels.items():
+            if lv in level_row:
+                self.elder_row[eid] = level_row[lv]
+        for eid, over in elders.items():
+            base = rows[self.elder_row.get(eid, 0)]
+            self.elder_row[eid] = len(rows)
+            rows.append(self._merge(base, over))
+        self.level_row = level_row
+        self.n_types = nt
+        self.n_rows = len(rows)
+        # 平铺阈值数组：缺省 valid 为 (-inf, inf)，异常上下限缺省为不设限
+        self.vmin = array("d", [-_INF]) * (nt * len(rows))
+        self.vmax = array("d", [_INF]) * (nt * len(rows))
+        self.alo = array("d", [-_INF]) * (nt * len(rows))
+        self.ahi = array("d", [_INF]) * (nt * len(rows))
+        for r, row in enumerate(rows):
+            for t, name in enumerate(self.types):
+                s = row.get(name) or {}
+                i = r * nt + t
+                if s.get("valid_min") is not None:
+                    self.vmin[i] = s["valid_min"]
+                if s.get("valid_max") is not None:
+                    self.vmax[i] = s["valid_max"]
+                if s.get("abnormal_low") is not None:
+                    self.alo[i] = s["abnormal_low"]
+                if s.get("abnormal_high") is not None:
+                    self.ahi[i] = s["abnormal_high"]
+        self.source = source
+        self.loaded_at = time.time()
+
+    def with_elder_level(self, elderly_id: int, level: Optional[str]) -> "RuleTable":
+        """返回调整某位老人护理等级后的新表（本表不变）。"""
+        types, levels, elders, elder_levels = self._inputs
+        elder_levels = dict(elder_levels)
+        if level is None:
+            elder_levels.pop(elderly_id, None)
+        else:
+            elder_levels[elderly_id] = str(level)
+        table = RuleTable(types, levels, elders, elder_levels, self.source)
+        table.loaded_at = self.loaded_at
+        return table
+
+    @staticmethod
+    def _merge(base: Dict[str, Spec], over: Dict[str, Spec]) -> Dict[str, Spec]:
+        merged = {t: dict(s) for t, s in base.items()}
+        for t, s in over.items():
+            if t in merged:
+                merged[t].update({k: v for k, v in s.items() if v is not None})
+        return merged
+
+    def classify(self, mt: str, v: float, elderly_id: Optional[int] = None) -> Optional[int]:
+        """返回 None（未知类型或超出有效范围）/ 0（正常）/ 1（异常）。"""
+        t = self.type_index.get(mt)
+        if t is None:
+            return None
+        i = (self.elder_row.get(elderly_id, 0) if elderly_id is not None else 0) * self.n_types + t
+        if not (self.vmin[i] <= v <= self.vmax[i]):
+            return None
+        return 1 if (v > self.ahi[i] or v < self.alo[i]) else 0
+
+    def classify_batch(
+        self, types: Sequence[str], values: Sequence[float], elderly_ids: Optional[Sequence[int]] = None
+    ) -> List[Optional[int]]:
+        """批量评估（局部变量提升，避免逐条属性查找）。"""
+        ti, er, nt = self.type_index, self.elder_row, self.n_types
+        vmin, vmax, alo, ahi = self.vmin, self.vmax, self.alo, self.ahi
+        eids = elderly_ids if elderly_ids is not None else [None] * len(types)
+        out: List[Optional[int]] = []
+        for mt, v, eid in zip(types, values, eids):
+            t = ti.get(mt)
+            if t is None:
+                out.append(None)
+                continue
+            i = er.get(eid, 0) * nt + t
+            if not (vmin[i] <= v <= vmax[i]):
+                out.append(None)
+            else:
+                out.append(1 if (v > ahi[i] or v < alo[i]) else 0)
+        return out
+
+    def describe(self) -> Dict[str, Any]:
+        def row(r: int) -> Dict[str, Dict[str, Optional[float]]]:
+            out = {}
+            for t, name in enumerate(self.types):
+                i = r * self.n_types + t
+                out[name] = {
+                    f: (None if math.isinf(a[i]) else a[i])
+                    for f, a in zip(_FIELDS, (self.vmin, self.vmax, self.alo, self.ahi))
+                }
+            return out
+
+        return {
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "types": row(0),
+            "levels": {lv: row(r) for lv, r in self.level_row.items()},
+            "elder_overrides": self.n_rows - 1 - len(self.level_row),
+            "elders_mapped": len(self.elder_row),
+        }
+
+
+def _rules_path() -> Path:
+    p = Path(settings.VITAL_RULES_FILE)
+    if not p.is_absolute():
+        p = Path(__file__).resolve().parents[3] / p
+    return p
+
+
+def _load_file(path: Path) -> Tuple[Dict[str, Spec], Dict[str, Dict[str, Spec]], Dict[int, Dict[str, Spec]]]:
+    data = json.loads(path.read_text(encoding="utf-8"))
+    types = {str(t): _spec(s) for t, s in (data.get("types") or {}).items()}
+    levels = {
+        str(lv): {str(t): _spec(s) for t, s in over.items()}
+        for lv, over in (data.get("levels") or {}).items()
+    }
+    elders = {
+        int(eid): {str(t): _spec(s) for t, s in over.items()}
+        for eid, over in (data.get("elders") or {}).items()
+    }
+    return types, levels, elders
+
+
+def _load_db() -> Tuple[Dict[str, Spec], Dict[str, Dict[str, Spec]], Dict[int, Dict[str, Spec]]]:
+    from sqlalchemy import select
+    from app.core.database import SessionLocal
+    from app.models.vital_rule import VitalRule
+
+    types: Dict[str, Spec] = {}
+    levels: Dict[str, Dict[str, Spec]] = {}
+    elders: Dict[int, Dict[str, Spec]] = {}
+    with SessionLocal() as db:
+        rows = db.execute(select(VitalRule).where(VitalRule.enabled == 1)).scalars().all()
+    for r in rows:
+        spec = {f: (None if getattr(r, f) is None else float(getattr(r, f))) for f in _FIELDS}
+        if r.scope == "level" and r.scope_key:
+            levels.setdefault(str(r.scope_key), {})[r.monitor_type] = spec
+        elif r.scope == "elder" and r.scope_key:
+            elders.setdefault(int(r.scope_key), {})[r.monitor_type] = spec
+        else:
+            types[r.monitor_type] = spec
+    return types, levels, elders
+
+
+def _load_elder_levels() -> Dict[int, str]:
+    from sqlalchemy import select
+    from app.core.database import SessionLocal
+    from app.models.elderly import Elderly
+
+    with SessionLocal() as db:
+        return {int(e): str(lv) for e, lv in db.execute(select(Elderly.elderly_id, Elderly.health_level))}
+
+
+class VitalRules:
+    """规则表持有者：读取侧直接使用 self.table（整体替换，无锁）。"""
+
+    def __init__(self):
+        builtin = {t: _spec(s) for t, s in BUILTIN_TYPES.items()}
+        self.table = RuleTable(builtin, {}, {}, {}, "builtin")
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self.reloads = 0
+        self.errors = 0
+
+    def classify(self, mt: str, v: float, elderly_id: Optional[int] = None) -> Optional[int]:
+        return self.table.classify(mt, v, elderly_id)
+
+    def set_elder_level(self, elderly_id: int, level: Optional[str]) -> None:
+        """老人新增/修改护理等级后即时生效（不必等待重载；重新编译后整体替换，老人级覆盖保留）。"""
+        with self._lock:
+            self.table = self.table.with_elder_level(int(elderly_id), level)
+
+    def reload(self, force: bool = False) -> bool:
+        """按配置来源重新编译；文件未变化且非强制时跳过。返回是否已替换。"""
+        with self._lock:
+            src = settings.VITAL_RULES_SOURCE
+            if src == "db":
+                types, levels, elders = _load_db()
+                source = "db"
+            else:
+                path = _rules_path()
+                if not path.exists():
+                    return False
+                mtime = os.path.getmtime(path)
+                if not force and mtime == self._mtime:
+                    return False
+                types, levels, elders = _load_file(path)
+                self._mtime = mtime
+                source = str(path)
+            if not types:
+                raise ValueError("规则为空：至少需要一个 monitor_type")
+            elder_levels = _load_elder_levels() if levels else {}
+            self.table = RuleTable(types, levels, elders, elder_levels, source)
+            self.reloads += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        tb = self.table
+        return {
+            "source": tb.source,
+            "types": list(tb.types),
+            "levels": len(tb.level_row),
+            "rows": tb.n_rows,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "loaded_at": tb.loaded_at,
+        }
+
+
+def _reload_loop(rules: VitalRules, interval_s: int) -> None:
+    while True:
+        time.sleep(interval_s)
+        try:
+            if rules.reload():
+                logger.info(f"生命体征规则已重载：{rules.table.types}")
+        except Exception as e:
+            rules.errors += 1
+            logger.warning(f"生命体征规则重载失败（沿用旧规则）：{e}")
+
+
+_RULES_STARTED = False
+_RULES_LOCK = threading.Lock()
+
+
+def start_vital_rules() -> None:
+    """首次加载 + 定时检查重载线程；加载失败时沿用内置默认规则。重复调用无副作用。"""
+    global _RULES_STARTED
+    with _RULES_LOCK:
+        if _RULES_STARTED:
+            return
+        _RULES_STARTED = True
+    try:
+        vital_rules.reload(force=True)
+        logger.info(f"生命体征规则已加载：{vital_rules.stats()}")
+    except Exception as e:
+        vital_rules.errors += 1
+        logger.warning(f"生命体征规则加载失败（使用内置默认规则）：{e}")
+    if settings.VITAL_RULES_RELOAD_SECONDS > 0:
+        threading.Thread(
+            target=_reload_loop,
+            args=(vital_rules, settings.VITAL_RULES_RELOAD_SECONDS),
+            name="vital-rules-reload",
+            daemon=True,
+        ).start()
+
+
+# 全局实例（进程级）
+vital_rules = VitalRules()
@@ -3,6 +3,9 @@ from sqlalchemy.orm import Session
 from app.dao.elderly_dao import elderly_dao
 from app.models.elderly import Elderly
 from app.utils.audit import audit_log
+from app.services.edge.elder_index import elder_index
+from app.services.edge.vital_rules import vital_rules
+from app.events.alert_ipc import send_control
 
 
 class ElderlyService:
@@ -10,6 +13,10 @@ class ElderlyService:
         obj = Elderly(**data)
         obj = elderly_dao.create(db, obj)
         db.commit()
+        elder_index.add(obj.elderly_id)
+        vital_rules.set_elder_level(obj.elderly_id, obj.health_level)
+        # 独立摄取进程（INGEST_EMBEDDED=false）同步更新；内嵌模式下为空操作
+        send_control({"op": "elder", "elderly_id": obj.elderly_id, "level": obj.health_level})
         audit_log(db, current_user_id, "create", "elderly", getattr(obj, "elderly_id", None), {"name": obj.name})
         return obj
 
@@ -17,6 +24,9 @@ class ElderlyService:
         rows = elderly_dao.update_fields(db, elderly_id, data)
         if rows:
             db.commit()
+            if "health_level" in data:
+                vital_rules.set_elder_level(elderly_id, data["health_level"])
+                send_control({"op": "elder", "elderly_id": elderly_id, "level": data["health_level"]})
             audit_log(db, current_user_id, "update", "elderly", elderly_id, data)
             return elderly_dao.get(db, elderly_id)
         return None
@@ -25,6 +35,8 @@ class ElderlyService:
         rows = elderly_dao.delete(db, elderly_id)
         if rows:
             db.commit()
+            elder_index.discard(elderly_id)
+            send_control({"op": "elder", "elderly_id": elderly_id, "deleted": True})
             audit_log(db, current_user_id, "delete", "elderly", elderly_id, None)
             return True
         return False
@@ -63,6 +63,15 @@ psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$SQL_DIR/04_family_groups.sql"
 echo "[1c/5] 告警结构: 05_alerts.sql"
 psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$SQL_DIR/05_alerts.sql"
 
+echo "[1d/5] 生命体征规则: 06_vital_rules.sql"
+psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$SQL_DIR/06_vital_rules.sql"
+
+echo "[1e/5] 设备注册表: 07_devices.sql"
+psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$SQL_DIR/07_devices.sql"
+
+echo "[1f/5] 健康记录自然键: 08_health_record_natural_key.sql"
+psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$SQL_DIR/08_health_record_natural_key.sql"
+
 echo "[2/5] 字典数据: 03_seed_dict.sql"
 psql "$PSQL_URL" -v ON_ERROR_STOP=1 -f "$SQL_DIR/03_seed_dict.sql"
 
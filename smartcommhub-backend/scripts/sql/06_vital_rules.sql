@@ -0,0 +1,32 @@
+-- 生命体征规则表：按 monitor_type 的有效范围与异常阈值，可按护理等级/老人覆盖（VITAL_RULES_SOURCE=db 时使用）
+SET search_path TO public;
+
+CREATE TABLE IF NOT EXISTS vital_rule (
+  rule_id BIGSERIAL PRIMARY KEY,
+  monitor_type VARCHAR(32) NOT NULL,
+  scope VARCHAR(10) NOT NULL DEFAULT 'default' CHECK (scope IN ('default','level','elder')),
+  scope_key VARCHAR(20) NULL,
+  valid_min NUMERIC(8,2) NULL,
+  valid_max NUMERIC(8,2) NULL,
+  abnormal_low NUMERIC(8,2) NULL,
+  abnormal_high NUMERIC(8,2) NULL,
+  enabled INTEGER NOT NULL DEFAULT 1 CHECK (enabled IN (0,1)),
+  updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_vital_rule_scope ON vital_rule (monitor_type, scope, COALESCE(scope_key, ''));
+
+-- 新增监测类型由规则表校验，放开 health_record / alerts 的 monitor_type 枚举约束
+ALTER TABLE health_record DROP CONSTRAINT IF EXISTS health_record_monitor_type_check;
+ALTER TABLE alerts DROP CONSTRAINT IF EXISTS alerts_monitor_type_check;
+
+-- 默认规则（与 app/services/edge/vital_rules.json 一致）
+INSERT INTO vital_rule (monitor_type, scope, valid_min, valid_max, abnormal_low, abnormal_high)
+SELECT v.monitor_type, 'default', v.valid_min, v.valid_max, v.abnormal_low, v.abnormal_high
+FROM (
+  SELECT 'heart_rate' AS monitor_type, 0 AS valid_min, 220 AS valid_max, NULL::NUMERIC AS abnormal_low, 100 AS abnormal_high
+  UNION ALL SELECT 'blood_pressure', 50, 260, NULL, 140
+  UNION ALL SELECT 'spo2', 50, 100, 94, NULL
+  UNION ALL SELECT 'temperature', 30, 45, 35.0, 37.3
+  UNION ALL SELECT 'glucose', 1, 35, 3.9, 11.1
+) v
+WHERE NOT EXISTS (SELECT 1 FROM vital_rule r WHERE r.monitor_type = v.monitor_type AND r.scope = 'default');
@@ -0,0 +1,14 @@
+-- 设备注册表：设备序列号 -> 绑定老人、支持的监测类型、校准偏移（订阅端进程内缓存，见 edge/device_registry.py）
+SET search_path TO public;
+
+CREATE TABLE IF NOT EXISTS device (
+  device_id VARCHAR(50) PRIMARY KEY,
+  elderly_id BIGINT NOT NULL REFERENCES elderly(elderly_id) ON DELETE CASCADE,
+  monitor_types VARCHAR(200) NULL,
+  calibration TEXT NULL,
+  enabled INTEGER NOT NULL DEFAULT 1 CHECK (enabled IN (0,1)),
+  created_at TIMESTAMP NOT NULL DEFAULT now(),
+  updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_device_elderly ON device (elderly_id);
@@ -0,0 +1,15 @@
+-- 健康记录自然键唯一约束：(elderly_id, device_id, monitor_type, monitor_time)
+-- 网关重发与磁盘缓冲回放由订阅端 insert ... on conflict do nothing 幂等写入（执行本脚本后设置 INGEST_IDEMPOTENT_INSERT=true）
+SET search_path TO public;
+
+-- 清理历史重复（保留每组最早的一条）
+DELETE FROM health_record h
+USING health_record d
+WHERE h.elderly_id = d.elderly_id
+  AND h.device_id = d.device_id
+  AND h.monitor_type = d.monitor_type
+  AND h.monitor_time = d.monitor_time
+  AND h.record_id > d.record_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_health_record_natural
+  ON health_record (elderly_id, device_id, monitor_type, monitor_time);
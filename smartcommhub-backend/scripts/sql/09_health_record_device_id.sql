@@ -0,0 +1,5 @@
+-- 健康记录 device_id 放宽到 VARCHAR(50)，与 device.device_id / alerts.device_id 等长
+-- 此前注册表可登记的长设备号写入 health_record 时会被截断或插入失败（自然键唯一索引随列类型一并重建）
+SET search_path TO public;
+
+ALTER TABLE health_record ALTER COLUMN device_id TYPE VARCHAR(50);
@@ -0,0 +1,32 @@
+"""
+测试模块的脚本入口（python -m tests.<模块>）
+
+- 按定义顺序执行模块内的 test_* 函数，逐个输出 [OK]/[FAIL]（名称取函数文档首行），首个失败即返回 1；
+- 同一组 test_* 函数亦由 pytest 收集（python -m pytest tests/）；
+- 形参为 tmp_path 的用例传入新建的临时目录（与 pytest 的 tmp_path 夹具一致）。
+"""
+import inspect
+import sys
+import tempfile
+from pathlib import Path
+
+
+def run(module_name: str) -> int:
+    mod = sys.modules[module_name]
+    cases = sorted(
+        (f for n, f in vars(mod).items() if n.startswith("test_") and inspect.isfunction(f) and f.__module__ == mod.__name__),
+        key=lambda f: f.__code__.co_firstlineno,
+    )
+    for case in cases:
+        name = (case.__doc__ or case.__name__).strip().splitlines()[0]
+        try:
+            if "tmp_path" in inspect.signature(case).parameters:
+                with tempfile.TemporaryDirectory() as d:
+                    case(tmp_path=Path(d))
+            else:
+                case()
+        except AssertionError as e:
+            print(f"[FAIL] {name}：{e}")
+            return 1
+        print(f"[OK] {name}")
+    return 0
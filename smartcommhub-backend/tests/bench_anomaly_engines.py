@@ -0,0 +1,57 @@
+"""
+个性化异常引擎压测：标量（逐条 dict + State）vs 向量化（NumPy 结构数组 + 批量评分）
+
+用法：python -m tests.bench_anomaly_engines
+环境变量：
+- SCH_BENCH_N：读数总数（默认 200000）
+- SCH_BENCH_KEYS：键数（默认 20000）
+- SCH_BENCH_BATCH：每批条数（默认 200，对应 INGEST_BATCH_MAX_SIZE）
+输出：两种引擎的吞吐（条/秒），以及向量化引擎只算数组（不构造逐条结果字典）时的吞吐。
+"""
+import os
+import random
+import sys
+import time
+
+from app.services.edge.anomaly import AnomalyEngine
+from app.services.edge.anomaly_vector import VectorAnomalyEngine
+
+N = int(os.getenv("SCH_BENCH_N", "200000"))
+KEYS = int(os.getenv("SCH_BENCH_KEYS", "20000"))
+BATCH = int(os.getenv("SCH_BENCH_BATCH", "200"))
+
+
+def _batches():
+    rnd = random.Random(7)
+    keys = [(1 + i // 2, "bench_dev", ("heart_rate", "blood_pressure")[i % 2]) for i in range(KEYS)]
+    out = []
+    for _ in range(0, N, BATCH):
+        ks = [rnd.choice(keys) for _ in range(BATCH)]
+        vs = [rnd.gauss(80, 8) for _ in range(BATCH)]
+        out.append((ks, vs))
+    return out
+
+
+def _timed(name, fn, batches):
+    t0 = time.perf_counter()
+    for ks, vs in batches:
+        fn(ks, vs)
+    cost = time.perf_counter() - t0
+    n = sum(len(ks) for ks, _ in batches)
+    print(f"{name:<28} {n / cost:>12,.0f} 条/秒  ({cost * 1000:.1f} ms)")
+
+
+def run() -> int:
+    batches = _batches()
+    print(f"读数 {N}，键 {KEYS}，批大小 {BATCH}")
+    scalar = AnomalyEngine(0.1, 3.0, 50)
+    _timed("scalar.score_batch", scalar.score_batch, batches)
+    vector = VectorAnomalyEngine(0.1, 3.0, 50)
+    _timed("vector.score_batch", vector.score_batch, batches)
+    arrays = VectorAnomalyEngine(0.1, 3.0, 50)
+    _timed("vector.update_and_score_batch", lambda ks, vs: arrays.update_and_score_batch(arrays.slots(ks), vs), batches)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,109 @@
+"""
+摄取模式对比压测：线程模式 vs asyncio 模式（吞吐 + MQTT->WS 端到端延迟）
+
+做法：向健康数据主题发布 N 条异常心率（每条都会触发 WS 预警），device_id 编码序号 "b<seq>"，
+同一进程内监听 /ws/warning，按序号匹配发送时刻，统计：
+- 发布速率、端到端送达速率（条/秒）
+- MQTT->WS 延迟 p50 / p95 / p99 / max（毫秒）、丢失条数
+
+用法（后端分别以两种模式启动，各跑一次后对比输出）：
+  INGEST_MODE=thread  INGEST_REORDER_WINDOW_SECONDS=0 uvicorn app.main:app
+  SCH_WS_TOKEN=<管理员token> SCH_BENCH_LABEL=thread  python -m tests.bench_ingest_modes
+  INGEST_MODE=asyncio INGEST_REORDER_WINDOW_SECONDS=0 uvicorn app.main:app
+  SCH_WS_TOKEN=<管理员token> SCH_BENCH_LABEL=asyncio python -m tests.bench_ingest_modes
+（重排窗口置 0，避免按键持有时间掩盖管线本身的延迟；SCH_BENCH_RATE 限速发布，0 表示不限速）
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+import websockets
+
+WS_URI = os.getenv("SCH_WS_URI", "ws://127.0.0.1:8000/ws/warning")
+WS_TOKEN = os.getenv("SCH_WS_TOKEN", "")
+TOPIC = os.getenv("SCH_MQTT_TOPIC", "smartcommhub/health")
+BROKER_HOST = os.getenv("SCH_MQTT_HOST", "127.0.0.1")
+BROKER_PORT = int(os.getenv("SCH_MQTT_PORT", "1883"))
+N = int(os.getenv("SCH_BENCH_N", "5000"))
+RATE = float(os.getenv("SCH_BENCH_RATE", "0"))  # 条/秒
+ELDER = int(os.getenv("SCH_BENCH_ELDER", "1"))
+LABEL = os.getenv("SCH_BENCH_LABEL", "")
+IDLE_TIMEOUT = float(os.getenv("SCH_BENCH_IDLE_TIMEOUT", "10"))
+
+
+def _pct(xs, p):
+    if not xs:
+        return 0.0
+    return xs[min(len(xs) - 1, int(p / 100.0 * len(xs)))]
+
+
+def _publish(sent, done):
+    c = mqtt.Client()
+    c.connect(BROKER_HOST, BROKER_PORT, 60)
+    c.loop_start()
+    base = time.time()
+    interval = 1.0 / RATE if RATE > 0 else 0.0
+    t0 = time.perf_counter()
+    for i in range(N):
+        if interval:
+            delay = t0 + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        payload = json.dumps({
+            "elderly_id": ELDER,
+            "monitor_type": "heart_rate",
+            "monitor_value": 130,
+            "monitor_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(base + i)),
+            "device_id": f"b{i}",
+        })
+        sent[i] = time.perf_counter()
+        c.publish(TOPIC, payload, qos=1)
+    done.append(time.perf_counter() - t0)
+    c.loop_stop()
+    c.disconnect()
+
+
+async def main() -> int:
+    sent = {}
+    pub_done = []
+    lat = []
+    first_send = last_recv = None
+    async with websockets.connect(f"{WS_URI}?token={WS_TOKEN}") as ws:
+        th = threading.Thread(target=_publish, args=(sent, pub_done), daemon=True)
+        th.start()
+        while len(lat) < N:
+            try:
+                raw = await asyncio.wait_for(ws.recv(), timeout=IDLE_TIMEOUT)
+            except asyncio.TimeoutError:
+                break
+            now = time.perf_counter()
+            msg = json.loads(raw)
+            dev = str(msg.get("device_id", ""))
+            if not dev.startswith("b") or not dev[1:].isdigit():
+                continue
+            t = sent.get(int(dev[1:]))
+            if t is None:
+                continue
+            lat.append((now - t) * 1000)
+            last_recv = now
+        th.join()
+    if sent:
+        first_send = min(sent.values())
+    lat.sort()
+    pub_s = pub_done[0] if pub_done else 0.0
+    e2e_s = (last_recv - first_send) if (lat and first_send is not None) else 0.0
+    tag = f"[{LABEL}] " if LABEL else ""
+    print(f"{tag}发布 {len(sent)} 条 {pub_s:.3f}s  {len(sent) / pub_s if pub_s else 0:,.0f} 条/s")
+    print(f"{tag}送达 {len(lat)} 条 {e2e_s:.3f}s  {len(lat) / e2e_s if e2e_s else 0:,.0f} 条/s  丢失 {N - len(lat)}")
+    print(
+        f"{tag}MQTT->WS 延迟(ms) p50={_pct(lat, 50):.1f} p95={_pct(lat, 95):.1f} "
+        f"p99={_pct(lat, 99):.1f} max={(lat[-1] if lat else 0):.1f}"
+    )
+    return 0 if lat else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
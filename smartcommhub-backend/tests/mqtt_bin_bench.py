@@ -0,0 +1,111 @@
+"""
+二进制遥测帧：编码器演示 + JSON 对比压测（本地对比走订阅端的 _decode_json / _decode_binary）
+
+用法：
+- 本地解码对比（无需 Broker）：python -m tests.mqtt_bin_bench local
+- 向 Broker 发布（需后端订阅端运行）：python -m tests.mqtt_bin_bench publish
+"""
+import json
+import os
+import sys
+import time
+import random
+
+from app.events.telemetry_codec import TYPE_CODES, encode_frame
+
+TOPIC = os.getenv("SCH_MQTT_TOPIC", "smartcommhub/health")
+BIN_TOPIC = os.getenv("SCH_MQTT_BIN_TOPIC", "smartcommhub/health/bin")
+BROKER_HOST = os.getenv("SCH_MQTT_HOST", "127.0.0.1")
+BROKER_PORT = int(os.getenv("SCH_MQTT_PORT", "1883"))
+N = int(os.getenv("SCH_BENCH_N", "100000"))
+FRAME = int(os.getenv("SCH_BENCH_FRAME", "200"))  # 每帧记录数
+
+
+def _readings(n):
+    now_ms = int(time.time() * 1000)
+    for i in range(n):
+        mt = "heart_rate" if i % 2 == 0 else "blood_pressure"
+        v = random.uniform(60, 100) if mt == "heart_rate" else random.uniform(100, 150)
+        yield 1 + i % 50, mt, round(v, 1), now_ms + i
+
+
+def _json_payloads(n):
+    out = []
+    for eid, mt, v, ms in _readings(n):
+        out.append(json.dumps({
+            "elderly_id": eid,
+            "monitor_type": mt,
+            "monitor_value": v,
+            "monitor_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ms / 1000)),
+            "device_id": "bench_dev",
+        }).encode("utf-8"))
+    return out
+
+
+def _bin_payloads(n):
+    recs = [(eid, TYPE_CODES[mt], v, ms) for eid, mt, v, ms in _readings(n)]
+    return [encode_frame("bench_dev", recs[i:i + FRAME]) for i in range(0, len(recs), FRAME)]
+
+
+def _json_batches(n):
+    out = []
+    rows = [json.loads(p) for p in _json_payloads(n)]
+    for i in range(0, n, FRAME):
+        fields = ("elderly_id", "monitor_type", "monitor_value", "monitor_time")
+        readings = [{k: r[k] for k in fields} for r in rows[i:i + FRAME]]
+        out.append(json.dumps({"device_id": "bench_dev", "readings": readings}).encode("utf-8"))
+    return out
+
+
+def _time_decode(decode, payloads):
+    t0 = time.perf_counter()
+    cnt = 0
+    for p in payloads:
+        items, _ = decode(p)
+        cnt += len(items)
+    return time.perf_counter() - t0, cnt
+
+
+def local() -> int:
+    # 对比订阅端实际的解码路径（含 _normalize 校验与规则表判定），而不是裸 json.loads / decode_frame
+    from app.core.config import settings
+    from app.events.mqtt_consumer import _decode_binary, _decode_json
+
+    settings.DEVICE_REGISTRY_ENABLED = False  # 不查库
+    js, jb, bs = _json_payloads(N), _json_batches(N), _bin_payloads(N)
+    rows = (
+        ("JSON   ", js, _decode_json, ""),
+        ("JSON×批", jb, _decode_json, f"  (信封={FRAME})"),
+        ("BINARY ", bs, _decode_binary, f"  (帧={FRAME})"),
+    )
+    for name, payloads, decode, note in rows:
+        t, cnt = _time_decode(decode, payloads)
+        assert cnt == N, f"{name.strip()} 解码条数 {cnt} != {N}"
+        print(f"{name}: {N} 条 {t:.3f}s  {N / t:,.0f} 条/s  {sum(map(len, payloads)) / N:.1f} B/条{note}")
+    return 0
+
+
+def publish() -> int:
+    import paho.mqtt.client as mqtt
+
+    c = mqtt.Client()
+    c.connect(BROKER_HOST, BROKER_PORT, 60)
+    c.loop_start()
+    js = _json_payloads(N)
+    t0 = time.perf_counter()
+    for p in js:
+        c.publish(TOPIC, p, qos=1)
+    print(f"JSON   发布 {len(js)} 条消息 {time.perf_counter() - t0:.3f}s")
+    bs = _bin_payloads(N)
+    t0 = time.perf_counter()
+    for p in bs:
+        c.publish(BIN_TOPIC, p, qos=1)
+    print(f"BINARY 发布 {len(bs)} 帧（{N} 条读数）{time.perf_counter() - t0:.3f}s")
+    c.loop_stop()
+    c.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "local"
+    raise SystemExit(publish() if mode == "publish" else local())
@@ -0,0 +1,62 @@
+"""
+向量化异常引擎与标量引擎的等价性校验（无需数据库/Broker）
+
+用法：python -m tests.test_anomaly_vector（或 python -m pytest tests/test_anomaly_vector.py）
+- 随机键（含同批重复键、首条读数、冷启动阈值附近）与随机批大小，逐条比对
+  score / confidence / personal_abnormal / n / mu / mdev / sigma，要求完全一致（同一浮点运算顺序）。
+- 依次覆盖不分桶与时段分桶（ANOMALY_SEASONAL=daynight / hour）。
+"""
+import random
+import sys
+
+from app.services.edge.anomaly import AnomalyEngine
+from app.services.edge.anomaly_vector import VectorAnomalyEngine
+from tests._runner import run
+
+FIELDS = ("score", "confidence", "personal_abnormal", "n", "mu", "mdev", "sigma", "k")
+
+
+def _compare(seasonal: str) -> None:
+    rnd = random.Random(20251223)
+    scalar = AnomalyEngine(alpha=0.1, k_sigma=3.0, min_samples=20, seasonal=seasonal)
+    vector = VectorAnomalyEngine(alpha=0.1, k_sigma=3.0, min_samples=20, capacity=16, seasonal=seasonal)
+    keys = [(1 + i % 40, f"dev{i % 3}", ("heart_rate", "blood_pressure")[i % 2]) for i in range(120)]
+    total = 0
+    for _ in range(400):
+        size = rnd.choice((1, 2, 7, 50, 300))
+        # 少量热点键，保证同批内大量重复
+        pool = keys[: rnd.choice((3, 20, 120))]
+        batch = [rnd.choice(pool) for _ in range(size)]
+        values = [rnd.gauss(80, 8) if rnd.random() > 0.02 else rnd.uniform(140, 200) for _ in range(size)]
+        # 时段桶：取自随机小时（分桶时同键不同桶互不影响）
+        buckets = [scalar.bucket_of_hour(rnd.randrange(24)) for _ in range(size)]
+        expect = scalar.score_batch(batch, values, buckets)
+        got = vector.score_batch(batch, values, buckets)
+        for i, (e, g) in enumerate(zip(expect, got)):
+            for f in FIELDS:
+                assert e[f] == g[f], f"{seasonal} 第 {total + i} 条 {batch[i]} 字段 {f}：scalar={e[f]!r} vector={g[f]!r}"
+        total += size
+    for k in keys:
+        for b in range(scalar.buckets):
+            s, v = scalar.get_state(k, b), vector.get_state(k, b)
+            assert s == v, f"{seasonal} 基线状态不一致：{k} 桶 {b} {s} != {v}"
+            assert scalar.peek_abnormal(k, 190.0, b) == vector.peek_abnormal(k, 190.0, b), f"{seasonal} peek_abnormal 不一致：{k} 桶 {b}"
+
+
+def test_off() -> None:
+    """不分桶"""
+    _compare("off")
+
+
+def test_daynight() -> None:
+    """昼夜分桶"""
+    _compare("daynight")
+
+
+def test_hour() -> None:
+    """按小时分桶"""
+    _compare("hour")
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,105 @@
+"""
+基线键淘汰与暂存区（evict / 快照落盘 / 取回）的校验（无需数据库/Broker）
+
+用法：python -m tests.test_baseline_eviction（或 python -m pytest tests/test_baseline_eviction.py）
+- 淘汰：先淘汰空闲键，再按最久未更新淘汰超出 max_keys 的键；标量与向量引擎行为一致。
+- 暂存区：被淘汰的键在写出快照前仍可查询，写出后释放，再次访问时从快照取回（restored）。
+- 并发保护：选中后又被更新的键不淘汰。
+- 保留期：暂存区中超过保留期的键在写出时同样丢弃。
+- 配置：未启用定期快照写出时不暂存（make_engine）。
+"""
+import sys
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.edge.anomaly import AnomalyEngine, make_engine
+from app.services.edge.anomaly_vector import VectorAnomalyEngine
+from app.services.edge.baseline_snapshot import BaselineSnapshots
+from tests._runner import run
+
+KEYS = [(i, "d", "heart_rate") for i in range(100)]
+
+
+def _age(e, keys, seconds: float) -> None:
+    if isinstance(e, AnomalyEngine):
+        for k in keys:
+            e._store[k].seen -= seconds
+    else:
+        for k in keys:
+            e.seen[e._slot[k]] -= seconds
+
+
+def test_evict(tmp_path: Path) -> None:
+    """空闲与预算淘汰"""
+    for cls in (AnomalyEngine, VectorAnomalyEngine):
+        e = cls(0.1, 3.0, 5, max_keys=50, idle_seconds=100, evict_to_snapshot=True)
+        e.score_batch(KEYS, [70.0] * 100)
+        _age(e, KEYS[:20], 1000)      # 空闲
+        _age(e, KEYS[20:60], 50)      # 最久未更新，超出预算时先淘汰
+        e.score_batch(KEYS[60:], [72.0] * 40)
+        assert e.evict() == 50, e.stats()
+        name = cls.__name__
+        assert len(e) == 50 and e.evicted_idle == 20 and e.evicted_budget == 30, f"{name} {e.stats()}"
+        assert {k for k, *_ in e.items()} == set(KEYS), f"{name}：暂存区中的键应随快照写出"
+        assert e.get_state(KEYS[0]).n == 1 and e.get_state(KEYS[99]).n == 2
+        snaps = BaselineSnapshots(e)
+        assert snaps.save(path=tmp_path / f"{name}.bin") == 100
+        assert e.stats()["pending_evicted"] == 0, "写出后应释放暂存区"
+        assert snaps.save(path=tmp_path / f"{name}.bin") == -1, "无更新时应跳过写出"
+        assert e.score_batch([KEYS[0]], [70.0])[0]["n"] == 2 and e.restored == 1, f"{name}：应从快照取回"
+
+
+def test_race() -> None:
+    """选中后更新"""
+    e = AnomalyEngine(0.1, 3.0, 5, idle_seconds=100, evict_to_snapshot=True)
+    e.score_batch(KEYS[:2], [70.0, 70.0])
+    _age(e, KEYS[:2], 1000)
+    real_lock = e._lock
+
+    class _Touch:
+        # 选择完成、进入锁之前：工作线程更新了 KEYS[0]
+        def __enter__(self):
+            e._store[KEYS[0]].seen = time.time()
+            return real_lock.__enter__()
+
+        def __exit__(self, *exc):
+            return real_lock.__exit__(*exc)
+
+    e._lock = _Touch()
+    try:
+        assert e.evict() == 1 and KEYS[0] in e._store and KEYS[1] not in e._store, "选中后又被更新的键不应淘汰"
+    finally:
+        e._lock = real_lock
+
+
+def test_retention(tmp_path: Path) -> None:
+    """暂存区保留期"""
+    saved = settings.ANOMALY_SNAPSHOT_RETENTION_DAYS
+    settings.ANOMALY_SNAPSHOT_RETENTION_DAYS = 30
+    try:
+        e = AnomalyEngine(0.1, 3.0, 5, idle_seconds=100, evict_to_snapshot=True)
+        e.score_batch(KEYS[:2], [70.0, 70.0])
+        _age(e, KEYS[:1], 40 * 86400)
+        _age(e, KEYS[1:2], 1000)
+        e.evict()
+        assert BaselineSnapshots(e).save(path=tmp_path / "r.bin") == 1, "暂存区中超过保留期的键应丢弃"
+    finally:
+        settings.ANOMALY_SNAPSHOT_RETENTION_DAYS = saved
+
+
+def test_config() -> None:
+    """暂存开关"""
+    saved = (settings.ANOMALY_EVICT_TO_SNAPSHOT, settings.ANOMALY_SNAPSHOT_ENABLED, settings.ANOMALY_SNAPSHOT_INTERVAL_SECONDS)
+    try:
+        settings.ANOMALY_EVICT_TO_SNAPSHOT, settings.ANOMALY_SNAPSHOT_ENABLED = True, True
+        settings.ANOMALY_SNAPSHOT_INTERVAL_SECONDS = 300
+        assert make_engine().evict_to_snapshot
+        settings.ANOMALY_SNAPSHOT_INTERVAL_SECONDS = 0
+        assert not make_engine().evict_to_snapshot, "只在关闭时写出快照时不应暂存"
+    finally:
+        settings.ANOMALY_EVICT_TO_SNAPSHOT, settings.ANOMALY_SNAPSHOT_ENABLED, settings.ANOMALY_SNAPSHOT_INTERVAL_SECONDS = saved
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,111 @@
+"""
+个性化基线冷启动播种（BaselineSeeder / engine.seed）的校验（聚合查询以内存会话替代，无需数据库）
+
+用法：python -m tests.test_baseline_seed（或 python -m pytest tests/test_baseline_seed.py）
+- 换算：中位数为中心，IQR/1.349 近似 σ（IQR 为 0 时退回样本标准差），再换算为 mdev。
+- 播种：标量与向量引擎均立即启用个性化检测；已有实时读数的键、早于空闲期的组不播种。
+- 分桶：按 bucket 列逐桶播种，快照中已有样本的桶不覆盖、空桶照常填充。
+"""
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, List
+
+import app.core.database as database
+from app.services.edge.anomaly import AnomalyEngine
+from app.services.edge.anomaly_vector import VectorAnomalyEngine
+from app.services.edge.baseline_seed import BaselineSeeder, seed_state
+from app.services.edge.baseline_snapshot import BaselineSnapshots
+from tests._runner import run
+
+
+def _row(eid: int, mt: str, median: float, q1: Any, q3: Any, stddev: Any, last: datetime, bucket: int = 0, n: int = 120):
+    return SimpleNamespace(elderly_id=eid, device_id="d", monitor_type=mt, n=n, median=median,
+                           q1=q1, q3=q3, stddev=stddev, last_time=last, bucket=bucket)
+
+
+class _Session:
+    """替代 SessionLocal：execute(...).partitions() 返回预置的聚合行。"""
+
+    parts: List[List[Any]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, stmt):
+        return SimpleNamespace(partitions=lambda: iter(_Session.parts))
+
+
+def _seed(engine, parts) -> BaselineSeeder:
+    saved = database.SessionLocal
+    _Session.parts = parts
+    database.SessionLocal = _Session
+    try:
+        s = BaselineSeeder(engine)
+        s.run(30, 10, 100)
+        return s
+    finally:
+        database.SessionLocal = saved
+
+
+def test_convert() -> None:
+    """聚合换算"""
+    now = datetime.now()
+    n, mu, mdev, seen = seed_state(_row(1, "heart_rate", 72.0, 68.0, 76.0, 5.0, now))
+    assert n == 120 and mu == 72.0 and abs(mdev - 8.0 / 1.349 / 1.253) < 1e-12
+    assert abs(seen - now.timestamp()) < 1e-6
+    _, _, mdev, _ = seed_state(_row(1, "spo2", 98.0, 98.0, 98.0, Decimal("0.6"), now))
+    assert abs(mdev - 0.6 / 1.253) < 1e-12, "IQR 为 0 时应退回样本标准差"
+    assert seed_state(_row(1, "spo2", None, None, None, None, now)) is None
+
+
+def test_engines() -> None:
+    """两种引擎"""
+    now = datetime.now()
+    parts = [
+        [_row(1, "heart_rate", 72.0, 68.0, 76.0, 5.0, now), _row(2, "spo2", 98.0, 97.0, 99.0, 1.0, now)],
+        [_row(3, "heart_rate", 70.0, 65.0, 75.0, 6.0, now),
+         _row(4, "heart_rate", 70.0, 65.0, 75.0, 6.0, now - timedelta(days=20))],
+    ]
+    for cls in (AnomalyEngine, VectorAnomalyEngine):
+        kw = {"capacity": 16} if cls is VectorAnomalyEngine else {}
+        e = cls(0.1, 3.0, 50, idle_seconds=7 * 86400, **kw)
+        e.score_batch([(3, "d", "heart_rate")], [80.0])  # 实时读数已建立
+        s = _seed(e, parts)
+        st = s.stats()
+        assert st["state"] == "done" and st["groups"] == 4 and st["seeded"] == 2, st
+        assert st["skipped"] == 1 and st["stale"] == 1, st
+        assert e.get_state((3, "d", "heart_rate")).n == 1, "已有实时读数的键不应覆盖"
+        assert e.get_state((4, "d", "heart_rate")) is None, "早于空闲期的组不应播种"
+        assert e.score_batch([(1, "d", "heart_rate")], [130.0])[0]["personal_abnormal"]
+        assert not e.score_batch([(1, "d", "heart_rate")], [73.0])[0]["personal_abnormal"]
+
+
+def test_buckets() -> None:
+    """时段分桶"""
+    now = datetime.now()
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "s.bin"
+        src = AnomalyEngine(0.1, 3.0, 5, seasonal="daynight")
+        for _ in range(10):
+            src.update_and_score((1, "d", "heart_rate"), 60.0, bucket=1)
+        BaselineSnapshots(src).save(path=path)
+        e = AnomalyEngine(0.1, 3.0, 5, seasonal="daynight")
+        BaselineSnapshots(e).load(path)
+        parts = [[_row(1, "heart_rate", 80.0, 76.0, 84.0, 5.0, now, bucket=b) for b in (0, 1)]]
+        s = _seed(e, parts)
+        assert s.seeded == 1 and s.skipped == 1, s.stats()
+        assert e.get_state((1, "d", "heart_rate"), 0).mu == 80.0, "快照中的空桶应播种"
+        night = e.get_state((1, "d", "heart_rate"), 1)
+        assert night.n == 10 and night.mu == 60.0, f"快照中已有样本的桶不应覆盖：{night}"
+        assert e.restored == 1
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
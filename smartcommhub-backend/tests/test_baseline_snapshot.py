@@ -0,0 +1,144 @@
+"""
+个性化基线快照（写出 / mmap 挂载 / 旧版本兼容 / 分桶换算）的校验（无需数据库/Broker）
+
+用法：python -m tests.test_baseline_snapshot（或 python -m pytest tests/test_baseline_snapshot.py）
+- 往返：标量与向量引擎写出后由新引擎挂载，按键取回的状态与原引擎一致；未访问的键随下一次写出保留。
+- 保留期：超过 ANOMALY_SNAPSHOT_RETENTION_DAYS 未更新的键在写出时丢弃。
+- 旧版本：v1（无 seen，按 created_at 计）与 v2（含 seen、无扩展头）文件仍可挂载。
+- 分桶换算（_fit）：不分桶快照挂到分桶引擎时各桶冷启动（n=0）；分桶快照挂到不分桶引擎时取样本最多的桶；
+  分桶数不同（daynight -> hour）同样冷启动。
+"""
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.edge.anomaly import AnomalyEngine, State
+from app.services.edge.anomaly_vector import VectorAnomalyEngine
+from app.services.edge.baseline_snapshot import (
+    FLAG_LE, HEADER, MAGIC, BaselineSnapshots, Snapshot, SnapshotError, _SEP, key_id,
+)
+from tests._runner import run
+
+KEYS = [(eid, f"dev{eid % 3}", mt) for eid in range(1, 41) for mt in ("heart_rate", "spo2")]
+
+
+def _feed(engine, rounds: int = 30) -> None:
+    for r in range(rounds):
+        for i, k in enumerate(KEYS):
+            engine.update_and_score(k, 70.0 + (i % 7) + (r % 5) * 0.5, bucket=r % engine.buckets)
+
+
+def test_roundtrip(tmp_path: Path) -> None:
+    """写出与挂载往返"""
+    for make in (lambda: AnomalyEngine(0.1, 3.0, 20, seasonal="daynight"),
+                 lambda: VectorAnomalyEngine(0.1, 3.0, 20, capacity=16, seasonal="daynight")):
+        src = make()
+        _feed(src)
+        path = tmp_path / "b.bin"
+        assert BaselineSnapshots(src).save(path=path) == len(KEYS)
+        dst = make()
+        assert BaselineSnapshots(dst).load(path) == len(KEYS)
+        for k in KEYS:
+            for b in range(src.buckets):
+                assert dst.get_state(k, b) == src.get_state(k, b), f"{type(src).__name__} {k} 桶 {b}"
+        # 只访问一半键后再写出：未取回的键从旧快照原样保留
+        for k in KEYS[::2]:
+            dst.update_and_score(k, 75.0)
+        snaps = BaselineSnapshots(dst)
+        assert snaps.save(path=path) == len(KEYS)
+        again = make()
+        BaselineSnapshots(again).load(path)
+        assert again.get_state(KEYS[1], 0) == src.get_state(KEYS[1], 0)
+        assert again.get_state(KEYS[0], 0) == dst.get_state(KEYS[0], 0)
+
+
+def test_retention(tmp_path: Path) -> None:
+    """保留期"""
+    saved = settings.ANOMALY_SNAPSHOT_RETENTION_DAYS
+    settings.ANOMALY_SNAPSHOT_RETENTION_DAYS = 30
+    try:
+        e = AnomalyEngine(0.1, 3.0, 20)
+        now = time.time()
+        e._store[KEYS[0]] = State(25, 70.0, 2.0, now)
+        e._store[KEYS[1]] = State(25, 70.0, 2.0, now - 40 * 86400)
+        e.updates = 1
+        path = tmp_path / "r.bin"
+        BaselineSnapshots(e).save(path=path)
+        # 过期键只在离线（快照中未取回）时按保留期丢弃：重新挂载后再写一次
+        e2 = AnomalyEngine(0.1, 3.0, 20)
+        s2 = BaselineSnapshots(e2)
+        s2.load(path)
+        assert s2.save(force=True, path=path) == 1, "超过保留期的键应在写出时丢弃"
+        assert Snapshot(path).lookup(KEYS[1]) is None and Snapshot(path).lookup(KEYS[0]) is not None
+    finally:
+        settings.ANOMALY_SNAPSHOT_RETENTION_DAYS = saved
+
+
+def _legacy(path: Path, version: int, created_at: float) -> None:
+    """按 v1/v2 布局手工写出单键快照（不分桶，无扩展头）。"""
+    (eid, dev, mt) = KEYS[0]
+    s = f"{dev}{_SEP}{mt}"
+    strtab = s.encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, version, FLAG_LE, 1, len(strtab), created_at, 0.1))
+        array("Q", [key_id(eid, s)]).tofile(f)
+        array("d", [72.0]).tofile(f)
+        array("d", [1.5]).tofile(f)
+        array("I", [30]).tofile(f)
+        array("I", [0]).tofile(f)
+        if version >= 2:
+            array("I", [1_700_000_000]).tofile(f)
+        f.write(strtab)
+
+
+def test_versions(tmp_path: Path) -> None:
+    """旧版本兼容"""
+    for version, seen in ((1, 1_600_000_000.0), (2, 1_700_000_000.0)):
+        path = tmp_path / f"v{version}.bin"
+        _legacy(path, version, 1_600_000_000.0)
+        snap = Snapshot(path)
+        assert snap.buckets == 1 and snap.lookup(KEYS[0]) == (30, 72.0, 1.5, seen), f"v{version}：{snap.lookup(KEYS[0])}"
+        e = AnomalyEngine(0.1, 3.0, 20)
+        BaselineSnapshots(e).load(path)
+        assert e.get_state(KEYS[0]) == State(30, 72.0, 1.5), f"v{version} 挂载后取回不一致"
+    bad = tmp_path / "bad.bin"
+    bad.write_bytes(struct.pack("<4sHHQQdd", b"SCHA", 9, FLAG_LE, 0, 0, 0.0, 0.1))
+    try:
+        Snapshot(bad)
+        raise AssertionError("未知版本应被拒绝")
+    except SnapshotError:
+        pass
+
+
+def test_fit(tmp_path: Path) -> None:
+    """分桶换算"""
+    flat = AnomalyEngine(0.1, 3.0, 20)
+    _feed(flat)
+    p_flat = tmp_path / "flat.bin"
+    BaselineSnapshots(flat).save(path=p_flat)
+    hourly = AnomalyEngine(0.1, 3.0, 20, seasonal="hour")
+    BaselineSnapshots(hourly).load(p_flat)
+    assert all(hourly.get_state(KEYS[0], b).n == 0 for b in range(hourly.buckets)), "全天基线不应直接启用分桶检测"
+    assert hourly.update_and_score(KEYS[0], 70.0, bucket=3)["n"] == 1
+
+    dn = AnomalyEngine(0.1, 3.0, 20, seasonal="daynight")
+    for r in range(30):
+        dn.update_and_score(KEYS[0], 80.0, bucket=0)
+    for r in range(5):
+        dn.update_and_score(KEYS[0], 60.0, bucket=1)
+    p_dn = tmp_path / "dn.bin"
+    BaselineSnapshots(dn).save(path=p_dn)
+    back = AnomalyEngine(0.1, 3.0, 20)
+    BaselineSnapshots(back).load(p_dn)
+    st = back.get_state(KEYS[0])
+    assert st.n == 30 and st.mu == dn.get_state(KEYS[0], 0).mu, f"应取样本最多的桶：{st}"
+    other = VectorAnomalyEngine(0.1, 3.0, 20, capacity=16, seasonal="hour")
+    BaselineSnapshots(other).load(p_dn)
+    assert all(other.get_state(KEYS[0], b).n == 0 for b in range(other.buckets)), "分桶数不同应冷启动"
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,106 @@
+"""
+写库攒批（AdaptiveBatcher / drain_batch）的校验（无需数据库/Broker）
+
+用法：python -m tests.test_batching（或 python -m pytest tests/test_batching.py）
+- AIMD：提交超时批大小减半、linger 加倍；有积压时批大小按 step 加性增长；空闲时 linger 减半；均不越过上下限。
+- 关闭自适应：固定为 max_size / max_linger_ms，observe 不生效。
+- 分桶：批大小按 BATCH_SIZE_BUCKETS 归入不小于它的最小桶，超出最大桶计入 +Inf。
+- 攒批：满 max_size 即返回；紧急单元出现后不再等待 linger，遇到普通单元即返回。
+"""
+import queue
+import sys
+
+from app.core.metrics import _Histogram
+from app.events.batching import BATCH_SIZE_BUCKETS, LANE_FAST, LANE_NORMAL, AdaptiveBatcher, drain_batch, is_fast
+from tests._runner import run
+
+
+def _batcher(**kw) -> AdaptiveBatcher:
+    args = dict(min_size=10, max_size=100, min_linger_ms=5, max_linger_ms=40, target_ms=50, step=20)
+    args.update(kw)
+    return AdaptiveBatcher("test", **args)
+
+
+def test_grow() -> None:
+    """积压时加性增长"""
+    b = _batcher()
+    assert b.size == 10 and b.linger_ms == 40
+    b.observe(10, 5.0, 0)
+    assert b.size == 30 and b.increases == 1, "本批攒满应加性增长"
+    b.observe(3, 5.0, 30)
+    assert b.size == 50 and b.increases == 2, "队列深度 >= 批大小应加性增长"
+    for _ in range(10):
+        b.observe(b.size, 5.0, 1000)
+    assert b.size == 100 and b.increases == 5, "批大小不应超过 max_size"
+    assert b.linger_ms == 40, "增长时 linger 不变"
+
+
+def test_shrink() -> None:
+    """超时乘性减小"""
+    b = _batcher()
+    b.size, b.linger_ms = 100, 10
+    b.observe(100, 80.0, 1000)
+    assert b.size == 50 and b.linger_ms == 20 and b.decreases == 1, b.stats()
+    for _ in range(10):
+        b.observe(b.size, 80.0, 0)
+    assert b.size == 10 and b.linger_ms == 40, f"应停在下限：{b.stats()}"
+    assert b.decreases == 4, "到达下限后不再计数"
+    b.linger_ms = 0.0
+    b.observe(10, 80.0, 0)
+    assert b.linger_ms == 1.0, "linger 为 0 时加倍应至少为 1ms"
+
+
+def test_idle() -> None:
+    """空闲时缩短 linger"""
+    b = _batcher()
+    b.size = 50
+    b.observe(10, 5.0, 0)
+    assert b.size == 50 and b.linger_ms == 20
+    for _ in range(5):
+        b.observe(10, 5.0, 0)
+    assert b.linger_ms == 5, "linger 不应低于 min_linger_ms"
+    b.observe(30, 5.0, 1)
+    assert b.size == 50 and b.linger_ms == 5, "既不超时、不积压也不空闲时保持不变"
+
+
+def test_disabled() -> None:
+    """关闭自适应"""
+    b = _batcher(enabled=False)
+    assert b.size == 100 and b.linger_ms == 40
+    b.observe(100, 500.0, 1000)
+    b.observe(1, 1.0, 0)
+    assert b.size == 100 and b.linger_ms == 40 and b.increases == b.decreases == 0
+    clamped = _batcher(min_size=500, max_size=0, min_linger_ms=100, max_linger_ms=-1)
+    assert clamped.size == clamped.min_size == clamped.max_size == 1 and clamped.min_linger_ms == clamped.linger_ms == 0
+
+
+def test_buckets() -> None:
+    """批大小分桶"""
+    h = _Histogram(BATCH_SIZE_BUCKETS)
+    for n in (1, 3, 5, 6, 20, 21, 1000, 1001, 5000):
+        h.observe(n)
+    got = h.to_dict()["buckets"]
+    assert got["1"] == 1 and got["5"] == 2 and got["10"] == 1, got
+    assert got["20"] == 1 and got["50"] == 1 and got["1000"] == 1 and got["+Inf"] == 2, got
+    assert h.quantile(0.5) == 20.0 and h.quantile(1.0) == 5000
+
+
+def test_drain() -> None:
+    """攒批与紧急单元"""
+    q: "queue.Queue" = queue.Queue()
+    for i in range(5):
+        q.put((0.0, [i] * 4))
+    units = drain_batch(q, 10, 0.01)
+    assert len(units) == 3 and q.qsize() == 2, "记录满 max_size 应返回（按记录计）"
+    assert drain_batch(queue.Queue(), 10, 0.01, wait_s=0.01) == []
+
+    pq: "queue.PriorityQueue" = queue.PriorityQueue()
+    for seq, lane in enumerate((LANE_FAST, LANE_FAST, LANE_NORMAL, LANE_NORMAL)):
+        pq.put((lane, seq, 0.0, [seq]))
+    units = drain_batch(pq, 100, 5.0, urgent=is_fast)
+    assert [u[0] for u in units] == [LANE_FAST, LANE_FAST, LANE_NORMAL], "紧急单元后遇到普通单元即返回，不等 linger"
+    assert pq.qsize() == 1
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
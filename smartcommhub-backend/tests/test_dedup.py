@@ -0,0 +1,81 @@
+"""
+重复/重投递抑制（DedupIndex）与订阅端准入去重的校验（无需数据库/Broker）
+
+用法：python -m tests.test_dedup（或 python -m pytest tests/test_dedup.py）
+- 窗口：键在 window/2 内必被记住，两次轮转后被遗忘。
+- 容量：current 达到 max_keys/2 即轮转，总大小不超过 max_keys。
+- forget：撤销标记后同一键不再判为重复。
+- 准入：_dispatch 丢弃重复读数；入队失败（队列满、无磁盘缓冲）的读数撤销标记，重投时仍可入队。
+"""
+import queue
+import sys
+from datetime import datetime
+
+from app.core.config import settings
+from app.events import mqtt_consumer as mc
+from app.services.edge.dedup import DedupIndex
+from tests._runner import run
+
+
+def test_window() -> None:
+    """窗口轮转"""
+    d = DedupIndex(window_s=2.0, max_keys=1000)
+    assert not d.seen("a") and d.seen("a"), "同一键第二次应判为重复"
+    d._born -= 1.0  # 半窗口已过：下一次写入触发轮转，"a" 进入 previous
+    assert not d.seen("b")
+    assert d.rotations == 1 and d.seen("a"), "轮转一次后仍应记住"
+    d._born -= 1.0
+    assert not d.seen("c")
+    assert not d.seen("a"), "轮转两次后应遗忘"
+
+
+def test_capacity() -> None:
+    """容量上限"""
+    d = DedupIndex(window_s=3600, max_keys=100)
+    for i in range(1000):
+        d.seen(i)
+        assert d.stats()["size"] <= 100, d.stats()
+    assert d.rotations >= 19, d.stats()
+    assert d.seen(999) and not d.seen(0)
+
+
+def test_forget() -> None:
+    """forget"""
+    d = DedupIndex(window_s=3600, max_keys=100)
+    d.seen("a")
+    d.forget(["a", "never"])
+    assert not d.seen("a"), "forget 后不应判为重复"
+
+
+def _item() -> dict:
+    return {"device_id": "d1", "elderly_id": 1, "monitor_type": "heart_rate", "monitor_value": 70.0,
+            "monitor_time": datetime(2026, 1, 1, 8, 0, 0), "is_abnormal": False}
+
+
+def test_admit() -> None:
+    """准入去重"""
+    saved = (settings.INGEST_DEDUP_ENABLED, settings.INGEST_DEVICE_LIMIT_ENABLED, settings.INGEST_FAST_LANE_ENABLED)
+    shards, spool = [s.q for s in mc.SHARDS], mc.SPOOL
+    settings.INGEST_DEDUP_ENABLED, settings.INGEST_DEVICE_LIMIT_ENABLED, settings.INGEST_FAST_LANE_ENABLED = True, False, False
+    mc.SPOOL = None
+    mc.dedup_index.forget([mc._dedup_key(_item())])
+    try:
+        # 队列已满且无磁盘缓冲：读数被丢弃，去重标记应撤销
+        for s in mc.SHARDS:
+            s.q = queue.PriorityQueue(maxsize=1)
+            s.q.put_nowait(mc._unit(mc.LANE_NORMAL, []))
+        assert mc._dispatch([_item()]) == 0
+        for s in mc.SHARDS:
+            s.q = queue.PriorityQueue()
+        counts: dict = {}
+        assert mc._dispatch([_item()], 0, counts) == 1, "被丢弃的读数重投时应可入队"
+        assert mc._dispatch([_item()], 0, counts) == 0 and counts.get("duplicate") == 1, counts
+    finally:
+        settings.INGEST_DEDUP_ENABLED, settings.INGEST_DEVICE_LIMIT_ENABLED, settings.INGEST_FAST_LANE_ENABLED = saved
+        for s, q in zip(mc.SHARDS, shards):
+            s.q = q
+        mc.SPOOL = spool
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
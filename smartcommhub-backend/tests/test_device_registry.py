@@ -0,0 +1,111 @@
+"""
+设备注册表缓存（DeviceRegistry）的校验（查库以桩函数替代，无需数据库/Broker）
+
+用法：python -m tests.test_device_registry（或 python -m pytest tests/test_device_registry.py）
+- 首次出现：调用线程不查库，按未登记返回；后台刷新线程查库后命中。
+- 负缓存：未登记设备只查库一次。
+- 过期：过期条目照常返回旧值并后台刷新（stale-while-revalidate）。
+- 失效：invalidate 丢弃条目并后台重新查库。
+- 有界：负缓存超出上限淘汰最早的、过期即清理；刷新队列有上限且不重复入队，队满时丢弃。
+- 校准：calibrate / calibrate_batch 按类型加偏移，类型白名单生效。
+"""
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.services.edge.device_registry import DeviceRegistry
+from tests._runner import run
+
+
+class _Row:
+    def __init__(self, elderly_id: int, monitor_types: Optional[str] = None, calibration: Optional[str] = None):
+        self.elderly_id = elderly_id
+        self.monitor_types = monitor_types
+        self.calibration = calibration
+
+
+def _registry(rows: Dict[str, _Row], calls: List[str]) -> DeviceRegistry:
+    r = DeviceRegistry(ttl_s=60, negative_ttl_s=60)
+
+    def fetch(device_id: str):
+        calls.append(threading.current_thread().name)
+        r.lookups += 1
+        return r._entry(rows.get(device_id), time.monotonic())
+
+    r._fetch = fetch
+    threading.Thread(target=r._refresh_loop, name="registry-test", daemon=True).start()
+    return r
+
+
+def _settle(r: DeviceRegistry) -> None:
+    deadline = time.monotonic() + 2.0
+    while (r._refreshing or not r._refresh_q.empty()) and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_first_seen() -> None:
+    """首次出现与负缓存"""
+    rows = {"w1": _Row(7)}
+    calls: List[str] = []
+    r = _registry(rows, calls)
+    assert r.get("w1") is None and r.pending == 1, "首次出现应按未登记返回"
+    _settle(r)
+    assert r.resolve_elder("w1") == 7 and calls == ["registry-test"], f"应由后台线程查库：{calls}"
+    assert r.get("nope") is None
+    _settle(r)
+    for _ in range(5):
+        assert r.get("nope") is None
+    assert r.lookups == 2, "未登记设备应负缓存，只查库一次"
+
+
+def test_stale_and_invalidate() -> None:
+    """过期与失效"""
+    rows = {"w1": _Row(7)}
+    calls: List[str] = []
+    r = _registry(rows, calls)
+    r.get("w1")
+    _settle(r)
+    rows["w1"] = _Row(8)
+    r._map["w1"].expires = 0.0
+    assert r.resolve_elder("w1") == 7 and r.stale == 1, "过期条目应先返回旧值"
+    _settle(r)
+    assert r.resolve_elder("w1") == 8, "后台刷新后应返回新值"
+    rows["w1"] = _Row(9)
+    r.invalidate("w1")
+    _settle(r)
+    assert r.resolve_elder("w1") == 9 and r.invalidations == 1, "invalidate 后应重新查库"
+
+
+def test_bounds() -> None:
+    """有界"""
+    r = DeviceRegistry(ttl_s=60, negative_ttl_s=60, negative_max=3, queue_max=2)
+    for i in range(5):
+        assert r.get(f"x{i}") is None
+    assert list(r._negative) == ["x2", "x3", "x4"], f"负缓存应按上限淘汰最早的：{list(r._negative)}"
+    assert r._refresh_q.qsize() == 2 and r.dropped == 3, "刷新队列应有上限，队满时丢弃"
+    r.get("x2")
+    assert r._refresh_q.qsize() == 2 and r.pending == 5, "负缓存未过期时不应再入队"
+    r._negative["x2"] = 0.0
+    r._negative.move_to_end("x2", last=False)
+    r.get("x5")
+    assert "x2" not in r._negative and len(r._negative) == 3, "过期的负缓存应清理"
+
+
+def test_calibrate() -> None:
+    """校准"""
+    rows = {"w1": _Row(7, "heart_rate, spo2", '{"heart_rate": -2.5, "spo2": null}'), "w2": _Row(7, None, "not json")}
+    r = _registry(rows, [])
+    r.get("w1")
+    r.get("w2")
+    _settle(r)
+    e = r.get("w1")
+    assert e.supports("spo2") and not e.supports("glucose")
+    assert e.calibrate("heart_rate", 80.0) == 77.5 and e.calibrate("spo2", 97.0) == 97.0
+    assert e.calibrate_batch(["heart_rate", "spo2"], [80.0, 97.0]) == [77.5, 97.0]
+    e2 = r.get("w2")
+    assert e2.supports("glucose") and e2.offsets == {}, "无法解析的校准配置应忽略"
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
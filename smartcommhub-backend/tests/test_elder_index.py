@@ -0,0 +1,122 @@
+"""
+老人ID存在性索引（ElderIndex）的校验（查库以内存会话替代，无需数据库）
+
+用法：python -m tests.test_elder_index（或 python -m pytest tests/test_elder_index.py）
+- 位图：负 ID 忽略，清除越界 ID 不扩容，越界查询为不存在，size 随增删准确变化。
+- 重载：全量重建后原子替换；重载期间的增量变更在替换后回放，不被旧快照覆盖。
+- 预检策略：索引新鲜时未命中不查库；可能过期时查库确认，存在的补入索引、不存在的进入有界负缓存。
+"""
+import sys
+from types import SimpleNamespace
+from typing import Iterable, Iterator, List, Set
+
+from app.services.edge.elder_index import ElderIndex
+from tests._runner import run
+
+
+class _Db:
+    """替代会话：execute(...).scalars() 返回 ids 中被查询到的部分（按 IN 参数过滤）。"""
+
+    def __init__(self, ids: Iterable[int]):
+        self.ids = set(ids)
+        self.queries: List[Set[int]] = []
+
+    def execute(self, stmt):
+        asked = set(stmt.whereclause.right.value)
+        self.queries.append(asked)
+        return SimpleNamespace(scalars=lambda: iter(asked & self.ids))
+
+
+def test_bitmap() -> None:
+    """位图边界"""
+    ix = ElderIndex()
+    ix.reload([0, 7, 8, 1000])
+    assert ix.stats()["size"] == 4 and ix.contains(0) and ix.contains(7) and ix.contains(8)
+    assert not ix.contains(6) and not ix.contains(9) and not ix.contains(-1)
+    n = len(ix._bits)
+    assert not ix.contains(n * 8 + 5), "越界查询应为不存在"
+    ix.discard(n * 8 + 5)
+    assert len(ix._bits) == n, "清除越界 ID 不应扩容"
+    ix.add(-3)
+    ix.add(7)
+    assert ix.stats()["size"] == 4, "负 ID 忽略、重复添加不计数"
+    ix.add(n * 8 + 5)
+    assert ix.contains(n * 8 + 5) and len(ix._bits) > n and ix.stats()["size"] == 5
+    ix.discard(0)
+    ix.discard(0)
+    assert not ix.contains(0) and ix.stats()["size"] == 4
+
+
+def test_reload_replay() -> None:
+    """重载期间增量回放"""
+    ix = ElderIndex()
+    ix.reload([1, 2, 3])
+
+    def snapshot() -> Iterator[int]:
+        # 旧快照：包含随后被删除的 2，不含新建的 50
+        yield 1
+        ix.add(50)
+        ix.discard(2)
+        yield 2
+        yield 3
+
+    assert ix.reload(snapshot()) == 3
+    assert ix.contains(50) and not ix.contains(2) and ix.contains(1), "重载期间的变更应在替换后回放"
+    assert ix._pending is None and ix.reloads == 2 and ix.ready
+    ix.add(60)
+    assert ix._pending is None and ix.contains(60), "重载结束后不再记录回放"
+
+
+def test_fresh_policy() -> None:
+    """新鲜索引不查库"""
+    ix = ElderIndex()
+    ix.reload([1, 2])
+    db = _Db([1, 2, 9])
+    assert not ix.stale and ix.resolve(db, [1, 9, 9]) == {1}
+    assert db.queries == [], "索引新鲜时未命中应直接判为不存在"
+
+
+def test_stale_policy() -> None:
+    """过期索引查库与负缓存"""
+    ix = ElderIndex(negative_ttl_s=60, negative_max=2)
+    db = _Db([1, 5])
+    assert ix.stale and ix.resolve(db, [1, 9]) == {1}, "未就绪时应查库确认"
+    ix.reload([1])
+    ix.set_feed(False)
+    assert ix.stale and ix._reload_evt.is_set() is False
+    assert ix.resolve(db, [1, 5, 9]) == {1, 5} and db.queries[-1] == {5, 9}
+    assert ix.contains(5), "查库确认存在的 ID 应补入索引"
+    assert ix.resolve(db, [9]) == set() and len(db.queries) == 2, "负缓存期内不应重复查库"
+    ix._negative[9] = 0.0
+    ix.resolve(db, [9])
+    assert db.queries[-1] == {9}, "负缓存过期后应重新查库"
+    ix.resolve(db, [10, 11])
+    assert list(ix._negative) == [10, 11], f"负缓存应有界：{list(ix._negative)}"
+    ix.add(11)
+    assert 11 not in ix._negative, "新建老人应移出负缓存"
+
+    ix.set_feed(True)
+    assert ix._reload_evt.is_set() and ix.stale, "重连后应安排重载，完成前仍视为过期"
+    ix.reload([1, 5])
+    assert not ix.stale and not ix._negative and ix.stats()["db_checks"] == 4
+
+
+def test_feed_change_during_reload() -> None:
+    """重载期间通道变化"""
+    ix = ElderIndex()
+    ix.set_feed(False)
+    ix.set_feed(True)
+
+    def snapshot() -> Iterator[int]:
+        yield 1
+        ix.set_feed(False)
+        ix.set_feed(True)
+
+    ix.reload(snapshot())
+    assert ix.stale, "重载期间通道断开过：本次重载不能恢复新鲜"
+    ix.reload([1])
+    assert not ix.stale
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,96 @@
+"""
+HTTP 批量上报流式解析（_StreamParser）与计数的校验（无需数据库/Broker）
+
+用法：python -m tests.test_http_ingest（或 python -m pytest tests/test_http_ingest.py）
+- 格式识别：JSON 数组（单行/跨行）、NDJSON、首行恰为数组的 NDJSON；任意切块结果一致。
+- 错误：NDJSON 坏行只拒绝该行；数组缺逗号/未闭合、单元素超长为格式错误。
+- 切块：多字节 UTF-8 字符被切开、数字被切开时不误判。
+- 计数：_validate_chunk 展开信封并按行记录被拒读数；BulkResult 单独回报限流/重复条数。
+"""
+import codecs
+import sys
+from datetime import datetime
+from typing import Any, List, Tuple
+
+from app.core.config import settings
+from app.events.http_ingest import BulkResult, StreamFormatError, _StreamParser, _validate_chunk
+from tests._runner import run
+
+
+def _parse(body: str, step: int, max_chars: int = 1 << 20) -> Tuple[str, List[Tuple[int, Any, Any]]]:
+    raw = body.encode("utf-8")
+    dec = codecs.getincrementaldecoder("utf-8")()
+    p = _StreamParser(max_chars)
+    out: List[Tuple[int, Any, Any]] = []
+    for i in range(0, len(raw), step):
+        p.feed(dec.decode(raw[i:i + step]))
+        out += list(p.drain())
+    p.feed(dec.decode(b"", final=True))
+    out += list(p.drain(True))
+    return p.mode, out
+
+
+def test_formats() -> None:
+    """格式识别"""
+    cases = [
+        ('[{"a":1},{"a":2}]', "array", [{"a": 1}, {"a": 2}]),
+        ('[\n  {"a": 1},\n  {"a": 2}\n]\n', "array", [{"a": 1}, {"a": 2}]),
+        ('  [1.25,\n 2e3 , "心率"]', "array", [1.25, 2000.0, "心率"]),
+        ('{"a":1}\n\n{"a":2}\r\n', "ndjson", [{"a": 1}, {"a": 2}]),
+        ('[{"a":1},{"a":2}]\n{"a":3}\n', "ndjson", [[{"a": 1}, {"a": 2}], {"a": 3}]),
+        ('[{"a":1}]\n[{"a":2}]', "ndjson", [[{"a": 1}], [{"a": 2}]]),
+    ]
+    for body, mode, expect in cases:
+        for step in (1, 2, 3, 7, 4096):
+            got_mode, out = _parse(body, step)
+            got = [o for _, o, _ in out]
+            assert got_mode == mode and got == expect, f"{body!r} 切块 {step}：{got_mode} {got}"
+            assert [line for line, _, _ in out] == list(range(1, len(expect) + 1))
+
+
+def test_errors() -> None:
+    """错误处理"""
+    _, out = _parse('{"a":1}\nnot json\n{"a":3}', 5)
+    assert [(line, err is not None) for line, _, err in out] == [(1, False), (2, True), (3, False)], out
+    for body in ('[{"a":1} {"a":2}]', '[{"a":1},', '[{"a":'):
+        try:
+            _parse(body, 3)
+            raise AssertionError(f"{body!r} 应为格式错误")
+        except StreamFormatError:
+            pass
+    try:
+        _parse('{"a":"' + "x" * 200 + '"}\n', 16, max_chars=64)
+        raise AssertionError("超长行应为格式错误")
+    except StreamFormatError:
+        pass
+
+
+def test_counts() -> None:
+    """计数"""
+    saved = settings.DEVICE_REGISTRY_ENABLED
+    settings.DEVICE_REGISTRY_ENABLED = False
+    try:
+        t = "2026-01-01 08:00:00"
+        rows = [
+            (1, {"elderly_id": 1, "monitor_type": "heart_rate", "monitor_value": 70, "monitor_time": t}),
+            (2, {"device_id": "gw", "elderly_id": 2, "readings": [
+                {"monitor_type": "heart_rate", "monitor_value": 71, "monitor_time": t},
+                {"monitor_type": "heart_rate", "monitor_value": 999, "monitor_time": t},
+            ]}),
+            (3, [{"elderly_id": 3, "monitor_type": "unknown", "monitor_value": 1, "monitor_time": t}]),
+        ]
+        res = BulkResult()
+        items, rejected = _validate_chunk(rows, res)
+        assert len(items) == 2 and rejected == 2 and res.accepted == 2 and res.rejected == 2
+        assert items[1]["device_id"] == "gw" and items[1]["monitor_time"] == datetime(2026, 1, 1, 8)
+        assert [e["line"] for e in res.errors] == [2, 3] and res.rejected_lines == 2
+        res.dropped({"rate_limited": 3})
+        res.dropped({"duplicate": 1})
+        out = res.as_dict()
+        assert out["rate_limited"] == 3 and out["duplicate"] == 1, out
+    finally:
+        settings.DEVICE_REGISTRY_ENABLED = saved
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,61 @@
+"""
+幂等插入结果标记（inserted_mask）与 monitor_time 规整的校验（无需数据库/Broker）
+
+用法：python -m tests.test_insert_mask（或 python -m pytest tests/test_insert_mask.py）
+- inserted_mask：按 RETURNING 取回的自然键标记每行是否插入；同批内重复自然键只计第一条；
+  字符串/带时区时间与库内取回的 naive datetime 视为同一键。
+- _normalize：monitor_time 规整为 naive datetime（ISO 8601，含 "T"/空格分隔与时区后缀），无法解析的读数被拒。
+"""
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.core.config import settings
+from app.dao.health_record_dao import inserted_mask, natural_key
+from app.events.mqtt_consumer import _normalize
+from tests._runner import run
+
+T0 = datetime(2026, 1, 1, 8, 0, 0)
+T1 = datetime(2026, 1, 1, 8, 0, 1)
+
+
+def _ret(eid: int, dev: str, mt: str, t: datetime) -> SimpleNamespace:
+    # 模拟 RETURNING 行：row._mapping 为列名 -> 值
+    return SimpleNamespace(_mapping={"elderly_id": eid, "device_id": dev, "monitor_type": mt, "monitor_time": t})
+
+
+def _row(t, eid: int = 1, mt: str = "heart_rate") -> dict:
+    return {"elderly_id": eid, "device_id": "d1", "monitor_type": mt, "monitor_value": 70.0, "monitor_time": t}
+
+
+def test_mask() -> None:
+    """inserted_mask"""
+    rows = [_row(T0), _row(T1), _row(T0), _row(T0, eid=2)]
+    returned = [_ret(1, "d1", "heart_rate", T0), _ret(2, "d1", "heart_rate", T0)]
+    assert inserted_mask(rows, returned) == [True, False, False, True], inserted_mask(rows, returned)
+    assert inserted_mask(rows, []) == [False] * 4
+    # 字符串与带时区时间：与取回的 naive datetime 比对
+    rows = [_row("2026-01-01T08:00:00"), _row("2026-01-01 08:00:01+08:00")]
+    returned = [_ret(1, "d1", "heart_rate", T0), _ret(1, "d1", "heart_rate", T1)]
+    assert inserted_mask(rows, returned) == [True, True]
+    assert natural_key({"elderly_id": "3", "monitor_type": "spo2", "monitor_time": T0})[1] == "mock_device_001"
+
+
+def test_normalize_time() -> None:
+    """monitor_time 规整"""
+    saved = settings.DEVICE_REGISTRY_ENABLED
+    settings.DEVICE_REGISTRY_ENABLED = False
+    try:
+        base = {"elderly_id": 1, "monitor_type": "heart_rate", "monitor_value": "72"}
+        for raw in ("2026-01-01 08:00:00", "2026-01-01T08:00:00", "2026-01-01T08:00:00+08:00", T0):
+            item = _normalize({**base, "monitor_time": raw}, {})
+            assert item is not None and item["monitor_time"] == T0, f"{raw!r} -> {item}"
+            assert item["monitor_value"] == 72.0 and item["is_abnormal"] == 0
+        assert _normalize({**base, "monitor_time": "yesterday"}, {}) is None, "无法解析的时间应被拒"
+        assert _normalize({**base, "monitor_time": "2026-01-01 08:00:00", "monitor_value": 150}, {})["is_abnormal"] == 1
+    finally:
+        settings.DEVICE_REGISTRY_ENABLED = saved
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,74 @@
+"""
+按设备令牌桶限流（DeviceRateLimiter）与订阅端准入限流的校验（无需数据库/Broker）
+
+用法：python -m tests.test_rate_limit（或 python -m pytest tests/test_rate_limit.py）
+- 计费：按消息消耗令牌，一条消息中的读数条数不影响是否放行；(设备, 老人) 各自计桶。
+- 降采样：超限消息每 downsample_every 条保留 1 条。
+- 计数：超限计数在桶被空闲清除后保留，offenders 中 passed/tokens 变为 None。
+- 准入：_dispatch 对同一消息中同一 (设备, 老人) 的读数只扣 1 个令牌，并回报 rate_limited 条数。
+"""
+import queue
+import sys
+import time
+from datetime import datetime
+
+from app.core.config import settings
+from app.events import mqtt_consumer as mc
+from app.services.edge.rate_limit import DeviceRateLimiter
+from tests._runner import run
+
+
+def test_per_message() -> None:
+    """按消息计费"""
+    r = DeviceRateLimiter(rate=0.001, burst=2)
+    assert r.allow("d", 1, 500) and r.allow("d", 1, 500), "burst 内的消息应放行，与读数条数无关"
+    assert not r.allow("d", 1, 7)
+    assert r.allow("d", 2, 1), "同一设备代发的其他老人单独计桶"
+    assert r.limited == 7 and r.stats()["devices"] == 2, r.stats()
+
+
+def test_downsample() -> None:
+    """降采样"""
+    r = DeviceRateLimiter(rate=0.001, burst=1, mode="downsample", downsample_every=3)
+    r.allow("d", 1)
+    kept = [r.allow("d", 1, 2) for _ in range(9)]
+    assert kept.count(True) == 3, kept
+    o = r.offenders()[0]
+    assert o["messages"] == 9 and o["limited"] == 18 and o["kept"] == 6, o
+
+
+def test_sweep() -> None:
+    """空闲清除"""
+    r = DeviceRateLimiter(rate=0.001, burst=1, idle_s=1)
+    r.allow("d", 1)
+    r.allow("d", 1, 3)
+    r._sweep(time.monotonic() + 5)
+    o = r.offenders()
+    assert r.stats()["devices"] == 0 and r.evicted == 1
+    assert o[0]["limited"] == 3 and o[0]["passed"] is None and o[0]["tokens"] is None, o
+
+
+def test_admit() -> None:
+    """准入限流"""
+    saved = (settings.INGEST_DEDUP_ENABLED, settings.INGEST_DEVICE_LIMIT_ENABLED, settings.INGEST_FAST_LANE_ENABLED)
+    limiter, queues = mc.device_rate_limiter, [s.q for s in mc.SHARDS]
+    settings.INGEST_DEDUP_ENABLED, settings.INGEST_DEVICE_LIMIT_ENABLED, settings.INGEST_FAST_LANE_ENABLED = False, True, False
+    mc.device_rate_limiter = DeviceRateLimiter(rate=0.001, burst=1)
+    try:
+        for s in mc.SHARDS:
+            s.q = queue.PriorityQueue()
+        msg = [{"device_id": "gw", "elderly_id": eid, "monitor_type": "heart_rate", "monitor_value": 70.0,
+                "monitor_time": datetime(2026, 1, 1, 8, 0, i), "is_abnormal": False} for eid in (1, 2) for i in range(5)]
+        counts: dict = {}
+        assert mc._dispatch(list(msg), 0, counts) == 10, "首条消息应整体放行"
+        assert mc._dispatch(list(msg), 0, counts) == 0 and counts.get("rate_limited") == 10, counts
+        assert mc.device_rate_limiter.stats()["devices"] == 2
+    finally:
+        settings.INGEST_DEDUP_ENABLED, settings.INGEST_DEVICE_LIMIT_ENABLED, settings.INGEST_FAST_LANE_ENABLED = saved
+        mc.device_rate_limiter = limiter
+        for s, q in zip(mc.SHARDS, queues):
+            s.q = q
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,68 @@
+"""
+按键重排缓冲（ReorderBuffer）的校验（纯内存，无需数据库/Broker）
+
+用法：python -m tests.test_reorder（或 python -m pytest tests/test_reorder.py）
+- 窗口：乱序到达的读数在窗口到期后按 monitor_time 有序释放；早于水位的读数标记 late 立即返回。
+- 紧急释放：快速通道读数立即释放其所在键且不抬高水位，被越过的普通读数随后到达仍正常缓冲。
+- 残留计时条目：提前释放后重新积累的缓冲不会按旧条目提前到期，next_due 跳过旧条目。
+- 上限：总条数超过 max_items 时提前释放最早的键；水位表按 LRU 保留至多 max_keys 个键。
+"""
+import sys
+from typing import Any, Dict, List
+
+from app.services.edge.reorder import ReorderBuffer
+from tests._runner import run
+
+K = (1, "dev1", "heart_rate")
+
+
+def _it(sec: int, **kw: Any) -> Dict[str, Any]:
+    return {"monitor_time": f"2026-01-01 08:00:{sec:02d}", **kw}
+
+
+def _secs(items: List[Dict[str, Any]]) -> List[int]:
+    return [int(it["monitor_time"][-2:]) for it in items]
+
+
+def test_window() -> None:
+    """窗口与迟到"""
+    r = ReorderBuffer(2.0, 100)
+    for i, sec in enumerate((5, 3, 4)):
+        assert r.push(K, _it(sec), now=0.1 * i) == []
+    assert r.pop_ready(now=1.9) == [], "窗口未到期不应释放"
+    assert _secs(r.pop_ready(now=2.0)) == [3, 4, 5]
+    late = r.push(K, _it(4), now=2.1)
+    assert len(late) == 1 and late[0].get("late") and r.late == 1, "早于水位的读数应标记 late"
+    assert r.push(K, _it(6), now=2.2) == [] and r.stats()["held"] == 1
+
+
+def test_urgent() -> None:
+    """紧急释放"""
+    r = ReorderBuffer(2.0, 100)
+    r.push(K, _it(5), now=0.0)
+    out = r.push(K, _it(6, fast=True), now=0.5, urgent=True)
+    assert _secs(out) == [5, 6] and r.urgent == 1, "紧急读数应立即释放所在键"
+    # 更早的普通读数被快速通道越过后到达：不判为迟到
+    assert r.push(K, _it(4), now=0.6) == [] and r.late == 0
+    # 残留的 t=0 计时条目不应让 t=0.6 开始的缓冲在 t=2.1 到期
+    assert r.pop_ready(now=2.1) == []
+    assert abs(r.next_due(now=2.1) - 0.5) < 1e-9, r.next_due(now=2.1)
+    assert _secs(r.pop_ready(now=2.6)) == [4]
+    assert r.push(K, _it(3), now=3.0)[0].get("late"), "正常释放后应抬高水位"
+
+
+def test_limits() -> None:
+    """容量上限"""
+    r = ReorderBuffer(10.0, 3, max_keys=2)
+    for i in range(3):
+        r.push((i, "d", "x"), _it(1), now=float(i))
+    out = r.push((3, "d", "x"), _it(1), now=3.0)
+    assert len(out) == 1 and r.forced == 1 and r.stats()["keys"] == 3, "超过 max_items 应提前释放最早的键"
+    r.pop_ready(now=100.0)
+    s = r.stats()
+    assert s["watermarks"] == 2 and s["wm_evicted"] == 2, s
+    assert r.next_due() is None
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,120 @@
+"""
+磁盘溢出缓冲（Spool）与订阅端回放的校验（无需数据库/Broker）
+
+用法：python -m tests.test_spool（或 python -m pytest tests/test_spool.py）
+- 追加/读取/推进：跨段封段后仍按 FIFO 读出，读完的段被删除。
+- 重启恢复：关闭后重新打开，从游标处继续回放，recovered 为待回放条数。
+- 环满：段数达到上限时拒绝写入并计入 dropped。
+- 回放：_spool_append 落盘的 recv_ts 换算为墙钟，_replay_units 换算回单调时钟、解析 monitor_time、快速通道读数仍走快速通道。
+- 入队：磁盘缓冲有积压但写入失败时退回直接入队，不丢弃。
+"""
+import json
+import queue
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.events import mqtt_consumer as mc
+from app.events.spool import Spool
+from tests._runner import run
+
+SEG = 1 << 16
+
+
+def _payload(i: int) -> bytes:
+    return json.dumps({"i": i, "pad": "x" * 2000}).encode("utf-8")
+
+
+def test_fifo(tmp_path: Path) -> None:
+    """FIFO 跨段"""
+    sp = Spool(tmp_path, SEG, 8)
+    for i in range(100):
+        assert sp.append(_payload(i)), f"第 {i} 条写入失败"
+    assert sp.stats()["segments"] > 1, "应跨段写入"
+    got = []
+    while True:
+        recs = sp.peek(16)
+        if not recs:
+            break
+        got += [json.loads(p)["i"] for p, _ in recs]
+        sp.advance(recs[-1][1], len(recs))
+    assert got == list(range(100)), "回放顺序与写入顺序不一致"
+    assert sp.pending == 0 and sp.stats()["segments"] == 1, sp.stats()
+    sp.close()
+
+
+def test_recover(tmp_path: Path) -> None:
+    """重启恢复"""
+    sp = Spool(tmp_path, SEG, 8)
+    for i in range(40):
+        sp.append(_payload(i))
+    recs = sp.peek(10)
+    sp.advance(recs[-1][1], len(recs))
+    sp.close()
+    sp = Spool(tmp_path, SEG, 8)
+    assert sp.recovered == 30, f"recovered={sp.recovered}，应为 30"
+    first = json.loads(sp.peek(1)[0][0])["i"]
+    assert first == 10, f"重启后应从第 10 条继续，实际 {first}"
+    assert sp.append(_payload(40)), "重启后应可继续追加"
+    sp.close()
+
+
+def test_full(tmp_path: Path) -> None:
+    """环满拒绝"""
+    sp = Spool(tmp_path, SEG, 2)
+    n = 0
+    while sp.append(_payload(n)):
+        n += 1
+    assert sp.dropped == 1 and sp.stats()["segments"] == 2, sp.stats()
+    assert not sp.append(b"x" * SEG), "超过段大小的记录应被拒绝"
+    sp.close()
+
+
+def test_replay(tmp_path: Path) -> None:
+    """回放换算"""
+    sp = Spool(tmp_path, SEG, 8)
+    old, mc.SPOOL = mc.SPOOL, sp
+    try:
+        now = time.monotonic()
+        readings = [
+            {"elderly_id": 1, "monitor_type": "heart_rate", "monitor_value": 70.0,
+             "monitor_time": datetime(2026, 1, 1, 8, 0, 0), "recv_ts": now - 5.0},
+            {"elderly_id": 1, "monitor_type": "heart_rate", "monitor_value": 190.0,
+             "monitor_time": datetime(2026, 1, 1, 8, 0, 1), "recv_ts": now - 4.0, "fast": True},
+        ]
+        assert mc._spool_append(readings), "落盘失败"
+        payload, _ = sp.peek(1)[0]
+        rows = json.loads(payload)
+        assert "recv_ts" not in rows[0] and "recv_wall" in rows[0], rows[0]
+        units = mc._replay_units(rows)
+        lanes = [u[0] for u in units]
+        assert lanes == [mc.LANE_FAST, mc.LANE_NORMAL], f"通道拆分错误：{lanes}"
+        fast, normal = units[0][3], units[1][3]
+        assert normal[0]["monitor_time"] == datetime(2026, 1, 1, 8, 0, 0), normal[0]["monitor_time"]
+        assert abs(normal[0]["recv_ts"] - (now - 5.0)) < 0.5, "recv_ts 未按墙钟换算回单调时钟"
+        assert fast[0]["recv_ts"] <= time.monotonic()
+    finally:
+        mc.SPOOL = old
+        sp.close()
+
+
+def test_fallback(tmp_path: Path) -> None:
+    """写盘失败退回入队"""
+    sp = Spool(tmp_path, SEG, 8)
+    sp.append(b"[]")  # 制造积压：之后的普通读数应先落盘
+    sp.append = lambda payload: False  # 模拟写盘失败
+    old, mc.SPOOL = mc.SPOOL, sp
+    shard = mc._Shard(0, queue.PriorityQueue(maxsize=4))
+    try:
+        item = {"elderly_id": 1, "monitor_type": "heart_rate", "monitor_value": 70.0,
+                "monitor_time": datetime(2026, 1, 1), "recv_ts": time.monotonic()}
+        assert mc._enqueue(shard, [item]), "写盘失败时应退回直接入队"
+        assert shard.q.qsize() == 1 and shard.dropped == 0
+    finally:
+        mc.SPOOL = old
+        Spool.close(sp)
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,93 @@
+"""
+设备遥测二进制帧（telemetry_codec）与订阅端二进制解码（_decode_binary）的校验（无需数据库/Broker）
+
+用法：python -m tests.test_telemetry_codec（或 python -m pytest tests/test_telemetry_codec.py）
+- 往返：encode_frame / decode_frame 记录逐条一致；device_id 不超过 20 字节用 v1 头，更长用 v2 头，超过 50 字节拒绝。
+- 坏帧：magic/版本不符、帧长度不足、记录数与长度不符时报 FrameError。
+- 解码：未知类型码、超出有效范围、elderly_id 为 0 且无法补全的记录被拒；monitor_time 保留毫秒。
+"""
+import sys
+from datetime import datetime
+
+from app.core.config import settings
+from app.events.mqtt_consumer import _decode_binary
+from app.events.telemetry_codec import HEADERS, RECORD, TYPE_CODES, FrameError, decode_frame, encode_frame
+from tests._runner import run
+
+T0 = 1_767_225_600_000  # 2026-01-01 00:00:00 UTC（毫秒）
+
+
+def _expect_error(payload: bytes, why: str) -> None:
+    try:
+        decode_frame(payload)
+        raise AssertionError(why)
+    except FrameError:
+        pass
+
+
+def test_roundtrip() -> None:
+    """编码解码往返"""
+    recs = [(1, TYPE_CODES["heart_rate"], 72.5, T0), (0, TYPE_CODES["spo2"], 97.0, T0 + 1), (2**32 - 1, 5, -1.25, -1)]
+    for dev, ver in (("", 1), ("w" * 20, 1), ("w" * 21, 2), ("腕表" * 7, 2), ("w" * 50, 2)):
+        frame = encode_frame(dev, recs)
+        assert frame[4] == ver and len(frame) == HEADERS[ver].size + RECORD.size * len(recs), f"{dev!r}：v{frame[4]}"
+        got_dev, got = decode_frame(frame)
+        assert got_dev == dev and list(got) == recs, f"{dev!r} 往返不一致"
+    dev, got = decode_frame(encode_frame("d", []))
+    assert dev == "d" and list(got) == []
+
+
+def test_encode_limits() -> None:
+    """编码拒绝"""
+    for dev in ("w" * 51, "腕" * 17):
+        try:
+            encode_frame(dev, [])
+            raise AssertionError(f"{len(dev.encode())} 字节的 device_id 应拒绝编码，不截断")
+        except FrameError:
+            pass
+    try:
+        encode_frame("d", [(1, 1, 70.0, T0)] * 0x10000)
+        raise AssertionError("超过 65535 条记录应拒绝编码")
+    except FrameError:
+        pass
+
+
+def test_bad_frames() -> None:
+    """坏帧"""
+    frame = encode_frame("dev", [(1, 1, 70.0, T0), (1, 1, 71.0, T0)])
+    _expect_error(b"XXXX" + frame[4:], "magic 不符应报错")
+    _expect_error(frame[:4] + bytes([9]) + frame[5:], "未知版本应报错")
+    _expect_error(frame[:10], "帧长度不足应报错")
+    _expect_error(frame[:-1], "记录数与长度不符应报错")
+    _expect_error(b"", "空帧应报错")
+    dev, recs = decode_frame(frame + b"\x00" * 3)
+    assert dev == "dev" and len(list(recs)) == 2, "尾部多余字节忽略"
+
+
+def test_decode_binary() -> None:
+    """订阅端解码与拒绝"""
+    saved = settings.DEVICE_REGISTRY_ENABLED
+    settings.DEVICE_REGISTRY_ENABLED = False
+    try:
+        hr = TYPE_CODES["heart_rate"]
+        frame = encode_frame("w" * 30, [
+            (7, hr, 72.0, T0 + 123),
+            (7, hr, 73.0, T0 + 456),
+            (7, 99, 70.0, T0),           # 未知类型码
+            (7, hr, 999.0, T0),          # 超出有效范围
+            (0, hr, 70.0, T0),           # 无法补全 elderly_id
+            (7, hr, 150.0, T0 + 1000),
+        ])
+        items, rejected = _decode_binary(frame)
+        assert rejected == 3 and len(items) == 3, (rejected, items)
+        assert all(it["device_id"] == "w" * 30 for it in items), "长 device_id 不应截断"
+        t = [it["monitor_time"] for it in items]
+        assert t[0] == datetime.fromtimestamp((T0 + 123) / 1000) and t[0].microsecond == 123000
+        assert (t[1] - t[0]).total_seconds() == 0.333 and t[0] < t[1] < t[2], f"同一秒内的读数应保留毫秒：{t}"
+        assert [it["is_abnormal"] for it in items] == [0, 0, 1] and items[0]["monitor_type"] == "heart_rate"
+    finally:
+        settings.DEVICE_REGISTRY_ENABLED = saved
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))
@@ -0,0 +1,97 @@
+"""
+生命体征规则表（RuleTable / VitalRules）的校验（无需数据库/Broker）
+
+用法：python -m tests.test_vital_rules（或 python -m pytest tests/test_vital_rules.py）
+- 编译：默认规则、护理等级覆盖、老人覆盖的优先级（老人 > 等级 > 默认），老人覆盖叠加在其等级之上。
+- 批量：classify_batch 与逐条 classify 结果一致（含未知类型、超出有效范围、无老人ID）。
+- 等级变更：set_elder_level 替换为新表，旧表不变，老人覆盖保留。
+- 热加载：规则文件 mtime 未变时跳过，强制重载生效；空规则报错且保留旧表。
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+
+from app.core.config import settings
+from app.services.edge.vital_rules import RuleTable, VitalRules, _spec
+from tests._runner import run
+
+TYPES = {
+    "heart_rate": _spec({"valid": [0, 220], "abnormal_high": 100}),
+    "spo2": _spec({"valid": [50, 100], "abnormal_low": 94}),
+}
+LEVELS = {"A": {"heart_rate": _spec({"abnormal_high": 90})}, "B": {"heart_rate": _spec({"abnormal_high": 80})}}
+ELDERS = {7: {"heart_rate": _spec({"valid": [0, 150]})}}
+
+
+def _table() -> RuleTable:
+    return RuleTable(TYPES, LEVELS, ELDERS, {7: "A", 8: "B"}, "test")
+
+
+def test_compile() -> None:
+    """编译与覆盖"""
+    tb = _table()
+    assert tb.classify("heart_rate", 95) == 0 and tb.classify("heart_rate", 101) == 1, "默认阈值"
+    assert tb.classify("heart_rate", 85, 8) == 1, "等级 B 覆盖"
+    # 老人 7：等级 A 的异常上限 + 本人有效范围
+    assert tb.classify("heart_rate", 95, 7) == 1 and tb.classify("heart_rate", 160, 7) is None
+    assert tb.classify("heart_rate", 160, 99) == 1, "未映射老人按默认规则"
+    assert tb.classify("spo2", 93, 7) == 1 and tb.classify("spo2", 40) is None
+    assert tb.classify("glucose", 5.0) is None, "未知类型"
+    d = tb.describe()
+    assert d["elder_overrides"] == 1 and d["elders_mapped"] == 2 and d["types"]["spo2"]["abnormal_high"] is None, d
+
+
+def test_batch() -> None:
+    """批量评估"""
+    tb = _table()
+    rnd = random.Random(17)
+    types = [rnd.choice(("heart_rate", "spo2", "glucose")) for _ in range(2000)]
+    values = [rnd.uniform(0, 240) for _ in types]
+    eids = [rnd.choice((None, 7, 8, 99)) for _ in types]
+    expect = [tb.classify(mt, v, eid) for mt, v, eid in zip(types, values, eids)]
+    assert tb.classify_batch(types, values, eids) == expect
+    assert tb.classify_batch(types, values) == [tb.classify(mt, v) for mt, v in zip(types, values)]
+
+
+def test_levels() -> None:
+    """等级变更"""
+    v = VitalRules()
+    v.table = _table()
+    old = v.table
+    v.set_elder_level(7, "B")
+    assert v.table is not old and old.classify("heart_rate", 85, 7) == 0, "旧表不应被修改"
+    assert v.classify("heart_rate", 85, 7) == 1 and v.classify("heart_rate", 160, 7) is None, "老人覆盖应保留"
+    v.set_elder_level(7, None)
+    assert v.classify("heart_rate", 95, 7) == 0 and v.classify("heart_rate", 160, 7) is None
+    v.set_elder_level(9, "A")
+    assert v.classify("heart_rate", 95, 9) == 1, "新增老人的等级应即时生效"
+
+
+def test_reload() -> None:
+    """热加载"""
+    saved = (settings.VITAL_RULES_SOURCE, settings.VITAL_RULES_FILE)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "rules.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"types": {"temperature": {"valid": [30, 45], "abnormal_high": 37.3}}}, f)
+        settings.VITAL_RULES_SOURCE, settings.VITAL_RULES_FILE = "file", path
+        try:
+            v = VitalRules()
+            assert v.reload() and v.classify("temperature", 38) == 1 and v.classify("heart_rate", 90) is None
+            assert not v.reload(), "mtime 未变时应跳过"
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"types": {}}, f)
+            try:
+                v.reload(force=True)
+                raise AssertionError("空规则应报错")
+            except ValueError:
+                pass
+            assert v.classify("temperature", 38) == 1, "重载失败应保留旧表"
+        finally:
+            settings.VITAL_RULES_SOURCE, settings.VITAL_RULES_FILE = saved
+
+
+if __name__ == "__main__":
+    sys.exit(run(__name__))